@@ -1,30 +1,88 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, url_for, stream_with_context
+from flask.helpers import get_debug_flag
 from flask_login import LoginManager, login_required, current_user
+from werkzeug.serving import is_running_from_reloader
 from werkzeug.utils import secure_filename
 import os
+import json
+import time
+import asyncio
+import click
 import logging
 from dotenv import load_dotenv
 from models import db, User
-from ocr.ocr_processor import process_image
-from logic.reorder_logic import generate_reorder_suggestions
-from messaging.whatsapp import send_whatsapp_message
+import providers
+from jobs.job_queue import job_queue
+from storage.upload_archive import upload_archive
+from storage.streaming import StreamingRequest, uploaded_digest
+from ocr.result_cache import result_cache
+from storage import database
+from inventory.stock import rebuild_current_stock
+from inventory.canonical import assign_item_ids
+from logic.item_stats import rebuild_item_stats
+from storage.inventory_writer import inventory_writer
+from messaging.outbox import whatsapp_outbox
+from monitoring.metrics import metrics
+from jobs.batch import BatchError, collect_pages, batch_filename, run_batch
+from jobs.backfill import Backfill
+from jobs.async_pipeline import async_pipeline
+from corrector.gemini_corrector import gemini_corrector
+from preprocessing.image_cleaner import ImageQualityError, check_image_quality
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = StreamingRequest
 app.config.update({
     'SECRET_KEY': os.getenv('SECRET_KEY', 'dev-key-change-in-production'),
     'UPLOAD_FOLDER': 'uploads',
     'MAX_CONTENT_LENGTH': 16 * 1024 * 1024,
+    'UPLOAD_SPOOL_MAX_BYTES': int(os.getenv('UPLOAD_SPOOL_MAX_BYTES', 8 * 1024 * 1024)),
     'ALLOWED_EXTENSIONS': {'png', 'jpg', 'jpeg', 'gif'},
-    'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db',
-    'SQLALCHEMY_TRACK_MODIFICATIONS': False
+    'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', 'sqlite:///app.db'),
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'SQLALCHEMY_ENGINE_OPTIONS': {
+        # One connection per OCR worker and request thread, checked before reuse
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 30,
+        'pool_pre_ping': True
+    },
+    'SQLITE_BUSY_TIMEOUT_MS': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'SQLITE_SYNCHRONOUS': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'INVENTORY_WRITE_MAX_BATCH': int(os.getenv('INVENTORY_WRITE_MAX_BATCH', 64)),
+    'INVENTORY_WRITE_WINDOW_MS': float(os.getenv('INVENTORY_WRITE_WINDOW_MS', 0)),
+    'WHATSAPP_COALESCE_SECONDS': float(os.getenv('WHATSAPP_COALESCE_SECONDS', 10)),
+    'WHATSAPP_MAX_ATTEMPTS': int(os.getenv('WHATSAPP_MAX_ATTEMPTS', 5)),
+    'WHATSAPP_RATE_PER_MINUTE': float(os.getenv('WHATSAPP_RATE_PER_MINUTE', 6)),
+    'WHATSAPP_BURST': int(os.getenv('WHATSAPP_BURST', 2)),
+    'WHATSAPP_MAX_CONCURRENT_SENDS': int(os.getenv('WHATSAPP_MAX_CONCURRENT_SENDS', 4)),
+    'WHATSAPP_CLAIM_LEASE_SECONDS': float(os.getenv('WHATSAPP_CLAIM_LEASE_SECONDS', 300)),
+    'OCR_WORKERS': int(os.getenv('OCR_WORKERS', 2)),
+    'JOB_LEASE_SECONDS': float(os.getenv('JOB_LEASE_SECONDS', 900)),
+    'BATCH_WORKERS': int(os.getenv('BATCH_WORKERS', 4)),
+    'ASYNC_CPU_WORKERS': int(os.getenv('ASYNC_CPU_WORKERS', 4)),
+    'QUALITY_GATE': os.getenv('QUALITY_GATE', 'true').lower() == 'true',
+    'BATCH_MAX_PAGES': int(os.getenv('BATCH_MAX_PAGES', 50)),
+    'BATCH_MAX_BYTES': int(os.getenv('BATCH_MAX_BYTES', 64 * 1024 * 1024)),
+    'ARCHIVE_UPLOADS': os.getenv('ARCHIVE_UPLOADS', 'true').lower() == 'true',
+    'OCR_CACHE_MAX_ENTRIES': int(os.getenv('OCR_CACHE_MAX_ENTRIES', 1000)),
+    'METRICS_ENABLED': os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+    'METRICS_DEBUG_HEADER': os.getenv('METRICS_DEBUG_HEADER', 'X-Debug-Timing')
 })
 
 # Initialize extensions
 db.init_app(app)
+database.init_app(app, db)
+inventory_writer.init_app(app)
+whatsapp_outbox.init_app(app)
+job_queue.init_app(app)
+async_pipeline.init_app(app)
+upload_archive.init_app(app)
+result_cache.init_app(app)
+metrics.init_app(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'auth.login'
 
@@ -32,6 +90,91 @@ login_manager.login_view = 'auth.login'
 def load_user(id):
     return User.query.get(int(id))
 
+# Production workers can load OCR and Gemini before serving their first request
+if os.getenv('WARM_UP', 'false').lower() == 'true':
+    providers.warm_up()
+
+@app.cli.command('warm-up')
+def warm_up_command():
+    """Load OCR and Gemini and report how long each took."""
+    for entry in providers.warm_up():
+        status = f"{entry['load_seconds']:.2f}s" if entry['loaded'] else 'not loaded'
+        print(f"{entry['name']}: {status}")
+
+def start_background_workers():
+    """
+    Start the upload job workers and the WhatsApp sender, which first pick up
+    jobs and messages a previous run left unfinished. Safe to call more than
+    once per process.
+    """
+    try:
+        job_queue.start()
+    except Exception as e:
+        app.logger.error(f"Failed to start upload job workers: {str(e)}")
+    # Its first pass returns expired claims to the queue and sends whatever is due
+    whatsapp_outbox.start()
+
+def _serves_requests():
+    # Only processes that answer requests take background work; other flask
+    # commands (backfill, rebuild-stock, shell) exit without finishing it
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        # Imported by a WSGI server such as gunicorn
+        return __name__ != '__main__'
+    if ctx.info_name != 'run':
+        return False
+    # The debug reloader's watcher process only restarts the process that serves
+    reload = ctx.params.get('reload')
+    if reload is None:
+        reload = get_debug_flag()
+    return not reload or is_running_from_reloader()
+
+# Pick up work left by a previous run as soon as the process starts, not on the next upload
+if os.getenv('BACKGROUND_WORKERS', 'true').lower() == 'true' and _serves_requests():
+    start_background_workers()
+
+@app.cli.command('worker')
+def worker_command():
+    """Run the background workers in this process until interrupted."""
+    start_background_workers()
+    print(f"Background workers running ({job_queue.num_workers} OCR workers and the WhatsApp sender); "
+          f"press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+@app.cli.command('rebuild-stock')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user\'s stock.')
+def rebuild_stock_command(user_id):
+    """Recompute the current stock and item usage tables from upload history."""
+    count = assign_item_ids(user_id)
+    print(f"Matched {count} saved items to canonical items")
+    count = rebuild_current_stock(user_id)
+    print(f"Rebuilt current stock: {count} items")
+    count = rebuild_item_stats(user_id)
+    print(f"Rebuilt item statistics: {count} items")
+
+@app.cli.command('backfill')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--user-id', type=int, required=True, help='Owner of the backfilled uploads.')
+@click.option('--processes', type=int, default=None, help='OCR worker processes; defaults to the CPU count.')
+@click.option('--batch-size', type=int, default=50, show_default=True, help='Uploads written per transaction.')
+@click.option('--report', default='backfill-report.jsonl', show_default=True,
+              help='JSONL report of every file; an existing report is resumed from.')
+@click.option('--now', 'use_now', is_flag=True, help='Date uploads now instead of by file modification time.')
+def backfill_command(directory, user_id, processes, batch_size, report, use_now):
+    """Read a directory of register photos into a user's inventory history."""
+    if db.session.get(User, user_id) is None:
+        raise click.BadParameter(f'No user with id {user_id}', param_hint='--user-id')
+    backfill = Backfill(directory, user_id, report, processes=processes, batch_size=batch_size,
+                        use_mtime=not use_now, extensions=app.config['ALLOWED_EXTENSIONS'])
+    counts = backfill.run(progress=lambda counts: print(
+        f"saved {counts['saved']}, empty {counts['empty']}, failed {counts['failed']}"))
+    print(f"Backfill finished: {counts['saved']} saved, {counts['empty']} without items, "
+          f"{counts['failed']} failed, {counts['skipped']} already done. Report: {report}")
+
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
@@ -45,82 +188,139 @@ def validate_phone_number(phone_number):
 def index():
     return render_template('index.html')
 
-@app.route('/upload', methods=['POST'])
-@login_required
-def upload():
-    # Validate request
+def read_upload():
+    """
+    Validate an upload request and read its image
+    Returns:
+        tuple: (image bytes, sanitized filename, phone number, quality report or None, None), or
+               (None, None, None, None, error response) if the request is invalid
+    """
     if 'multipart/form-data' not in request.content_type:
-        return jsonify({'error': 'Invalid content type'}), 400
+        return None, None, None, None, (jsonify({'error': 'Invalid content type'}), 400)
     if 'image' not in request.files:
-        return jsonify({'error': 'No image provided'}), 400
+        return None, None, None, None, (jsonify({'error': 'No image provided'}), 400)
     
     file = request.files['image']
     if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+        return None, None, None, None, (jsonify({'error': 'No selected file'}), 400)
     if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed'}), 400
+        return None, None, None, None, (jsonify({'error': 'File type not allowed'}), 400)
 
-    try:
-        # Process file
-        filename = secure_filename(file.filename)
-        if not filename:
-            return jsonify({'error': 'Invalid filename'}), 400
-            
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        if not os.path.exists(filepath):
-            return jsonify({'error': 'Failed to save file'}), 500
+    # Validate phone number before processing so the client gets immediate feedback
+    phone_number = request.form.get('phone_number')
+    if phone_number and not validate_phone_number(phone_number):
+        return None, None, None, None, (jsonify({'error': 'Invalid phone number'}), 400)
+
+    filename = secure_filename(file.filename)
+    if not filename:
+        return None, None, None, None, (jsonify({'error': 'Invalid filename'}), 400)
         
-        # Process image through OCR
-        items, upload_id = process_image(filepath)
-        if not items:
-            return jsonify({'error': 'No items found in image'}), 400
-        # Generate reorder suggestions from detected items
-        reorder_suggestions = generate_reorder_suggestions(items)
-        if not reorder_suggestions:
-            return jsonify({'error': 'Failed to generate suggestions'}), 500
-
-        # Handle WhatsApp notification
-        whatsapp_status = None
-        whatsapp_message = None
-        phone_number = request.form.get('phone_number')
+    # The body was streamed into a hashing buffer; archiving happens in the background
+    image_data = file.read()
+    if not image_data:
+        return None, None, None, None, (jsonify({'error': 'Empty file'}), 400)
+
+    # Blurry, dark and washed-out photos are turned away before any OCR work is queued
+    quality = None
+    if app.config['QUALITY_GATE']:
+        try:
+            with metrics.span('quality_check'):
+                quality = check_image_quality(image_data)
+        except ImageQualityError as e:
+            return None, None, None, None, (jsonify({'error': str(e), 'quality': e.report}), 422)
+        except ValueError:
+            return None, None, None, None, (jsonify({'error': 'Could not read image'}), 400)
+    with metrics.span('archive'):
+        upload_archive.archive(image_data, filename, uploaded_digest(file, image_data))
+    return image_data, filename, phone_number, quality, None
+
+@app.route('/upload', methods=['POST'])
+@login_required
+def upload():
+    try:
+        image_data, filename, phone_number, quality, error = read_upload()
+        if error:
+            return error
         
-        if phone_number:
-            if not validate_phone_number(phone_number):
-                return jsonify({'error': 'Invalid phone number'}), 400
-            try:
-                send_whatsapp_message(phone_number, reorder_suggestions)
-                whatsapp_status = 'success'
-                whatsapp_message = 'Message sent successfully'
-            except Exception as e:
-                app.logger.error(f"WhatsApp error: {str(e)}")
-                whatsapp_status = 'error'
-                whatsapp_message = 'Failed to send WhatsApp message'
-
-        # Prepare response
-        response = {
+        # Queue OCR, reorder suggestions and WhatsApp for the worker pool
+        with metrics.span('job_submit'):
+            job = job_queue.submit(current_user.id, image_data, filename, phone_number, quality)
+
+        return jsonify({
             'success': True,
-            'items': items,
-            'reorder_suggestions': reorder_suggestions,
-            'saved_file': filename
-        }
-        
-        if whatsapp_status:
-            response.update({
-                'whatsapp_status': whatsapp_status,
-                'whatsapp_message': whatsapp_message
-            })
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('jobs.status', job_id=job.id),
+            'result_url': url_for('jobs.result', job_id=job.id)
+        }), 202
+
+    except Exception as e:
+        app.logger.error(f"Processing error: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred'}), 500
 
-        return jsonify(response)
+@app.route('/upload/direct', methods=['POST'])
+@login_required
+async def upload_direct():
+    # Same checks as /upload, but the result comes back in this response, shaped like a job result
+    try:
+        image_data, filename, phone_number, quality, error = read_upload()
+        if error:
+            return error
+
+        # The pipeline's event loop runs OCR, Gemini and the database work; this view only waits
+        payload, status_code = await asyncio.wrap_future(
+            async_pipeline.submit(image_data, filename, current_user.id, phone_number, quality))
+        return jsonify(payload), status_code
 
     except Exception as e:
         app.logger.error(f"Processing error: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@app.route('/upload/batch', methods=['POST'])
+@login_required
+def upload_batch():
+    # Validate request
+    if 'multipart/form-data' not in request.content_type:
+        return jsonify({'error': 'Invalid content type'}), 400
+    files = request.files.getlist('images') + request.files.getlist('archive')
+    if not files:
+        return jsonify({'error': 'No images provided'}), 400
+
+    phone_number = request.form.get('phone_number')
+    if phone_number and not validate_phone_number(phone_number):
+        return jsonify({'error': 'Invalid phone number'}), 400
+
+    try:
+        pages = collect_pages(files, app.config['ALLOWED_EXTENSIONS'], app.config['BATCH_MAX_PAGES'],
+                              app.config['BATCH_MAX_BYTES'])
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # A single ZIP is recorded under its own name
+    archive_name = secure_filename(files[0].filename) if len(files) == 1 \
+        and files[0].filename.lower().endswith('.zip') else None
+
+    # Pages stream back as newline-delimited JSON as they finish, then the batch summary
+    events = run_batch(app, pages, current_user.id, phone_number, app.config['BATCH_WORKERS'],
+                       batch_filename(pages, archive_name), app.config['QUALITY_GATE'])
+    return Response(stream_with_context(json.dumps(event) + '\n' for event in events),
+                    mimetype='application/x-ndjson')
+
+@app.route('/cache/stats')
+@login_required
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/corrector/stats')
+@login_required
+def corrector_stats():
+    corrector = gemini_corrector.get()
+    return jsonify(dict(corrector.local_stats.to_dict(), gemini=corrector.resilience.to_dict()))
+
 # Register blueprints
 from auth.routes import auth
 from inventory.routes import inventory
+from jobs.routes import jobs
 
 # Register authentication blueprint
 app.register_blueprint(auth, url_prefix='/auth')
@@ -128,7 +328,13 @@ app.register_blueprint(auth, url_prefix='/auth')
 # Register inventory blueprint
 app.register_blueprint(inventory, url_prefix='/inventory')
 
+# Register upload jobs blueprint
+app.register_blueprint(jobs, url_prefix='/jobs')
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+    # Under the debug reloader only the child process serves requests
+    if is_running_from_reloader():
+        start_background_workers()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Measure uploads persisted per second from concurrent OCR workers, comparing
+the original per-item ORM save in SQLite's default rollback journal with
+bulk inserts through InventoryWriter on a WAL-tuned connection.
+
+Usage:
+    python -m benchmarks.db_writes [--threads 8] [--uploads 50] [--items 15]
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from models import db, User, InventoryUpload, InventoryItem
+from storage import database
+from storage.inventory_writer import InventoryWriter
+
+def legacy_save(user_id, filename, items):
+    """
+    The original save: one ORM add per item, committed by the calling worker
+    """
+    upload = InventoryUpload(user_id=user_id, filename=filename)
+    db.session.add(upload)
+    for item in items:
+        db.session.add(InventoryItem(upload=upload, name=item['name'], quantity=item['quantity']))
+    db.session.commit()
+    return upload.id
+
+def make_app(path, tuned):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 16, 'max_overflow': 16}
+    db.init_app(app)
+    if tuned:
+        database.init_app(app, db)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email='bench@example.com', password_hash='x'))
+        db.session.commit()
+    return app
+
+def run_mode(mode, threads, uploads, items):
+    """
+    Save uploads from worker threads and time it
+    Args:
+        mode (str): 'legacy' or 'current'
+        threads (int): Concurrent workers
+        uploads (int): Uploads saved by each worker
+        items (int): Items per upload
+    Returns:
+        dict: Throughput and failure counts
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = make_app(os.path.join(tmpdir, 'bench.db'), tuned=mode == 'current')
+        writer = InventoryWriter()
+        writer.init_app(app)
+        save = writer.save if mode == 'current' else legacy_save
+        page = [{'name': f'item {n}', 'quantity': n} for n in range(items)]
+        failures = []
+
+        def worker(index):
+            with app.app_context():
+                for n in range(uploads):
+                    try:
+                        save(1, f'w{index}-{n}.jpg', page)
+                    except OperationalError as e:
+                        db.session.rollback()
+                        failures.append(str(e))
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            saved = InventoryUpload.query.count()
+            db.engine.dispose()
+        return {
+            'mode': mode,
+            'uploads_saved': saved,
+            'failures': len(failures),
+            'seconds': round(elapsed, 3),
+            'uploads_per_second': round(saved / elapsed, 1),
+            'transactions': writer.stats()['transactions'] if mode == 'current' else saved
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload persistence throughput')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--uploads', type=int, default=50)
+    parser.add_argument('--items', type=int, default=15)
+    args = parser.parse_args()
+
+    for mode in ('legacy', 'current'):
+        result = run_mode(mode, args.threads, args.uploads, args.items)
+        print(', '.join(f"{key}={value}" for key, value in result.items()))
+
+if __name__ == '__main__':
+    main()
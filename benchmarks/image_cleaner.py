@@ -0,0 +1,170 @@
+"""
+Compare per-image time and peak RSS of the original full-resolution
+preprocessing path with ImageCleaner's reduced grayscale decode and
+process_batch, on the repo's sample photos and 12 MP upscales of them.
+
+Each mode runs in its own subprocess so peak RSS is not shared.
+
+Usage:
+    python -m benchmarks.image_cleaner
+"""
+import os
+import sys
+import glob
+import json
+import time
+import resource
+import tempfile
+import subprocess
+import cv2
+import numpy as np
+from preprocessing.image_cleaner import ImageCleaner
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('legacy', 'current', 'batch')
+
+def sample_images(megapixels=12):
+    """
+    Encoded sample photos plus upscaled copies at phone-camera resolution
+    Args:
+        megapixels (int): Resolution of the upscaled copies
+    Returns:
+        list: (name, encoded JPEG bytes) pairs
+    """
+    samples = []
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, '*.jpg'))):
+        with open(path, 'rb') as f:
+            data = f.read()
+        name = os.path.basename(path)
+        samples.append((name, data))
+
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        scale = (megapixels * 1_000_000 / (img.shape[0] * img.shape[1])) ** 0.5
+        large = cv2.resize(img, (int(img.shape[1] * scale), int(img.shape[0] * scale)))
+        ok, encoded = cv2.imencode('.jpg', large, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        samples.append((f"{name}@{megapixels}MP", encoded.tobytes()))
+    return samples
+
+def legacy_process(cleaner, data):
+    """
+    The original path: full-resolution color decode, grayscale, resize, blur
+    """
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    height, width = img.shape[:2]
+    if width > cleaner.max_width:
+        img = cv2.resize(img, (cleaner.max_width, int(height * cleaner.max_width / width)))
+    return cv2.GaussianBlur(img, (5, 5), 0)
+
+def reset_peak_rss():
+    """
+    Reset the kernel's peak RSS counter so import-time spikes do not hide
+    the preprocessing peak. Linux only; elsewhere peaks include imports.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+def load_samples(directory):
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, '*'))):
+        with open(path, 'rb') as f:
+            samples.append((os.path.basename(path), f.read()))
+    return samples
+
+def run_mode(mode, sample_dir, repeat=3):
+    """
+    Time one preprocessing mode in the current process
+    Args:
+        mode (str): One of MODES
+        sample_dir (str): Directory of encoded sample images
+        repeat (int): Runs per image; the best is reported
+    Returns:
+        dict: Per-image milliseconds and peak RSS
+    """
+    cleaner = ImageCleaner()
+    samples = load_samples(sample_dir)
+    reset_peak_rss()
+    baseline_rss = current_rss_mb()
+    timings = {}
+
+    if mode == 'batch':
+        started = time.perf_counter()
+        for _ in range(repeat):
+            cleaner.process_batch([data for _, data in samples])
+        timings['all_images_per_image'] = (time.perf_counter() - started) / (repeat * len(samples)) * 1000
+    else:
+        process = cleaner.process_image if mode == 'current' else lambda data: legacy_process(cleaner, data)
+        for name, data in samples:
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                process(data)
+                best = min(best, time.perf_counter() - started)
+            timings[name] = best * 1000
+
+    return {
+        'mode': mode,
+        'per_image_ms': {name: round(ms, 2) for name, ms in timings.items()},
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'baseline_rss_mb': round(baseline_rss, 1)
+    }
+
+def run():
+    """
+    Run every mode in a separate interpreter on the same samples
+    Returns:
+        list: One result dict per mode
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as sample_dir:
+        # Generate samples here so upscaling does not inflate the measured peaks
+        for name, data in sample_images():
+            with open(os.path.join(sample_dir, name), 'wb') as f:
+                f.write(data)
+
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.image_cleaner', '--mode', mode, sample_dir],
+                cwd=REPO_ROOT, capture_output=True, text=True, check=True
+            ).stdout
+            results.append(json.loads(output))
+    return results
+
+def main():
+    if '--mode' in sys.argv:
+        index = sys.argv.index('--mode')
+        print(json.dumps(run_mode(sys.argv[index + 1], sys.argv[index + 2])))
+        return
+
+    for result in run():
+        print(f"{result['mode']}: peak RSS {result['peak_rss_mb']} MB "
+              f"(after loading samples {result['baseline_rss_mb']} MB)")
+        for name, ms in result['per_image_ms'].items():
+            print(f"    {name:<48} {ms:>8} ms")
+
+if __name__ == '__main__':
+    main()
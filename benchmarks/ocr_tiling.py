@@ -0,0 +1,102 @@
+"""
+Compare single-pass OCR on the downscaled page with tiled OCR at native
+resolution on the repo's sample photos. Reports wall time, boxes found,
+mean recognition confidence and, when a ground-truth file sits next to a
+sample (same name with a .txt extension), token recall against it.
+
+Needs PaddleOCR installed; Gemini is not called.
+
+Usage:
+    python -m benchmarks.ocr_tiling [--tile-height 1024] [--processes 2]
+"""
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+from ocr.ocr_processor import OCRProcessor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def tokens(texts):
+    return [token for text in texts for token in re.findall(r'\w+', text.lower())]
+
+def token_recall(found, expected):
+    """
+    Share of expected tokens that were recognised, counting repeats
+    """
+    remaining = {}
+    for token in found:
+        remaining[token] = remaining.get(token, 0) + 1
+    hits = 0
+    for token in expected:
+        if remaining.get(token):
+            remaining[token] -= 1
+            hits += 1
+    return hits / len(expected) if expected else None
+
+def read_page(processor, data, tiled, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if tiled:
+            result = processor.ocr_tiled(processor.preprocess_image(data, processor.tile_cleaner))
+        else:
+            result = processor.ocr.ocr(processor.preprocess_image(data), cls=False)[0] or []
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+def run(tile_height=1024, tile_overlap=160, processes=0, repeat=1):
+    """
+    OCR every sample image in both modes
+    Returns:
+        list: One result dict per image and mode
+    """
+    processor = OCRProcessor(processes=processes, tile_height=tile_height, tile_overlap=tile_overlap)
+    processor.warm_up()
+    results = []
+    for path in sorted(glob.glob(os.path.join(REPO_ROOT, '*.jpg'))):
+        with open(path, 'rb') as f:
+            data = f.read()
+        truth_path = os.path.splitext(path)[0] + '.txt'
+        expected = None
+        if os.path.exists(truth_path):
+            with open(truth_path) as f:
+                expected = tokens(f.read().splitlines())
+
+        # Read once untimed so model initialisation is not charged to the first mode
+        read_page(processor, data, False, 1)
+        for mode in ('page', 'tiled'):
+            result, seconds = read_page(processor, data, mode == 'tiled', repeat)
+            texts = [text for _, (text, _) in result]
+            confidences = [confidence for _, (_, confidence) in result]
+            recall = token_recall(tokens(texts), expected) if expected else None
+            results.append({
+                'image': os.path.basename(path),
+                'mode': mode,
+                'ms': round(seconds * 1000, 1),
+                'boxes': len(result),
+                'tokens': len(tokens(texts)),
+                'mean_confidence': round(sum(confidences) / len(confidences), 3) if confidences else None,
+                'recall': round(recall, 3) if recall is not None else None
+            })
+    if hasattr(processor.ocr, 'shutdown'):
+        processor.ocr.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tile-height', type=int, default=1024)
+    parser.add_argument('--tile-overlap', type=int, default=160)
+    parser.add_argument('--processes', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    columns = ['image', 'mode', 'ms', 'boxes', 'tokens', 'mean_confidence', 'recall']
+    print(' '.join(f"{column:>16}" for column in columns))
+    for result in run(args.tile_height, args.tile_overlap, args.processes, args.repeat):
+        print(' '.join(f"{str(result[column])[-16:]:>16}" for column in columns))
+
+if __name__ == '__main__':
+    sys.exit(main())
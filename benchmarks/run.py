@@ -0,0 +1,208 @@
+"""
+Benchmark suite for the processing pipeline. PaddleOCR and Gemini are
+replaced by recorded-fixture stand-ins (benchmarks.stubs), so runs are
+offline and deterministic. Results are written as flat JSON metrics that
+--compare diffs against an earlier run, e.g. one from another commit.
+
+Usage:
+    python -m benchmarks.run [--output results.json] [--compare old.json] [--only SUITE ...]
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def best_ms(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+def bench_image_cleaner():
+    """
+    ImageCleaner.process_image on the sample photos and 12 MP upscales of them
+    """
+    from preprocessing.image_cleaner import ImageCleaner
+    from benchmarks.image_cleaner import sample_images
+
+    cleaner = ImageCleaner()
+    return {f'{name}.ms': best_ms(lambda: cleaner.process_image(data)) for name, data in sample_images()}
+
+def bench_structure_text():
+    """
+    _structure_text on synthetic pages of 10 to 5,000 boxes, against the original implementation,
+    and the rows each finds on a twice-as-large photo of the 1,000 box page
+    """
+    from benchmarks.structure_text import run
+
+    metrics = {}
+    for result in run(sizes=(10, 100, 1000, 5000)):
+        metrics[f"{result['boxes']}_boxes.ms"] = result['current_ms']
+        metrics[f"{result['boxes']}_boxes.legacy_ms"] = result['legacy_ms']
+        metrics[f"{result['boxes']}_boxes.rows"] = result['current_rows']
+    for result in run(sizes=(1000,), scale=2.0):
+        metrics['1000_boxes_2x.rows'] = result['current_rows']
+        metrics['1000_boxes_2x.legacy_rows'] = result['legacy_rows']
+        metrics['1000_boxes_2x.expected_rows'] = result['expected_rows']
+    return metrics
+
+def bench_reorder():
+    """
+    generate_reorder_suggestions with the threshold rule and the usage forecast
+    """
+    from logic.reorder_logic import generate_reorder_suggestions, reorder_engine
+
+    rng = np.random.default_rng(0)
+    metrics = {}
+    for size in (10, 1000, 10000):
+        items = [{'name': f'item {i}', 'quantity': int(q)} for i, q in enumerate(rng.integers(0, 50, size))]
+        usage = rng.uniform(0, 5, size)
+        usage[rng.random(size) < 0.2] = np.nan
+        metrics[f'{size}_items.threshold_ms'] = best_ms(lambda: generate_reorder_suggestions(items))
+        metrics[f'{size}_items.forecast_ms'] = best_ms(lambda: reorder_engine.suggest(items, usage))
+    return metrics
+
+def bench_db_save():
+    """
+    Upload persistence from concurrent workers, per-item ORM save vs the batched writer
+    """
+    from benchmarks.db_writes import run_mode
+
+    metrics = {}
+    for mode in ('legacy', 'current'):
+        result = run_mode(mode, threads=4, uploads=25, items=15)
+        metrics[f'{mode}.uploads_per_second'] = result['uploads_per_second']
+        metrics[f'{mode}.transactions'] = result['transactions']
+    return metrics
+
+def bench_upload():
+    """
+    End-to-end POST /upload through the Flask test client until the job result is ready
+    """
+    from benchmarks.stubs import recorded_backends
+
+    with tempfile.TemporaryDirectory() as tmpdir, recorded_backends() as (engine, client):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        os.environ['ARCHIVE_UPLOADS'] = 'false'
+        from app import app
+        from models import db, User
+
+        with app.app_context():
+            db.create_all()
+            user = User(email='bench@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+
+        http = app.test_client()
+        with http.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+        with open(os.path.join(REPO_ROOT, 'flexibly-getting-quantity.jpg'), 'rb') as f:
+            photo = f.read()
+
+        def upload(data):
+            import io
+            started = time.perf_counter()
+            response = http.post('/upload', data={'image': (io.BytesIO(data), 'register.jpg')},
+                                 content_type='multipart/form-data')
+            accepted = time.perf_counter() - started
+            result_url = response.get_json()['result_url']
+            while http.get(result_url).status_code == 202:
+                time.sleep(0.002)
+            return accepted * 1000, (time.perf_counter() - started) * 1000
+
+        # First upload loads the stand-in engines; later distinct photos miss the result cache
+        upload(photo + b'warm-up')
+        cold = [upload(photo + f'{i}'.encode()) for i in range(20)]
+        cached = [upload(photo) for _ in range(20)]
+
+        metrics = {}
+        for label, runs in (('cold', cold), ('cached', cached)):
+            accepted, total = np.array(runs).T
+            metrics[f'{label}.accept_p50_ms'] = round(float(np.percentile(accepted, 50)), 3)
+            metrics[f'{label}.result_p50_ms'] = round(float(np.percentile(total, 50)), 3)
+            metrics[f'{label}.result_p95_ms'] = round(float(np.percentile(total, 95)), 3)
+        metrics['ocr_calls'] = engine.calls
+        metrics['gemini_calls'] = client.models.calls
+        return metrics
+
+SUITES = {
+    'image_cleaner': bench_image_cleaner,
+    'structure_text': bench_structure_text,
+    'reorder': bench_reorder,
+    'db_save': bench_db_save,
+    'upload': bench_upload
+}
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run(names=None):
+    """
+    Run benchmark suites
+    Args:
+        names: Suite names; defaults to all of SUITES
+    Returns:
+        dict: Run metadata and flat 'suite.metric' values
+    """
+    metrics = {}
+    for name in names or SUITES:
+        print(f"Running {name}...", file=sys.stderr)
+        for key, value in SUITES[name]().items():
+            metrics[f'{name}.{key}'] = value
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'metrics': metrics
+    }
+
+def compare(old, new):
+    """
+    Print each metric present in both runs with its relative change
+    """
+    print(f"{'metric':<64} {'old':>12} {'new':>12} {'change':>8}")
+    for key, value in new['metrics'].items():
+        previous = old['metrics'].get(key)
+        if previous is None:
+            continue
+        change = f"{(value - previous) / previous * 100:+.1f}%" if previous else 'n/a'
+        print(f"{key:<64} {previous:>12} {value:>12} {change:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline benchmark suite')
+    parser.add_argument('--output', default='benchmark-results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--only', nargs='+', choices=sorted(SUITES), help='Suites to run')
+    args = parser.parse_args()
+
+    results = run(args.only)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {len(results['metrics'])} metrics to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    else:
+        for key, value in results['metrics'].items():
+            print(f"{key:<64} {value:>12}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark GeminiCorrector._structure_text against the original per-box
+implementation on synthetic register pages.
+
+Usage:
+    python -m benchmarks.structure_text
+"""
+import time
+import random
+from corrector.gemini_corrector import GeminiCorrector
+
+def legacy_structure_text(ocr_result):
+    """
+    The original dict-per-box implementation, kept for comparison
+    """
+    text_elements = []
+    for line in ocr_result:
+        text = line[1][0].strip()
+        if text:
+            text_elements.append({'text': text, 'bbox': line[0], 'confidence': line[1][1]})
+    text_elements.sort(key=lambda x: x['bbox'][0][1])
+
+    rows = []
+    current_row = []
+    previous_y = None
+    for element in text_elements:
+        y = element['bbox'][0][1]
+        if previous_y is not None and abs(y - previous_y) > 10:
+            if current_row:
+                rows.append(current_row)
+                current_row = []
+        current_row.append(element)
+        previous_y = y
+    if current_row:
+        rows.append(current_row)
+
+    structured_text = []
+    for row in rows:
+        row.sort(key=lambda x: x['bbox'][0][0])
+        structured_text.append('\t'.join([e['text'] for e in row]))
+    return '\n'.join(structured_text)
+
+def synthetic_page(num_boxes, columns=4, seed=0, skew=0.0, scale=1.0):
+    """
+    Build a PaddleOCR-shaped result with jittered boxes laid out in rows
+    Args:
+        num_boxes (int): Number of text boxes on the page
+        columns (int): Boxes per row
+        seed (int): Random seed
+        skew (float): Vertical drift in pixels per pixel of x, as on a tilted photo
+        scale (float): Resolution relative to a 1 MP photo of the page
+    Returns:
+        list: PaddleOCR output
+    """
+    rng = random.Random(seed)
+    result = []
+    for i in range(num_boxes):
+        row, column = divmod(i, columns)
+        x = (20 + column * 180 + rng.uniform(-4, 4)) * scale
+        y = (20 + row * 32 + rng.uniform(-3, 3)) * scale + skew * x
+        height = rng.uniform(18, 24) * scale
+        box = [[x, y], [x + 150 * scale, y], [x + 150 * scale, y + height], [x, y + height]]
+        text = f"item{i}" if column == 0 else str(rng.randint(0, 99))
+        result.append([box, [text, rng.uniform(0.6, 0.99)]])
+    rng.shuffle(result)
+    return result
+
+def best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(sizes=(10, 100, 1000, 5000), repeat=5, columns=4, skew=0.02, scale=1.0):
+    """
+    Time both implementations for each page size and count the rows each finds.
+    At scale 2 the same tilted page drifts past the original fixed 10px threshold,
+    which splits every row; the median-height threshold scales with the text.
+    Returns:
+        list: One result dict per page size
+    """
+    corrector = GeminiCorrector()
+    results = []
+    for size in sizes:
+        page = synthetic_page(size, columns=columns, skew=skew, scale=scale)
+        legacy = best_of(legacy_structure_text, page, repeat)
+        current = best_of(corrector._structure_text, page, repeat)
+        results.append({
+            'boxes': size,
+            'scale': scale,
+            'expected_rows': -(-size // columns),
+            'legacy_rows': legacy_structure_text(page).count('\n') + 1,
+            'current_rows': corrector._structure_text(page).count('\n') + 1,
+            'legacy_ms': round(legacy * 1000, 3),
+            'current_ms': round(current * 1000, 3),
+            'speedup': round(legacy / current, 2)
+        })
+    return results
+
+def main():
+    columns = ['scale', 'boxes', 'expected_rows', 'legacy_rows', 'current_rows', 'legacy_ms', 'current_ms', 'speedup']
+    print(' '.join(f"{column:>13}" for column in columns))
+    for result in run() + run(scale=2.0):
+        print(' '.join(f"{result[column]:>13}" for column in columns))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Recorded-fixture stand-ins for PaddleOCR and the Gemini client, so
+benchmarks run offline and give the same answers on every run.
+
+A fixture is a JSON file in benchmarks/fixtures/ with the PaddleOCR
+result for one page ("ocr") and Gemini's raw response text for it
+("gemini_response"). record_fixture() captures one from the real backends.
+"""
+import os
+import re
+import json
+from contextlib import contextmanager
+from unittest.mock import patch
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def load_fixture(name='register_page'):
+    with open(os.path.join(FIXTURE_DIR, f'{name}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+class RecordedOCR:
+    """
+    Stands in for a PaddleOCR engine; every image reads as the recorded page
+    """
+    def __init__(self, fixture):
+        self.result = fixture['ocr']
+        self.calls = 0
+
+    def ocr(self, image, cls=False):
+        self.calls += 1
+        return [self.result]
+
+class RecordedResponse:
+    def __init__(self, text):
+        self.text = text
+
+class RecordedModels:
+    def __init__(self, fixture):
+        self.response = fixture['gemini_response']
+        self.calls = 0
+
+    def generate_content(self, model, contents):
+        self.calls += 1
+        # Batched prompts expect one keyed entry per delimited page
+        pages = re.findall(r'=== PAGE (\S+) ===', contents)
+        if pages:
+            items = json.loads(self.response)
+            return RecordedResponse(json.dumps({page: items for page in pages}))
+        return RecordedResponse(self.response)
+
+class RecordedGeminiClient:
+    """
+    Stands in for google.genai.Client; every prompt gets the recorded response
+    """
+    def __init__(self, fixture):
+        self.models = RecordedModels(fixture)
+
+@contextmanager
+def recorded_backends(fixture=None):
+    """
+    Route OCRProcessor and GeminiCorrector built inside the block to the stand-ins
+    Args:
+        fixture: Loaded fixture; defaults to the register page
+    Yields:
+        tuple: (RecordedOCR, RecordedGeminiClient)
+    """
+    from corrector.gemini_corrector import GeminiCorrector
+
+    fixture = fixture or load_fixture()
+    engine = RecordedOCR(fixture)
+    client = RecordedGeminiClient(fixture)
+    with patch('ocr.ocr_processor.create_paddle_ocr', return_value=engine), \
+            patch.object(GeminiCorrector, 'client', client):
+        yield engine, client
+
+def record_fixture(image_path, name):
+    """
+    Capture a fixture from the real PaddleOCR and Gemini backends
+    Args:
+        image_path: Register photo to read
+        name: Fixture name to write under benchmarks/fixtures/
+    Returns:
+        str: Path of the written fixture
+    """
+    from ocr.ocr_processor import OCRProcessor
+    from corrector.gemini_corrector import GeminiCorrector
+
+    processor = OCRProcessor()
+    result = processor.ocr.ocr(processor.preprocess_image(image_path), cls=False)[0] or []
+    corrector = GeminiCorrector()
+    # Same prompt path as production; the response text is stored verbatim
+    response = corrector._call_gemini(corrector._structure_text(result))
+    if response is None:
+        raise RuntimeError("Gemini did not answer; nothing was recorded")
+
+    path = os.path.join(FIXTURE_DIR, f'{name}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'description': f'Recorded from {os.path.basename(image_path)}',
+            'ocr': [[[[float(x), float(y)] for x, y in box], [text, float(confidence)]]
+                    for box, (text, confidence) in result],
+            'gemini_response': response
+        }, f, ensure_ascii=False)
+    return path
@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+class CorrectionCache:
+    """
+    Two-tier cache of Gemini responses: an in-process LRU in front of an
+    optional SQLite file shared across restarts and processes
+    """
+    def __init__(self, max_entries: int = 512, ttl: float = 7 * 24 * 3600, path: Optional[str] = None):
+        """
+        Initialize the correction cache
+        Args:
+            max_entries: Maximum number of responses held in memory
+            ttl: Seconds before a cached response expires
+            path: SQLite file for the on-disk tier; None keeps the cache in memory only
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS corrections '
+                '(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def normalize_text(structured_text: str) -> str:
+        """
+        Normalize structured text so cosmetic whitespace differences share a key
+        Args:
+            structured_text: Structured text with tabs and newlines
+        Returns:
+            str: Normalized text
+        """
+        lines = []
+        for line in structured_text.splitlines():
+            cells = [re.sub(r' +', ' ', cell.strip()) for cell in line.split('\t')]
+            if any(cells):
+                lines.append('\t'.join(cells))
+        return '\n'.join(lines)
+
+    @classmethod
+    def make_key(cls, structured_text: str, prompt_version: str, model: str) -> str:
+        """
+        Build the cache key for a correction request
+        Args:
+            structured_text: Structured text sent to Gemini
+            prompt_version: Version of the prompt template
+            model: Gemini model name
+        Returns:
+            str: Hex SHA-256 key
+        """
+        payload = '\0'.join([prompt_version, model, cls.normalize_text(structured_text)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response, promoting disk hits into memory
+        Args:
+            key: Cache key from make_key()
+        Returns:
+            str or None: Cached response, or None if missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return response
+                del self._memory[key]
+
+            if self._conn is None:
+                return None
+
+            row = self._conn.execute(
+                'SELECT response, expires_at FROM corrections WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, expires_at = row
+            if expires_at <= now:
+                self._conn.execute('DELETE FROM corrections WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            self._remember(key, response, expires_at)
+            return response
+
+    def put(self, key: str, response: str):
+        """
+        Store a response in both tiers
+        Args:
+            key: Cache key from make_key()
+            response: Gemini response text
+        """
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, response, expires_at)
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO corrections (key, response, expires_at) VALUES (?, ?, ?)',
+                    (key, response, expires_at)
+                )
+                self._conn.commit()
+
+    def _remember(self, key, response, expires_at):
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        """
+        Drop one cached response, or everything when no key is given
+        Args:
+            key: Cache key from make_key(), or None to clear the cache
+        """
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+                if self._conn is not None:
+                    self._conn.execute('DELETE FROM corrections')
+                    self._conn.commit()
+                return
+
+            self._memory.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM corrections WHERE key = ?', (key,))
+                self._conn.commit()
@@ -1,27 +1,237 @@
 import os
 import json
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any
+import statistics
+import contextvars
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+from corrector.correction_cache import CorrectionCache
+from corrector.local_parser import LocalTableParser, LocalParserStats
+from corrector.resilience import CircuitBreaker, ResilientCaller
+from providers import LazyProvider
+from monitoring.metrics import metrics
 
 load_dotenv()
 
+# Bump whenever the prompt in _call_gemini changes so cached responses are not reused
+PROMPT_VERSION = '1'
+
+# Pages with fewer boxes are clustered in plain Python; NumPy's per-call overhead only pays off above this
+VECTORIZE_MIN_BOXES = 2000
+
+def _split_drifting_rows(sorted_centers, row_starts, row_ends, text_height):
+    """
+    Split rows spanning well over a text height: they are several drifting rows
+    chained together by small gaps, so split each against the row's first box
+    instead of its neighbour
+    Args:
+        sorted_centers: Box centers in ascending order
+        row_starts, row_ends: Positions bounding each row in sorted_centers
+        text_height: Median text height of the page
+    Returns:
+        list: Positions where an extra row starts
+    """
+    splits = []
+    for start, end in zip(row_starts, row_ends):
+        if sorted_centers[end - 1] - sorted_centers[start] <= 1.5 * text_height:
+            continue
+        anchor = sorted_centers[start]
+        for position in range(start + 1, end):
+            if sorted_centers[position] - anchor > text_height:
+                splits.append(position)
+                anchor = sorted_centers[position]
+    return splits
+
+def _order_rows(centers, left, text_height):
+    """
+    Group boxes into rows by their centers and order each row left to right
+    Args:
+        centers: Vertical center per box
+        left: Left edge per box
+        text_height: Median text height of the page
+    Returns:
+        tuple: (reading order of box indices, row slices into that order)
+    """
+    order = sorted(range(len(centers)), key=centers.__getitem__)
+    sorted_centers = [centers[i] for i in order]
+    row_threshold = text_height * 0.6
+    row_starts = [0]
+    row_starts += [position for position, (previous, center) in enumerate(zip(sorted_centers, sorted_centers[1:]), 1)
+                   if center - previous > row_threshold]
+    row_ends = row_starts[1:] + [len(order)]
+    splits = _split_drifting_rows(sorted_centers, row_starts, row_ends, text_height)
+    if splits:
+        row_starts = sorted(row_starts + splits)
+        row_ends = row_starts[1:] + [len(order)]
+
+    page_order = []
+    for start, end in zip(row_starts, row_ends):
+        page_order += sorted(order[start:end], key=left.__getitem__)
+    return page_order, list(zip(row_starts, row_ends))
+
+def _order_rows_vectorized(centers, left, text_height):
+    """
+    _order_rows for dense pages, with the sort and row boundaries done in NumPy
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    order = np.argsort(centers, kind='stable')
+    sorted_centers = centers[order]
+    is_row_start = np.empty(len(order), dtype=bool)
+    is_row_start[0] = True
+    is_row_start[1:] = np.diff(sorted_centers) > text_height * 0.6
+
+    row_starts = np.flatnonzero(is_row_start)
+    row_ends = np.append(row_starts[1:], len(order))
+    chained = sorted_centers[row_ends - 1] - sorted_centers[row_starts] > 1.5 * text_height
+    if chained.any():
+        is_row_start[_split_drifting_rows(sorted_centers.tolist(), row_starts[chained].tolist(),
+                                          row_ends[chained].tolist(), text_height)] = True
+
+    sorted_row_ids = np.cumsum(is_row_start)
+    row_ids = np.empty_like(sorted_row_ids)
+    row_ids[order] = sorted_row_ids
+
+    # Order the whole page by row, then by horizontal position, in one sort
+    page_order = np.lexsort((np.asarray(left, dtype=np.float64), row_ids))
+    boundaries = (np.flatnonzero(np.diff(row_ids[page_order])) + 1).tolist()
+    return page_order.tolist(), list(zip([0] + boundaries, boundaries + [len(page_order)]))
+
 class GeminiCorrector:
-    def __init__(self):
+    def __init__(self, model: str = "gemini-2.0-flash", cache: CorrectionCache = None,
+                 max_batch_tokens: int = None, local_parser: LocalTableParser = None,
+                 resilience: ResilientCaller = None):
         """
         Initialize Gemini corrector with API configuration
+        Args:
+            model: Gemini model name
+            cache: Response cache; defaults to one configured from the environment
+            max_batch_tokens: Approximate token budget for the page text of one batched request
+            local_parser: Parser tried before Gemini; defaults to one configured from the environment
+            resilience: Deadline, concurrency cap and circuit breaker for Gemini requests;
+                defaults to one configured from the environment
         """
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
         
-        # Initialize Gemini model
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment variables")
-            
-        self.client = genai.Client(api_key=api_key)
+        # The Gemini client is created on first use
+        self._client = None
+        self.model = model
+
+        if cache is None:
+            cache = CorrectionCache(
+                max_entries=int(os.getenv('GEMINI_CACHE_SIZE', 512)),
+                ttl=float(os.getenv('GEMINI_CACHE_TTL', 7 * 24 * 3600)),
+                path=os.getenv('GEMINI_CACHE_PATH')
+            )
+        self.cache = cache
+
+        if max_batch_tokens is None:
+            max_batch_tokens = int(os.getenv('GEMINI_BATCH_TOKENS', 8000))
+        self.max_batch_tokens = max_batch_tokens
+
+        # Clean printed tables are read locally; LOCAL_PARSER=false sends every page to Gemini
+        if local_parser is None and os.getenv('LOCAL_PARSER', 'true').lower() == 'true':
+            local_parser = LocalTableParser(
+                min_row_confidence=float(os.getenv('LOCAL_PARSER_MIN_ROW_CONFIDENCE', 0.85)),
+                min_page_confidence=float(os.getenv('LOCAL_PARSER_MIN_CONFIDENCE', 0.9))
+            )
+        self.local_parser = local_parser
+        self.local_stats = LocalParserStats()
+
+        # Slow or failing Gemini calls must not tie up request threads
+        if resilience is None:
+            resilience = ResilientCaller(
+                timeout=float(os.getenv('GEMINI_TIMEOUT', 30)),
+                max_concurrent=int(os.getenv('GEMINI_MAX_CONCURRENT', 8)),
+                breaker=CircuitBreaker(
+                    failure_rate=float(os.getenv('GEMINI_BREAKER_FAILURE_RATE', 0.5)),
+                    reset_timeout=float(os.getenv('GEMINI_BREAKER_RESET', 30))
+                ),
+                hedge=os.getenv('GEMINI_HEDGE', 'false').lower() == 'true'
+            )
+        self.resilience = resilience
+
+    @property
+    def client(self):
+        """
+        Gemini API client, created on first use
+        Raises:
+            ValueError: If GEMINI_API_KEY is not configured
+        """
+        if self._client is None:
+            api_key = os.getenv('GEMINI_API_KEY')
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+            # Deferred so importing the corrector stays cheap
+            from google import genai
+            # The HTTP timeout ends requests the deadline has given up on
+            http_options = {'timeout': int(self.resilience.timeout * 1000)}
+            if os.getenv('GEMINI_BASE_URL'):
+                http_options['base_url'] = os.getenv('GEMINI_BASE_URL')
+            self._client = genai.Client(api_key=api_key, http_options=http_options)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def warm_up(self):
+        """
+        Import the Gemini SDK and create the client before the first request
+        Raises:
+            ValueError: If GEMINI_API_KEY is not configured
+        """
+        self.client
+
+    def _order_boxes(self, ocr_result: List):
+        """
+        Cluster OCR boxes into rows and order them top to bottom, left to right. Columns are
+        not bucketed here: LocalTableParser.detect_columns picks the page's quantity and serial
+        columns once per page from these rows, and Gemini reads the tab-separated cells as they are.
+        Args:
+            ocr_result: PaddleOCR output with bounding boxes
+        Returns:
+            tuple: (texts, confidences, reading order of box indices, row slices into that order)
+        """
+        texts, confidences, centers, heights, left = [], [], [], [], []
+        # PaddleOCR corners run clockwise from top-left; the diagonal's midpoint is the box center
+        for ((x0, y0), _, (_, y2), (_, y3)), (text, confidence) in ocr_result or ():
+            text = text.strip()
+            if not text:  # Skip empty text
+                continue
+            texts.append(text)
+            confidences.append(confidence)
+            centers.append((y0 + y2) / 2)
+            heights.append(y3 - y0)
+            left.append(x0)
+        if not texts:
+            return [], [], [], []
+
+        # Boxes whose centers are within 0.6 of a text height share a row. An evenly
+        # spaced sample of about 100 boxes estimates the median height as well as all of them
+        text_height = max(statistics.median(heights[::max(len(heights) // 100, 1)]), 1.0)
+        if len(texts) < VECTORIZE_MIN_BOXES:
+            page_order, rows = _order_rows(centers, left, text_height)
+        else:
+            page_order, rows = _order_rows_vectorized(centers, left, text_height)
+        return texts, confidences, page_order, rows
+
+    def _cluster_rows(self, ocr_result: List) -> List[List[Tuple[str, float]]]:
+        """
+        Group OCR boxes into rows ordered top to bottom, each ordered left to right
+        Args:
+            ocr_result: PaddleOCR output with bounding boxes
+        Returns:
+            List[List[Tuple[str, float]]]: (text, confidence) pairs per row
+        """
+        texts, confidences, page_order, rows = self._order_boxes(ocr_result)
+        return [
+            [(texts[i], confidences[i]) for i in page_order[start:end]]
+            for start, end in rows
+        ]
 
     def _structure_text(self, ocr_result: List) -> str:
         """
@@ -31,60 +241,52 @@ class GeminiCorrector:
         Returns:
             str: Structured text with tabs and newlines
         """
-        # Sort elements by their vertical position
-        text_elements = []
-        for line in ocr_result:
-            bbox = line[0]
-            text = line[1][0].strip()
-            confidence = line[1][1]
-            
-            if text:  # Skip empty text
-                text_elements.append({
-                    'text': text,
-                    'bbox': bbox,
-                    'confidence': confidence
-                })
-        
-        # Sort by vertical position
-        text_elements.sort(key=lambda x: x['bbox'][0][1])
-        
-        # Group into rows based on vertical proximity
-        rows = []
-        current_row = []
-        previous_y = None
-        
-        for element in text_elements:
-            y = element['bbox'][0][1]
-            if previous_y is not None and abs(y - previous_y) > 10:  # New row threshold
-                if current_row:
-                    rows.append(current_row)
-                    current_row = []
-            current_row.append(element)
-            previous_y = y
-        
-        if current_row:
-            rows.append(current_row)
-        
-        # Create structured text
-        structured_text = []
-        for row in rows:
-            # Sort row by horizontal position
-            row.sort(key=lambda x: x['bbox'][0][0])
-            row_text = '\t'.join([e['text'] for e in row])
-            structured_text.append(row_text)
-        
-        return '\n'.join(structured_text)
+        texts, _, page_order, rows = self._order_boxes(ocr_result)
+        ordered = [texts[i] for i in page_order]
+        return '\n'.join('\t'.join(ordered[start:end]) for start, end in rows)
 
-    def _call_gemini(self, structured_text: str) -> str:
+    def _split_page(self, ocr_result: List) -> Tuple[str, List[Dict[str, Any]], Optional[List[int]], Optional[str]]:
         """
-        Call Gemini API to correct and structure the text
+        Structure a page and split it between the local parser and Gemini, without recording stats
         Args:
-            structured_text: Structured text with tabs and newlines
+            ocr_result: PaddleOCR output with bounding boxes
         Returns:
-            str: Gemini API response
+            tuple: (structured text, locally read items, indices of rows left for Gemini or None when
+                   the local parser did not run, text still needing Gemini or None)
         """
+        with metrics.span('structure_text'):
+            rows = self._cluster_rows(ocr_result)
+        structured_text = '\n'.join('\t'.join(text for text, _ in row) for row in rows)
+        if self.local_parser is None or not rows:
+            return structured_text, [], None, structured_text
 
-        prompt = f"""
+        with metrics.span('local_parse'):
+            parsed = self.local_parser.parse(rows)
+        if parsed['confident']:
+            return structured_text, parsed['items'], [], None
+        if parsed['partial']:
+            # Only the rows the parser could not read go to Gemini
+            failed = parsed['failed_rows']
+            failed_text = '\n'.join('\t'.join(text for text, _ in rows[i]) for i in failed)
+            return structured_text, parsed['items'], failed, failed_text
+        return structured_text, [], list(range(len(rows))), structured_text
+
+    def _plan_page(self, ocr_result: List) -> Tuple[str, List[Dict[str, Any]], Optional[str]]:
+        """
+        Structure a page, read what the local parser can and record how the page was split
+        Args:
+            ocr_result: PaddleOCR output with bounding boxes
+        Returns:
+            tuple: (structured text, locally read items, text still needing Gemini or None)
+        """
+        structured_text, local_items, failed_rows, gemini_text = self._split_page(ocr_result)
+        if failed_rows is not None:
+            outcome = 'partial' if failed_rows and local_items else 'gemini' if failed_rows else 'local'
+            self.local_stats.record_page(outcome, rows_local=len(local_items), rows_gemini=len(failed_rows))
+        return structured_text, local_items, gemini_text
+
+    def _page_prompt(self, structured_text: str) -> str:
+        return f"""
             Extract grocery items with their quantities from this register text.
             Important:
             1. Correct any errors in item names resulted from OCR
@@ -96,13 +298,48 @@ class GeminiCorrector:
             {structured_text}
         """
 
+    def _call_gemini(self, structured_text: str) -> str:
+        """
+        Call Gemini API to correct and structure the text
+        Args:
+            structured_text: Structured text with tabs and newlines
+        Returns:
+            str: Gemini API response, or None if the call failed or was refused
+        """
+        prompt = self._page_prompt(structured_text)
+        try:
+            self.logger.info(f"Calling Gemini API with text:\n{structured_text}")
+            models = self.client.models
+            started = time.perf_counter()
+            with metrics.span('gemini'):
+                response = self.resilience.call(lambda: models.generate_content(model=self.model, contents=prompt))
+            self.local_stats.record_gemini(time.perf_counter() - started)
+            return str(response.text)
+        except Exception as e:
+            self.logger.error(f"Gemini API call failed: {str(e)}")
+            return None
+
+    async def _call_gemini_async(self, structured_text: str) -> str:
+        """
+        Await Gemini through the SDK's async client
+        Args:
+            structured_text: Structured text with tabs and newlines
+        Returns:
+            str: Gemini API response, or None if the call failed or was refused
+        """
+        prompt = self._page_prompt(structured_text)
         try:
             self.logger.info(f"Calling Gemini API with text:\n{structured_text}")
-            response = self.client.models.generate_content(model="gemini-2.0-flash", contents=prompt)
+            models = self.client.aio.models
+            started = time.perf_counter()
+            with metrics.span('gemini'):
+                response = await self.resilience.call_async(
+                    lambda: models.generate_content(model=self.model, contents=prompt))
+            self.local_stats.record_gemini(time.perf_counter() - started)
             return str(response.text)
         except Exception as e:
             self.logger.error(f"Gemini API call failed: {str(e)}")
-            return "[]"
+            return None
 
     def _parse_gemini_response(self, response: str) -> List[Dict[str, Any]]:
         """
@@ -122,6 +359,148 @@ class GeminiCorrector:
             self.logger.error(f"Failed to parse Gemini response: {str(e)}")
             return []
 
+    def _call_gemini_batch(self, pages: Dict[str, str]) -> str:
+        """
+        Call Gemini API once for several pages of structured text
+        Args:
+            pages: Structured text keyed by page number
+        Returns:
+            str: Gemini API response, or None if the call failed or was refused
+        """
+        page_text = '\n'.join(
+            f"=== PAGE {page} ===\n{structured_text}" for page, structured_text in pages.items()
+        )
+        prompt = f"""
+            Extract grocery items with their quantities from each page of this register text.
+            Pages are delimited by lines of the form "=== PAGE <number> ===".
+            Important:
+            1. Correct any errors in item names resulted from OCR
+            2. Quantities must represent current inventory count
+            3. If multiple quantity columns exist, use the one that represents inventory
+            4. Output must be pure JSON string, no json markdown such as "```json```"
+            5. Include every page number as a key, with an empty list if the page has no items
+            Format: {{"<page number>": [{{"name": "item", "quantity": count}}]}}
+            Text:
+            {page_text}
+        """
+
+        try:
+            self.logger.info(f"Calling Gemini API with {len(pages)} pages")
+            models = self.client.models
+            started = time.perf_counter()
+            with metrics.span('gemini_batch'):
+                response = self.resilience.call(lambda: models.generate_content(model=self.model, contents=prompt))
+            self.local_stats.record_gemini((time.perf_counter() - started) / len(pages))
+            return str(response.text)
+        except Exception as e:
+            self.logger.error(f"Gemini batch API call failed: {str(e)}")
+            return None
+
+    def _fallback_items(self, ocr_result: List, local_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Best effort items for a page Gemini could not answer for
+        Args:
+            ocr_result: PaddleOCR output with bounding boxes
+            local_items: Rows the local parser already read with confidence
+        Returns:
+            List[Dict[str, Any]]: Confidently read rows, or whatever rows the local parser could read
+        """
+        items = local_items
+        if not items and self.local_parser is not None:
+            items = self.local_parser.parse(self._cluster_rows(ocr_result))['items']
+        self.logger.warning(f"Gemini unavailable, falling back to {len(items)} items read locally")
+        return items
+
+    def available(self) -> bool:
+        """
+        Returns:
+            bool: False while the circuit breaker is refusing Gemini calls
+        """
+        return self.resilience.breaker.state != CircuitBreaker.OPEN
+
+    def _parse_batch_response(self, response: str, pages) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """
+        Parse a keyed batch response into per-page item lists
+        Args:
+            response: Gemini API response text
+            pages: Page numbers that must be present in the response
+        Returns:
+            dict or None: Items keyed by page number, or None if the response is malformed
+        """
+        try:
+            response = response.strip()
+            if not (response.startswith("{") and response.endswith("}")):
+                return None
+            parsed = json.loads(response)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Failed to parse Gemini batch response: {str(e)}")
+            return None
+
+        if not all(isinstance(parsed.get(page), list) for page in pages):
+            self.logger.warning("Gemini batch response is missing pages")
+            return None
+        return {page: parsed[page] for page in pages}
+
+    def _plan_batches(self, pages: Dict[int, str], max_batch_tokens: int) -> List[List[int]]:
+        """
+        Group pages into batches that fit the token budget, preserving page order
+        Args:
+            pages: Structured text keyed by page index
+            max_batch_tokens: Approximate token budget per batch
+        Returns:
+            List[List[int]]: Page indices per batch
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for index, structured_text in pages.items():
+            # Roughly four characters per token
+            tokens = len(structured_text) // 4 + 1
+            if current and current_tokens + tokens > max_batch_tokens:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _prepare_page(self, ocr_result: List) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, str]]]:
+        """
+        Everything about a page that does not need a Gemini call
+        Args:
+            ocr_result: PaddleOCR output with bounding boxes
+        Returns:
+            tuple: (items read so far, (text for Gemini, cache key) or None when the page is done)
+        """
+        # Structure the text and read clean table rows locally
+        structured_text, local_items, gemini_text = self._plan_page(ocr_result)
+        self.logger.info(f"Structured text:\n{structured_text}")
+        if not structured_text:
+            return [], None
+        if gemini_text is None:
+            self.logger.info(f"Read {len(local_items)} items locally, skipping Gemini")
+            return local_items, None
+
+        # Reuse the response for text we have already corrected
+        cache_key = self.cache.make_key(gemini_text, PROMPT_VERSION, self.model)
+        cached_response = self.cache.get(cache_key)
+        if cached_response is not None:
+            self.logger.info("Using cached Gemini response")
+            return local_items + self._parse_gemini_response(cached_response), None
+        return local_items, (gemini_text, cache_key)
+
+    def _finish_page(self, ocr_result: List, local_items: List[Dict[str, Any]], cache_key: str,
+                     gemini_response: Optional[str]) -> List[Dict[str, Any]]:
+        if gemini_response is None:
+            return self._fallback_items(ocr_result, local_items)
+        self.logger.info(f"Gemini response:\n{gemini_response}")
+
+        # Parse the response; only successful extractions are cached
+        items = self._parse_gemini_response(gemini_response)
+        if items:
+            self.cache.put(cache_key, gemini_response)
+        return local_items + items
+
     def parse_ocr_result_with_gemini(self, ocr_result: List) -> List[Dict[str, Any]]:
         """
         Process OCR result using Gemini API
@@ -131,23 +510,120 @@ class GeminiCorrector:
             List[Dict[str, Any]]: List of item dictionaries with names and quantities
         """
         try:
-            # Structure the text
-            structured_text = self._structure_text(ocr_result)
-            self.logger.info(f"Structured text:\n{structured_text}")
-            
-            # Call Gemini API
-            gemini_response = self._call_gemini(structured_text)
-            self.logger.info(f"Gemini response:\n{gemini_response}")
-            
-            # Parse the response
-            return self._parse_gemini_response(gemini_response)
-            
+            items, pending = self._prepare_page(ocr_result)
+            if pending is None:
+                return items
+            gemini_text, cache_key = pending
+            return self._finish_page(ocr_result, items, cache_key, self._call_gemini(gemini_text))
         except Exception as e:
             self.logger.error(f"Error processing OCR result: {str(e)}")
             return []
 
-# Singleton instance
-gemini_corrector = GeminiCorrector()
+    async def _off_loop(self, fn, *args):
+        # Copying the context keeps stage timings attributed to the calling upload
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, contextvars.copy_context().run, fn, *args)
+
+    async def parse_ocr_result_async(self, ocr_result: List) -> List[Dict[str, Any]]:
+        """
+        Process OCR result using Gemini's async client, so the event loop is free while Gemini answers.
+        Structuring, local parsing and the cache lookups run in the loop's default executor.
+        Args:
+            ocr_result: PaddleOCR output with bounding boxes
+        Returns:
+            List[Dict[str, Any]]: List of item dictionaries with names and quantities
+        """
+        try:
+            items, pending = await self._off_loop(self._prepare_page, ocr_result)
+            if pending is None:
+                return items
+            gemini_text, cache_key = pending
+            gemini_response = await self._call_gemini_async(gemini_text)
+            return await self._off_loop(self._finish_page, ocr_result, items, cache_key, gemini_response)
+        except Exception as e:
+            self.logger.error(f"Error processing OCR result: {str(e)}")
+            return []
+
+    def parse_many(self, ocr_results: List[List], max_batch_tokens: int = None) -> List[List[Dict[str, Any]]]:
+        """
+        Process several OCR results with as few Gemini requests as the token budget allows
+        Args:
+            ocr_results: PaddleOCR outputs, one per page
+            max_batch_tokens: Approximate token budget per request; defaults to the corrector's
+        Returns:
+            List[List[Dict[str, Any]]]: Item dictionaries for each page, in input order
+        """
+        max_batch_tokens = max_batch_tokens or self.max_batch_tokens
+        results = [[] for _ in ocr_results]
+
+        # Structure every page, read clean tables locally and serve what we can from the cache
+        pending = {}
+        for index, ocr_result in enumerate(ocr_results):
+            try:
+                structured_text, local_items, gemini_text = self._plan_page(ocr_result)
+            except Exception as e:
+                self.logger.error(f"Error processing OCR result for page {index + 1}: {str(e)}")
+                continue
+            results[index] = local_items
+            if not structured_text or gemini_text is None:
+                continue
+
+            cache_key = self.cache.make_key(gemini_text, PROMPT_VERSION, self.model)
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                results[index] = local_items + self._parse_gemini_response(cached_response)
+            else:
+                pending[index] = (gemini_text, cache_key)
+
+        texts = {index: structured_text for index, (structured_text, _) in pending.items()}
+        for batch in self._plan_batches(texts, max_batch_tokens):
+            parsed = None
+            if len(batch) > 1:
+                pages = {str(index + 1): texts[index] for index in batch}
+                response = self._call_gemini_batch(pages)
+                if response is None:
+                    # Gemini is failing; retrying page by page would only wait on it longer
+                    for index in batch:
+                        results[index] = self._fallback_items(ocr_results[index], results[index])
+                    continue
+                parsed = self._parse_batch_response(response, pages.keys())
+                if parsed is None:
+                    self.logger.warning(f"Falling back to per-page requests for {len(batch)} pages")
+
+            for index in batch:
+                structured_text, cache_key = pending[index]
+                if parsed is not None:
+                    items = parsed[str(index + 1)]
+                    response = json.dumps(items)
+                else:
+                    response = self._call_gemini(structured_text)
+                    if response is None:
+                        results[index] = self._fallback_items(ocr_results[index], results[index])
+                        continue
+                    items = self._parse_gemini_response(response)
+
+                results[index] = results[index] + items
+                if items:
+                    self.cache.put(cache_key, response)
+
+        return results
+
+    def invalidate_cache(self, ocr_result: List = None):
+        """
+        Drop the cached correction for an OCR result, or all cached corrections
+        Args:
+            ocr_result: PaddleOCR output whose correction should be dropped; None clears everything
+        """
+        if ocr_result is None:
+            self.cache.invalidate()
+            return
+        # Pages are cached under the text sent to Gemini, which leaves out rows read locally
+        gemini_text = self._split_page(ocr_result)[3]
+        if gemini_text is not None:
+            self.cache.invalidate(self.cache.make_key(gemini_text, PROMPT_VERSION, self.model))
+
+# Shared instance, built on first use
+gemini_corrector = LazyProvider('gemini_corrector', GeminiCorrector)
 
 def parse_ocr_result_with_gemini(ocr_result: List) -> List[Dict[str, Any]]:
     """
@@ -157,4 +633,24 @@ def parse_ocr_result_with_gemini(ocr_result: List) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: List of item dictionaries
     """
-    return gemini_corrector.parse_ocr_result_with_gemini(ocr_result)
+    return gemini_corrector.get().parse_ocr_result_with_gemini(ocr_result)
+
+async def parse_ocr_result_async(ocr_result: List) -> List[Dict[str, Any]]:
+    """
+    Process OCR result through Gemini's async client
+    Args:
+        ocr_result: PaddleOCR output with bounding boxes
+    Returns:
+        List[Dict[str, Any]]: List of item dictionaries
+    """
+    return await gemini_corrector.get().parse_ocr_result_async(ocr_result)
+
+def parse_many_ocr_results_with_gemini(ocr_results: List[List]) -> List[List[Dict[str, Any]]]:
+    """
+    Process several pages of OCR results through batched Gemini requests
+    Args:
+        ocr_results: PaddleOCR outputs, one per page
+    Returns:
+        List[List[Dict[str, Any]]]: Item dictionaries for each page
+    """
+    return gemini_corrector.get().parse_many(ocr_results)
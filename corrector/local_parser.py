@@ -0,0 +1,183 @@
+import re
+import threading
+from typing import List, Dict, Tuple, Any
+
+# A count, optionally followed by a unit word: "12", "12 pcs", "3x"
+QUANTITY_PATTERN = re.compile(r'^(\d{1,5})\s*(?:pcs?|nos?|units?|x)?\.?$', re.IGNORECASE)
+# Rows that summarise the page rather than count an item
+SUMMARY_WORDS = {'total', 'grand total', 'sub total', 'subtotal', 'sum'}
+
+def parse_quantity(text):
+    match = QUANTITY_PATTERN.match(text.strip())
+    return int(match.group(1)) if match else None
+
+class LocalTableParser:
+    """
+    Read clean "name <TAB> quantity" registers without Gemini. The quantity
+    column is the one with the densest, most confident numeric cells; every
+    row then parses on its own and gets a confidence from its OCR scores.
+    The page is trusted only when enough rows parse and all of them are
+    confident, otherwise the rows that failed are left for Gemini.
+    """
+    def __init__(self, min_row_confidence=0.85, min_page_confidence=0.9, min_rows=3,
+                 max_failed_fraction=0.3):
+        """
+        Initialize the parser
+        Args:
+            min_row_confidence (float): Lowest OCR confidence of a row's cells for it to be trusted
+            min_page_confidence (float): Page score needed to skip Gemini entirely
+            min_rows (int): Fewer item rows than this is not a table worth trusting
+            max_failed_fraction (float): Most rows that may fail for the rest to be kept locally
+        """
+        self.min_row_confidence = min_row_confidence
+        self.min_page_confidence = min_page_confidence
+        self.min_rows = min_rows
+        self.max_failed_fraction = max_failed_fraction
+
+    def _column_cell(self, row, column):
+        side, offset = column
+        index = offset if side == 'left' else len(row) - 1 - offset
+        return index if 0 <= index < len(row) else None
+
+    def _is_serial(self, values):
+        # Row numbers count up by one; a quantity column almost never does
+        steps = [b - a for a, b in zip(values, values[1:])]
+        return len(steps) >= 2 and sum(step == 1 for step in steps) >= 0.8 * len(steps)
+
+    def detect_columns(self, rows):
+        """
+        Pick the quantity column, and a serial number column if there is one
+        Args:
+            rows: (text, confidence) pairs per row, as from GeminiCorrector._cluster_rows
+        Returns:
+            tuple: (quantity column, serial column), each ('left' | 'right', offset) or None
+        """
+        table_rows = [row for row in rows if len(row) >= 2]
+        if not table_rows:
+            return None, None
+
+        best, best_score, serial = None, 0.0, None
+        for column in [('right', 0), ('right', 1), ('right', 2), ('left', 0), ('left', 1)]:
+            values, confidences = [], []
+            for row in table_rows:
+                index = self._column_cell(row, column)
+                if index is None:
+                    continue
+                quantity = parse_quantity(row[index][0])
+                if quantity is not None:
+                    values.append(quantity)
+                    confidences.append(row[index][1])
+            if not values:
+                continue
+            if self._is_serial(values):
+                if column[0] == 'left' and serial is None:
+                    serial = column
+                continue
+            density = len(values) / len(table_rows)
+            score = density * sum(confidences) / len(confidences)
+            if density >= 0.5 and score > best_score:
+                best, best_score = column, score
+        return best, serial
+
+    def parse(self, rows: List[List[Tuple[str, float]]]) -> Dict[str, Any]:
+        """
+        Extract items from clustered OCR rows
+        Args:
+            rows: (text, confidence) pairs per row, top to bottom
+        Returns:
+            dict: items, per-row confidences, indices of rows that failed to parse,
+                  the page confidence and whether the page can skip Gemini
+        """
+        column, serial = self.detect_columns(rows)
+        result = {'items': [], 'failed_rows': [], 'confidence': 0.0, 'confident': False, 'partial': False}
+        if column is None:
+            result['failed_rows'] = list(range(len(rows)))
+            return result
+
+        row_confidences = []
+        for row_index, row in enumerate(rows):
+            index = self._column_cell(row, column) if len(row) >= 2 else None
+            quantity = parse_quantity(row[index][0]) if index is not None else None
+            if quantity is None:
+                # Column titles above the table carry no digits
+                if row_index < 2 and not any(ch.isdigit() for text, _ in row for ch in text):
+                    continue
+                result['failed_rows'].append(row_index)
+                continue
+
+            serial_index = self._column_cell(row, serial) if serial else None
+            name_cells = [
+                cell for i, cell in enumerate(row)
+                if i != index and not (i == serial_index and parse_quantity(cell[0]) is not None)
+            ]
+            name = ' '.join(text for text, _ in name_cells).strip(' .:-|')
+            if name.casefold() in SUMMARY_WORDS:
+                continue
+            if len(name) < 2 or not any(ch.isalpha() for ch in name):
+                result['failed_rows'].append(row_index)
+                continue
+
+            confidence = min(confidence for _, confidence in name_cells + [row[index]])
+            if confidence < self.min_row_confidence:
+                result['failed_rows'].append(row_index)
+                continue
+            result['items'].append({'name': name, 'quantity': quantity})
+            row_confidences.append(confidence)
+
+        parsed, failed = len(result['items']), len(result['failed_rows'])
+        if parsed:
+            result['confidence'] = parsed / (parsed + failed) * sum(row_confidences) / parsed
+        enough_rows = parsed >= self.min_rows
+        result['confident'] = enough_rows and not failed and result['confidence'] >= self.min_page_confidence
+        result['partial'] = enough_rows and bool(failed) \
+            and failed / (parsed + failed) <= self.max_failed_fraction
+        return result
+
+class LocalParserStats:
+    """
+    How often the local parser spared a Gemini call, and roughly how much time that saved
+    """
+    def __init__(self):
+        self.pages = 0
+        self.local_pages = 0
+        self.partial_pages = 0
+        self.rows_local = 0
+        self.rows_gemini = 0
+        self.gemini_calls = 0
+        self.gemini_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_page(self, outcome, rows_local=0, rows_gemini=0):
+        """
+        Args:
+            outcome: 'local', 'partial' or 'gemini'
+            rows_local: Rows read by the local parser
+            rows_gemini: Rows sent to Gemini
+        """
+        with self._lock:
+            self.pages += 1
+            self.local_pages += outcome == 'local'
+            self.partial_pages += outcome == 'partial'
+            self.rows_local += rows_local
+            self.rows_gemini += rows_gemini
+
+    def record_gemini(self, seconds):
+        with self._lock:
+            self.gemini_calls += 1
+            self.gemini_seconds += seconds
+
+    def to_dict(self):
+        with self._lock:
+            average = self.gemini_seconds / self.gemini_calls if self.gemini_calls else 0.0
+            return {
+                'pages': self.pages,
+                'local_pages': self.local_pages,
+                'partial_pages': self.partial_pages,
+                'gemini_pages': self.pages - self.local_pages - self.partial_pages,
+                'hit_rate': self.local_pages / self.pages if self.pages else 0.0,
+                'rows_local': self.rows_local,
+                'rows_gemini': self.rows_gemini,
+                'average_gemini_ms': round(average * 1000, 2),
+                # Every fully local page skipped one Gemini round trip
+                'estimated_ms_saved': round(self.local_pages * average * 1000, 2)
+            }
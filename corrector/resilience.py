@@ -0,0 +1,315 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+
+class GeminiUnavailableError(RuntimeError):
+    """Raised when a Gemini request is refused or does not answer in time"""
+
+class _NoFreeSlot(Exception):
+    """Raised when every request slot is taken"""
+
+class CircuitBreaker:
+    """
+    Stop calling Gemini while it is failing. The breaker opens when enough of
+    the recent calls failed; after a cool-down one trial call is let through,
+    and its outcome either closes the breaker or opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_rate=0.5, window=20, min_calls=5, reset_timeout=30.0, clock=time.monotonic):
+        """
+        Initialize the breaker
+        Args:
+            failure_rate (float): Share of failed recent calls that opens the breaker
+            window (int): Number of recent calls considered
+            min_calls (int): Fewer recent calls than this never open the breaker
+            reset_timeout (float): Seconds the breaker stays open before a trial call
+            clock: Monotonic time source, in seconds
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        Returns:
+            bool: Whether a call may go ahead now
+        """
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_running = False
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def cancel(self):
+        # An allowed call that never reached Gemini says nothing about its health
+        with self._lock:
+            self._trial_running = False
+
+    def record(self, success):
+        """
+        Args:
+            success (bool): Whether the call answered in time
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trial_running = False
+                if success:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failures = len(self._outcomes) - sum(self._outcomes)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._outcomes.clear()
+
+class ResilientCaller:
+    """
+    Run blocking Gemini requests under a deadline, a cap on requests in flight
+    and a circuit breaker. Optionally a duplicate request is sent when the
+    first has taken longer than the recent p95 latency, and whichever answers
+    first is used.
+    """
+    def __init__(self, timeout=30.0, max_concurrent=8, breaker=None, hedge=False, hedge_quantile=95,
+                 hedge_min_samples=20, latency_window=200):
+        """
+        Initialize the caller
+        Args:
+            timeout (float): Seconds a call may take, including waiting for a free slot
+            max_concurrent (int): Requests allowed in flight at once, hedges included
+            breaker (CircuitBreaker): Breaker shared by all calls; defaults to a new one
+            hedge (bool): Send a duplicate request when the first is slow
+            hedge_quantile (float): Latency percentile after which a duplicate is sent
+            hedge_min_samples (int): Successful calls needed before latencies are trusted
+            latency_window (int): Number of recent latencies kept
+        """
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=latency_window)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        # Abandoned requests keep their worker and slot until they return
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='gemini')
+        self._lock = threading.Lock()
+        self.counts = {'calls': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0, 'hedged': 0, 'hedge_wins': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def latency_percentile(self, quantile):
+        """
+        Args:
+            quantile (float): Percentile of recent successful call latencies
+        Returns:
+            float or None: Seconds, or None before enough calls have succeeded
+        """
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return float(np.percentile(self._latencies, quantile))
+
+    def _run(self, fn):
+        try:
+            return fn()
+        finally:
+            self._slots.release()
+
+    def call(self, fn, timeout=None):
+        """
+        Run a request under the deadline, concurrency cap and breaker
+        Args:
+            fn: Blocking function making the request
+            timeout: Seconds allowed for this call; defaults to the caller's timeout
+        Returns:
+            The request's result
+        Raises:
+            GeminiUnavailableError: If the breaker is open, no slot frees up or the deadline passes
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise GeminiUnavailableError("Gemini circuit breaker is open")
+
+        started = time.monotonic()
+        deadline = started + timeout
+        if not self._slots.acquire(timeout=timeout):
+            self.breaker.cancel()
+            self._count('rejected')
+            raise GeminiUnavailableError(f"No free Gemini slot within {timeout:.1f}s")
+        first = self._executor.submit(self._run, fn)
+        attempts = [first]
+        hedge_at = None
+        if self.hedge:
+            p95 = self.latency_percentile(self.hedge_quantile)
+            hedge_at = started + p95 if p95 is not None else None
+
+        error = None
+        while attempts:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, _ = wait(attempts, timeout=max(wake - now, 0), return_when=FIRST_COMPLETED)
+            for attempt in done:
+                attempts.remove(attempt)
+                if attempt.exception() is None:
+                    self.breaker.record(True)
+                    with self._lock:
+                        self._latencies.append(time.monotonic() - started)
+                        self.counts['hedge_wins'] += attempt is not first
+                    return attempt.result()
+                error = attempt.exception()
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                # A duplicate only goes out when it would not queue behind other calls
+                if attempts and self._slots.acquire(blocking=False):
+                    attempts.append(self._executor.submit(self._run, fn))
+                    self._count('hedged')
+
+        self.breaker.record(False)
+        self._count('failures')
+        if not attempts:
+            raise error
+        self._count('timeouts')
+        raise GeminiUnavailableError(f"Gemini did not answer within {timeout:.1f}s")
+
+    @asynccontextmanager
+    async def _slot(self, deadline=None):
+        """
+        Hold one of the request slots shared with threaded callers
+        Args:
+            deadline: time.monotonic() by which a slot must free up; None takes one only if free now
+        Raises:
+            _NoFreeSlot: If no slot frees up in time
+        """
+        # Polling, not blocking, keeps the event loop free while threaded callers hold the slots
+        while not self._slots.acquire(blocking=False):
+            if deadline is None or time.monotonic() >= deadline:
+                raise _NoFreeSlot()
+            await asyncio.sleep(0.01)
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    async def _hedge(self, factory):
+        # A duplicate only goes out when it would not queue behind other calls. The slot is
+        # taken inside the task, so a duplicate cancelled before it starts never holds one
+        async with self._slot():
+            self._count('hedged')
+            return await factory()
+
+    async def call_async(self, factory, timeout=None):
+        """
+        Await a request under the same deadline, concurrency cap and breaker as call()
+        Args:
+            factory: Function returning a new awaitable request each time it is called
+            timeout: Seconds allowed for this call; defaults to the caller's timeout
+        Returns:
+            The request's result
+        Raises:
+            GeminiUnavailableError: If the breaker is open, no slot frees up or the deadline passes
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise GeminiUnavailableError("Gemini circuit breaker is open")
+
+        started = time.monotonic()
+        deadline = started + timeout
+        try:
+            async with self._slot(deadline):
+                return await self._race_async(factory, started, deadline, timeout)
+        except _NoFreeSlot:
+            self.breaker.cancel()
+            self._count('rejected')
+            raise GeminiUnavailableError(f"No free Gemini slot within {timeout:.1f}s") from None
+
+    async def _race_async(self, factory, started, deadline, timeout):
+        # The caller holds the first request's slot until this returns
+        first = asyncio.ensure_future(factory())
+        attempts = {first}
+        hedge_at = None
+        if self.hedge:
+            p95 = self.latency_percentile(self.hedge_quantile)
+            hedge_at = started + p95 if p95 is not None else None
+
+        error = None
+        try:
+            while attempts:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                wake = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(attempts, timeout=max(wake - now, 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    attempts.discard(attempt)
+                    if attempt.exception() is None:
+                        self.breaker.record(True)
+                        with self._lock:
+                            self._latencies.append(time.monotonic() - started)
+                            self.counts['hedge_wins'] += attempt is not first
+                        return attempt.result()
+                    # A duplicate that found every slot taken never went out
+                    if not isinstance(attempt.exception(), _NoFreeSlot):
+                        error = attempt.exception()
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if attempts:
+                        attempts.add(asyncio.ensure_future(self._hedge(factory)))
+        except asyncio.CancelledError:
+            self.breaker.cancel()
+            raise
+        finally:
+            # Unlike a thread, an abandoned request can be cancelled outright
+            for attempt in attempts:
+                attempt.cancel()
+
+        self.breaker.record(False)
+        self._count('failures')
+        if not attempts:
+            raise error
+        self._count('timeouts')
+        raise GeminiUnavailableError(f"Gemini did not answer within {timeout:.1f}s")
+
+    def to_dict(self):
+        p95 = self.latency_percentile(95)
+        with self._lock:
+            return dict(self.counts, state=self.breaker.state, in_flight_limit=self.max_concurrent,
+                        p95_ms=round(p95 * 1000, 2) if p95 is not None else None)
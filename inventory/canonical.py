@@ -0,0 +1,338 @@
+import re
+import logging
+import threading
+import weakref
+from collections import Counter, defaultdict
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.sqlite import insert
+from models import db, CanonicalItem, ItemAlias, InventoryUpload, InventoryItem
+from inventory.stock import normalize_item_name
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Pack sizes and counts inside a name: "1l", "5 kg", "12"
+SIZE_PATTERN = re.compile(
+    r'\b\d+(?:\.\d+)?\s*(?:kg|g|gm|gms|mg|l|ltr|litre|liter|ml|pcs?|pack|dozen|oz|lb)?\b'
+)
+
+def split_name(key):
+    """
+    Separate a normalized name into its product words and its pack sizes
+    Args:
+        key: Name from normalize_item_name()
+    Returns:
+        tuple: (product words, sorted tuple of sizes)
+    """
+    sizes = tuple(sorted(match.group().replace(' ', '') for match in SIZE_PATTERN.finditer(key)))
+    core = ' '.join(SIZE_PATTERN.sub(' ', key).split())
+    return core or key, sizes
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (a swap of neighbours counts as one edit)
+    Args:
+        a, b: Strings to compare
+        limit: Stop early once the distance must exceed this
+    Returns:
+        int: Distance, or limit + 1 if it is larger than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+# Characters OCR and handwriting readily mistake for one another
+LOOKALIKES = [frozenset(group) for group in ('il1|', 'o0', 'ce', 'uv', 'nh', 's5', 'z2', 'b6', 'gq9')]
+
+def allowed_edits(core):
+    # Short names are too easy to confuse: "tea" and "pea" are different products
+    if len(core) < 4:
+        return 0
+    return 1 if len(core) <= 8 else 2
+
+def lookalike_substitution(a, b):
+    """
+    Whether two equal-length names differ only where one character was misread as a similar one
+    Args:
+        a, b: Strings to compare
+    Returns:
+        bool: False if any differing pair of characters does not look alike
+    """
+    return all(x == y or any(x in group and y in group for group in LOOKALIKES) for x, y in zip(a, b))
+
+def plausible_misspelling(core, item_core):
+    """
+    Whether a name within the edit limit of an item could be a misreading of it.
+    Up to 8 letters a single edit may be a swap of neighbours, a dropped or extra
+    letter, or a look-alike character; "butter" and "batter" are different products.
+    Args:
+        core: Product words of the new spelling
+        item_core: Product words of the canonical item
+    Returns:
+        bool: Whether the two may be matched
+    """
+    if len(core) > 8 or len(core) != len(item_core):
+        return True
+    differing = [i for i, (x, y) in enumerate(zip(core, item_core)) if x != y]
+    # Swapped neighbours
+    if len(differing) == 2 and differing[1] == differing[0] + 1 \
+            and core[differing[0]] == item_core[differing[1]] and core[differing[1]] == item_core[differing[0]]:
+        return True
+    return lookalike_substitution(core, item_core)
+
+class UserItemIndex:
+    """
+    One user's canonical items: an exact alias map for names seen before and a
+    character-trigram inverted index for finding near matches of new spellings
+    """
+    def __init__(self, max_candidates=64):
+        self.max_candidates = max_candidates
+        self.aliases = {}
+        self.items = {}
+        self.postings = defaultdict(list)
+
+    def add_item(self, item_id, key):
+        core, sizes = split_name(key)
+        grams = trigrams(core)
+        self.items[item_id] = (key, core, sizes, len(grams))
+        for gram in grams:
+            self.postings[gram].append(item_id)
+
+    def add_alias(self, key, item_id):
+        self.aliases[key] = item_id
+
+    def key_for(self, item_id):
+        return self.items[item_id][0]
+
+    def match(self, key):
+        """
+        Canonical item a spelling refers to
+        Args:
+            key: Normalized name
+        Returns:
+            int or None: Item id, or None if no item is close enough
+        """
+        item_id = self.aliases.get(key)
+        if item_id is not None:
+            return item_id
+
+        core, sizes = split_name(key)
+        limit = allowed_edits(core)
+        grams = trigrams(core)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+
+        # Rank candidates by trigram overlap, then settle on the closest spelling
+        best, best_rank = None, None
+        for item_id, count in shared.most_common(self.max_candidates):
+            _, item_core, item_sizes, item_grams = self.items[item_id]
+            # "Sugar 1kg" and "Sugar 5kg" are different products; a missing size is not
+            if sizes and item_sizes and sizes != item_sizes:
+                continue
+            if item_core != core and len(core) < 6 and item_core[:1] != core[:1]:
+                continue
+            distance = edit_distance(core, item_core, limit)
+            if distance > limit or not plausible_misspelling(core, item_core):
+                continue
+            rank = (distance, -2 * count / (len(grams) + item_grams))
+            if best_rank is None or rank < best_rank:
+                best, best_rank = item_id, rank
+        return best
+
+class CanonicalIndex:
+    """
+    Map item names to per-user canonical item ids, so "Milk", "milk 1L" and
+    "Mlik" are counted as one product. Items and every spelling seen are
+    stored in canonical_item and item_alias; each user's index is loaded from
+    them on first use and grows as uploads are saved.
+    """
+    def __init__(self, max_candidates=64):
+        """
+        Initialize the index
+        Args:
+            max_candidates (int): Trigram candidates compared by edit distance per new spelling
+        """
+        self.max_candidates = max_candidates
+        # Loaded indexes per engine, so apps on different databases never share ids
+        self._engines = weakref.WeakKeyDictionary()
+        self._lock = threading.RLock()
+
+    def _users(self, session):
+        engine = session.get_bind()
+        users = self._engines.get(engine)
+        if users is None:
+            users = self._engines[engine] = {}
+        return users
+
+    def _load(self, session, user_id):
+        users = self._users(session)
+        index = users.get(user_id)
+        if index is None:
+            index = UserItemIndex(self.max_candidates)
+            for item_id, key in session.execute(
+                    select(CanonicalItem.id, CanonicalItem.item_key).where(CanonicalItem.user_id == user_id)):
+                index.add_item(item_id, key)
+            for key, item_id in session.execute(
+                    select(ItemAlias.alias_key, ItemAlias.item_id).where(ItemAlias.user_id == user_id)):
+                index.add_alias(key, item_id)
+            users[user_id] = index
+        return index
+
+    def invalidate(self, user_ids=None):
+        """
+        Drop loaded indexes so they are read again from the database
+        Args:
+            user_ids: Users to drop; None drops all
+        """
+        with self._lock:
+            for users in self._engines.values():
+                if user_ids is None:
+                    users.clear()
+                for user_id in user_ids or ():
+                    users.pop(user_id, None)
+
+    def lookup(self, session, user_id, name):
+        """
+        Canonical item id for a name, without creating one
+        Args:
+            session: SQLAlchemy session
+            user_id: Owner of the items
+            name: Item name as read
+        Returns:
+            int or None: Item id
+        """
+        key = normalize_item_name(name)
+        if not key:
+            return None
+        with self._lock:
+            return self._load(session, user_id).match(key)
+
+    def item_ids(self, session, user_id, names):
+        """
+        Canonical item ids for names, without creating items
+        Args:
+            session: SQLAlchemy session
+            user_id: Owner of the items
+            names: Item names as read
+        Returns:
+            list: Item id per name; None where a name matches no item
+        """
+        keys = [normalize_item_name(name) for name in names]
+        with self._lock:
+            index = self._load(session, user_id)
+            return [index.match(key) if key else None for key in keys]
+
+    def resolve(self, session, user_id, name):
+        """
+        Canonical item for a name, creating one for a new product. Runs in the
+        caller's transaction; a rollback drops the user's loaded index.
+        Args:
+            session: SQLAlchemy session; the caller commits
+            user_id: Owner of the items
+            name: Item name as read
+        Returns:
+            tuple: (item id, canonical key), or (None, None) for an empty name
+        """
+        key = normalize_item_name(name)
+        if not key:
+            return None, None
+        with self._lock:
+            index = self._load(session, user_id)
+            item_id = index.match(key)
+            if item_id is not None and key in index.aliases:
+                return item_id, index.key_for(item_id)
+
+            # One round trip for a new spelling of a known item, two for a new item
+            session.info.setdefault('canonical_users', set()).add(user_id)
+            if item_id is None:
+                item_id = self._create_item(session, user_id, key, name)
+                if item_id not in index.items:
+                    index.add_item(item_id, key)
+            # Another process may have mapped this spelling already; its mapping wins
+            stmt = insert(ItemAlias).values(user_id=user_id, alias_key=key, item_id=item_id)
+            item_id = session.scalar(stmt.on_conflict_do_update(index_elements=['user_id', 'alias_key'],
+                                                                set_={'item_id': ItemAlias.item_id})
+                                     .returning(ItemAlias.item_id))
+            if item_id not in index.items:
+                self.invalidate([user_id])
+                index = self._load(session, user_id)
+            index.add_alias(key, item_id)
+            return item_id, index.key_for(item_id)
+
+    def _create_item(self, session, user_id, key, name):
+        # The no-op update makes RETURNING give the id when another process created the item first
+        stmt = insert(CanonicalItem).values(user_id=user_id, item_key=key, name=name.strip())
+        return session.scalar(stmt.on_conflict_do_update(index_elements=['user_id', 'item_key'],
+                                                         set_={'item_key': stmt.excluded.item_key})
+                              .returning(CanonicalItem.id))
+
+    def annotate(self, session, uploads):
+        """
+        Give every item in a set of uploads its canonical id and key
+        Args:
+            session: SQLAlchemy session; the caller commits
+            uploads: (user_id, upload_id, upload_time, items) tuples; items are updated in place
+        """
+        for user_id, _, _, items in uploads:
+            for item in items:
+                if 'item_id' not in item:
+                    item['item_id'], item['item_key'] = self.resolve(session, user_id, item['name'])
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_uncommitted(session):
+    # Items and aliases created in the rolled back transaction no longer exist
+    users = session.info.pop('canonical_users', None)
+    if users:
+        canonical_index.invalidate(users)
+
+@event.listens_for(Session, 'after_commit')
+def _keep_committed(session):
+    session.info.pop('canonical_users', None)
+
+def assign_item_ids(user_id=None, batch_size=5000):
+    """
+    Resolve the names of saved items that have no canonical id yet
+    Args:
+        user_id: Only resolve this user's items; None resolves everyone's
+        batch_size: Items updated per round trip
+    Returns:
+        int: Number of items given an id
+    """
+    query = select(InventoryItem.id, InventoryItem.name, InventoryUpload.user_id) \
+        .join(InventoryUpload, InventoryItem.upload_id == InventoryUpload.id) \
+        .where(InventoryItem.item_id.is_(None)) \
+        .order_by(InventoryUpload.upload_time, InventoryUpload.id, InventoryItem.id)
+    if user_id is not None:
+        query = query.where(InventoryUpload.user_id == user_id)
+
+    rows = db.session.execute(query).all()
+    updates = []
+    for item_id, name, owner in rows:
+        canonical_id, _ = canonical_index.resolve(db.session, owner, name)
+        if canonical_id is not None:
+            updates.append({'id': item_id, 'item_id': canonical_id})
+    for start in range(0, len(updates), batch_size):
+        db.session.execute(update(InventoryItem), updates[start:start + batch_size])
+    db.session.commit()
+    logger.info(f"Assigned canonical ids to {len(updates)} items")
+    return len(updates)
+
+# Singleton instance
+canonical_index = CanonicalIndex()
@@ -0,0 +1,66 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.orm import selectinload
+from models import InventoryUpload
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(upload):
+    """
+    Opaque cursor pointing just past an upload in newest-first order
+    Args:
+        upload: Last InventoryUpload of a page
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = json.dumps([upload.upload_time.isoformat(), upload.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor from encode_cursor()
+    Args:
+        cursor: URL-safe cursor
+    Returns:
+        tuple: (upload_time, upload id)
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        upload_time, upload_id = json.loads(raw)
+        return datetime.fromisoformat(upload_time), int(upload_id)
+    except Exception:
+        raise ValueError("Invalid history cursor")
+
+def history_page(user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of a user's uploads, newest first, with items loaded in a single extra query.
+    Pages are keyed on (upload_time, id) so each is an index range scan, however deep.
+    Args:
+        user_id: Owner of the uploads
+        cursor: Cursor from a previous page, or None for the newest uploads
+        limit: Uploads per page, capped at MAX_PAGE_SIZE
+    Returns:
+        tuple: (list of InventoryUpload, cursor for the next page or None)
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query = InventoryUpload.query \
+        .options(selectinload(InventoryUpload.items)) \
+        .filter(InventoryUpload.user_id == user_id)
+    if cursor:
+        # Uploads saved in one batch share a timestamp; the id breaks the tie
+        query = query.filter(tuple_(InventoryUpload.upload_time, InventoryUpload.id) < decode_cursor(cursor))
+
+    # Fetch one extra row to learn whether another page follows
+    uploads = query.order_by(InventoryUpload.upload_time.desc(), InventoryUpload.id.desc()) \
+        .limit(limit + 1).all()
+    if len(uploads) > limit:
+        uploads = uploads[:limit]
+        return uploads, encode_cursor(uploads[-1])
+    return uploads, None
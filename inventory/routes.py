@@ -1,13 +1,38 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify, abort
 from flask_login import login_required, current_user
-from models import InventoryUpload
+from inventory.history import history_page, DEFAULT_PAGE_SIZE
+from inventory.stock import get_current_stock
 
 inventory = Blueprint('inventory', __name__)
 
 @inventory.route('/history')
 @login_required
 def history():
-    # Get all uploads for the current user, ordered by upload time
-    uploads = InventoryUpload.query.filter_by(user_id=current_user.id).order_by(InventoryUpload.upload_time.desc()).all()
-    
-    return render_template('inventory/history.html', uploads=uploads)
+    # One page of uploads for the current user, newest first
+    try:
+        uploads, next_cursor = history_page(current_user.id, request.args.get('cursor'),
+                                            request.args.get('limit', DEFAULT_PAGE_SIZE, type=int))
+    except ValueError:
+        abort(400)
+
+    return render_template('inventory/history.html', uploads=uploads, next_cursor=next_cursor,
+                           is_first_page=not request.args.get('cursor'))
+
+@inventory.route('/api/history')
+@login_required
+def api_history():
+    try:
+        uploads, next_cursor = history_page(current_user.id, request.args.get('cursor'),
+                                            request.args.get('limit', DEFAULT_PAGE_SIZE, type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'uploads': [upload.to_dict() for upload in uploads],
+        'next_cursor': next_cursor
+    })
+
+@inventory.route('/api/stock')
+@login_required
+def api_stock():
+    return jsonify({'items': [row.to_dict() for row in get_current_stock(current_user.id)]})
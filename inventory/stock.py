@@ -0,0 +1,105 @@
+import logging
+from sqlalchemy import select, delete, insert as core_insert
+from sqlalchemy.dialects.sqlite import insert
+from models import db, CurrentStock, CanonicalItem, InventoryUpload, InventoryItem
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def normalize_item_name(name):
+    """
+    Key under which an item's stock is tracked
+    Args:
+        name: Item name as read from the register
+    Returns:
+        str: Casefolded name with whitespace collapsed
+    """
+    return ' '.join(str(name).casefold().split())
+
+def stock_rows(user_id, upload_id, upload_time, items):
+    """
+    current_stock rows for one upload; an item repeated on the page keeps its last quantity.
+    Items must already carry their canonical id and key (CanonicalIndex.annotate).
+    """
+    rows = {}
+    for item in items:
+        item_id = item.get('item_id')
+        if item_id is not None:
+            rows[item_id] = {'user_id': user_id, 'item_id': item_id, 'item_key': item['item_key'],
+                             'name': item['name'], 'quantity': item['quantity'], 'upload_id': upload_id,
+                             'updated_at': upload_time}
+    return list(rows.values())
+
+def update_current_stock(session, uploads):
+    """
+    Upsert the stock of every item in the given uploads. Runs in the caller's
+    transaction; a row only moves forward in time, so saving an older page
+    never overwrites a newer count.
+    Args:
+        session: SQLAlchemy session; the caller commits
+        uploads: (user_id, upload_id, upload_time, items) tuples
+    """
+    from inventory.canonical import canonical_index
+    canonical_index.annotate(session, uploads)
+    rows = [row for upload in uploads for row in stock_rows(*upload)]
+    if not rows:
+        return
+
+    stmt = insert(CurrentStock)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'item_id'],
+        set_={
+            'item_key': stmt.excluded.item_key,
+            'name': stmt.excluded.name,
+            'quantity': stmt.excluded.quantity,
+            'upload_id': stmt.excluded.upload_id,
+            'updated_at': stmt.excluded.updated_at
+        },
+        where=stmt.excluded.updated_at >= CurrentStock.updated_at
+    )
+    session.execute(stmt, rows)
+
+def get_current_stock(user_id):
+    """
+    Latest quantity of every item a user has recorded
+    Args:
+        user_id: Owner of the stock
+    Returns:
+        list: CurrentStock rows ordered by name
+    """
+    return CurrentStock.query.filter_by(user_id=user_id).order_by(CurrentStock.item_key).all()
+
+def rebuild_current_stock(user_id=None, batch_size=5000):
+    """
+    Recompute current_stock from the full upload history. Saved items without a
+    canonical id are skipped; run assign_item_ids() first to match them.
+    Args:
+        user_id: Only rebuild this user's stock; None rebuilds everyone's
+        batch_size: History rows fetched per round trip
+    Returns:
+        int: Number of stock rows written
+    """
+    history = select(
+        InventoryUpload.user_id, InventoryItem.item_id, CanonicalItem.item_key, InventoryItem.name,
+        InventoryItem.quantity, InventoryUpload.id, InventoryUpload.upload_time
+    ).join(InventoryItem, InventoryItem.upload_id == InventoryUpload.id) \
+        .join(CanonicalItem, CanonicalItem.id == InventoryItem.item_id) \
+        .order_by(InventoryUpload.upload_time, InventoryUpload.id, InventoryItem.id)
+    clear = delete(CurrentStock)
+    if user_id is not None:
+        history = history.where(InventoryUpload.user_id == user_id)
+        clear = clear.where(CurrentStock.user_id == user_id)
+
+    # Replay history oldest first; the last count of each item wins
+    latest = {}
+    for owner, item_id, key, name, quantity, upload_id, upload_time in \
+            db.session.execute(history.execution_options(yield_per=batch_size)):
+        latest[(owner, item_id)] = {'user_id': owner, 'item_id': item_id, 'item_key': key, 'name': name,
+                                    'quantity': quantity, 'upload_id': upload_id, 'updated_at': upload_time}
+
+    db.session.execute(clear)
+    if latest:
+        db.session.execute(core_insert(CurrentStock), list(latest.values()))
+    db.session.commit()
+    logger.info(f"Rebuilt current stock: {len(latest)} items")
+    return len(latest)
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from ocr.ocr_processor import ocr_processor
+from ocr.result_cache import result_cache, image_digest
+from corrector.gemini_corrector import parse_ocr_result_async
+from logic.reorder_logic import generate_reorder_suggestions
+from jobs.pipeline import no_items_response, build_response, queue_notification
+from monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class AsyncPipeline:
+    """
+    The upload pipeline for an event loop. Preprocessing and OCR run in a
+    thread pool, Gemini is awaited through the SDK's async client, and each
+    database step runs in the pool under its own app context, so one worker
+    can have many uploads in flight. Results match run_upload_pipeline's.
+    Synchronous callers hand uploads to the pipeline's own long-lived loop
+    with submit(), which keeps the async Gemini client on a single loop.
+    """
+    def __init__(self, app=None, cpu_workers=4):
+        """
+        Initialize the pipeline
+        Args:
+            app: Flask application whose database the pipeline writes to
+            cpu_workers (int): Threads for preprocessing, OCR and database work
+        """
+        self.app = app
+        self.cpu_workers = cpu_workers
+        self._executor = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read pipeline settings from the Flask config
+        Args:
+            app: Flask application
+        """
+        self.app = app
+        self.cpu_workers = app.config.get('ASYNC_CPU_WORKERS', self.cpu_workers)
+        app.extensions['async_pipeline'] = self
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix='pipeline')
+        return self._executor
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='async-pipeline', daemon=True).start()
+                self._loop = loop
+        return self._loop
+
+    def submit(self, image_data, filename, user_id, phone_number=None, quality=None):
+        """
+        Run process_upload on the pipeline's event loop
+        Args:
+            image_data: Encoded image bytes
+            filename: Sanitized name of the uploaded file
+            user_id: Owner of the upload
+            phone_number: Optional WhatsApp number to notify
+            quality: Report from the upload's quality check, so its tilt estimate is reused
+        Returns:
+            concurrent.futures.Future: Resolves to (response payload, HTTP status code)
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.process_upload(image_data, filename, user_id, phone_number, quality), self.loop)
+
+    async def _in_executor(self, fn, *args):
+        # Copying the context keeps stage timings attributed to this upload
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, fn, *args)
+
+    async def _in_app(self, fn, *args):
+        # A fresh app context gives every step its own session, even with uploads in flight side by side
+        def run():
+            with self.app.app_context():
+                return fn(*args)
+        return await self._in_executor(run)
+
+    async def process_upload(self, image_data, filename, user_id, phone_number=None, quality=None):
+        """
+        Run OCR, reorder suggestions and WhatsApp notification for an upload
+        Args:
+            image_data: Encoded image bytes
+            filename: Sanitized name of the uploaded file
+            user_id: Owner of the upload
+            phone_number: Optional WhatsApp number to notify
+            quality: Report from the upload's quality check, so its tilt estimate is reused
+        Returns:
+            tuple: (response payload, HTTP status code)
+        """
+        # Loading PaddleOCR on first use blocks, so it happens off the loop too
+        processor = await self._in_executor(ocr_processor.get)
+
+        # Re-uploads of the same photo skip OCR and Gemini entirely
+        digest = image_digest(image_data)
+        with metrics.span('result_cache'):
+            items = await self._in_app(result_cache.get, digest, False)
+        cached = items is not None
+        if not cached:
+            try:
+                ocr_result = await self._in_executor(processor.read_page, image_data, quality)
+            except Exception as e:
+                logger.error(f"Error processing image {filename}: {str(e)}")
+                return no_items_response()
+            items = await parse_ocr_result_async(ocr_result)
+
+        try:
+            items, upload_id = await self._in_app(processor.save_items, user_id, filename, items, digest, cached)
+        except Exception as e:
+            logger.error(f"Error saving image {filename}: {str(e)}")
+            items = None
+        if not items:
+            return no_items_response()
+
+        # Generate reorder suggestions from detected items
+        reorder_suggestions = await self._in_app(lambda: generate_reorder_suggestions(items, user_id=user_id))
+        if not reorder_suggestions:
+            return {'error': 'Failed to generate suggestions'}, 500
+
+        response = build_response(items, reorder_suggestions, filename)
+        if phone_number:
+            await self._in_app(queue_notification, response, phone_number, reorder_suggestions, user_id)
+        return response, 200
+
+# Singleton instance
+async_pipeline = AsyncPipeline()
+
+async def process_upload(image_data, filename, user_id, phone_number=None, quality=None):
+    """
+    Run the upload pipeline without blocking the event loop
+    Args:
+        image_data: Encoded image bytes
+        filename: Sanitized name of the uploaded file
+        user_id: Owner of the upload
+        phone_number: Optional WhatsApp number to notify
+        quality: Report from the upload's quality check, so its tilt estimate is reused
+    Returns:
+        tuple: (response payload, HTTP status code)
+    """
+    return await async_pipeline.process_upload(image_data, filename, user_id, phone_number, quality)
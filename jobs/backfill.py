@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import logging
+import itertools
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from concurrent.futures import Future, ProcessPoolExecutor
+from sqlalchemy import func
+from models import db, InventoryUpload, ItemStats
+from ocr.result_cache import result_cache, image_digest
+from storage.inventory_writer import insert_uploads
+from logic.item_stats import rebuild_item_stats
+from monitoring.metrics import collect_timings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Processor owned by the current worker process
+_worker_processor = None
+
+# Files handed to the pool ahead of the one being saved, per worker process
+READ_AHEAD_PER_PROCESS = 4
+
+def create_processor(cpu_threads):
+    """
+    Build an OCRProcessor that runs PaddleOCR in the calling process
+    Args:
+        cpu_threads (int): PaddleOCR inference threads
+    Returns:
+        OCRProcessor: Processor for one worker
+    """
+    from ocr.ocr_processor import OCRProcessor
+    return OCRProcessor(processes=0, cpu_threads=cpu_threads)
+
+def _init_worker(processor_factory, cpu_threads):
+    # Load PaddleOCR once per worker so every file runs on a warm engine
+    global _worker_processor
+    _worker_processor = processor_factory(cpu_threads)
+
+def _read_file(path):
+    """
+    Run preprocessing, OCR and Gemini correction on one file in a worker
+    Returns:
+        dict: Items or error, with per-stage timings
+    """
+    with collect_timings() as timings:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            items = _worker_processor.extract_items(data)
+            error = None
+        except Exception as e:
+            items, error = [], str(e)
+    return {'items': items or [], 'error': error, 'timings': timings.to_dict()}
+
+def list_images(directory, extensions):
+    """
+    Image files under a directory, oldest first
+    Args:
+        directory: Root directory, searched recursively
+        extensions: Allowed image file extensions
+    Returns:
+        list: (relative path, modification time) pairs
+    """
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in names:
+            if name.startswith('.') or '.' not in name or name.rsplit('.', 1)[1].lower() not in extensions:
+                continue
+            path = os.path.join(root, name)
+            files.append((os.path.relpath(path, directory), os.path.getmtime(path)))
+    return sorted(files, key=lambda entry: (entry[1], entry[0]))
+
+def load_checkpoint(report_path):
+    """
+    Files a previous run already finished, from its report
+    Args:
+        report_path: JSONL report of the previous run
+    Returns:
+        set: Relative paths that were saved or had no items; failed files are retried
+    """
+    done = set()
+    if not os.path.exists(report_path):
+        return done
+    with open(report_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash
+                continue
+            if entry.get('status') in ('saved', 'empty'):
+                done.add(entry['file'])
+    return done
+
+class Backfill:
+    """
+    Read a directory of register photos into one user's history: OCR and
+    Gemini run in a process pool, uploads are written in bulk transactions,
+    and every file gets a line in a JSONL report that doubles as the
+    checkpoint a rerun resumes from.
+    """
+    def __init__(self, directory, user_id, report_path, processes=None, cpu_threads=None,
+                 batch_size=50, use_mtime=True, extensions=('png', 'jpg', 'jpeg', 'gif'),
+                 processor_factory=create_processor):
+        """
+        Initialize the backfill
+        Args:
+            directory: Directory of photos, searched recursively
+            user_id: Owner of the backfilled uploads
+            report_path: JSONL report; an existing one is resumed from
+            processes (int): Worker processes; 0 reads files in this process
+            cpu_threads (int): PaddleOCR inference threads per worker
+            batch_size (int): Uploads written per transaction
+            use_mtime (bool): Date each upload by its file's modification time instead of now
+            extensions: Image file extensions to read
+            processor_factory: Picklable callable building a processor from cpu_threads
+        """
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if cpu_threads is None:
+            cpu_threads = max(1, (os.cpu_count() or 1) // max(processes, 1))
+        self.directory = directory
+        self.user_id = user_id
+        self.report_path = report_path
+        self.processes = processes
+        self.cpu_threads = cpu_threads
+        self.batch_size = batch_size
+        self.use_mtime = use_mtime
+        self.extensions = {extension.lower() for extension in extensions}
+        self.processor_factory = processor_factory
+        self.counts = {'saved': 0, 'empty': 0, 'failed': 0, 'skipped': 0}
+        # Newest count already folded into the user's usage statistics
+        self._stats_until = None
+        self._stats_stale = False
+
+    def _upload_time(self, mtime):
+        if not self.use_mtime:
+            return datetime.utcnow()
+        # Upload times are naive UTC throughout the app
+        return datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None)
+
+    def pending(self):
+        """
+        Files still to read, skipping those finished by an earlier run
+        Returns:
+            list: (relative path, upload time) pairs, oldest first
+        """
+        done = load_checkpoint(self.report_path)
+        images = list_images(self.directory, self.extensions)
+        files = [(path, self._upload_time(mtime)) for path, mtime in images if path not in done]
+
+        # A crash between a commit and its report lines leaves saved files
+        # unreported; the same name and time in the history means already done
+        if self.use_mtime and files:
+            names = [path for path, _ in files]
+            saved = set()
+            for start in range(0, len(names), 500):
+                saved.update(db.session.execute(
+                    db.select(InventoryUpload.filename, InventoryUpload.upload_time)
+                    .where(InventoryUpload.user_id == self.user_id,
+                           InventoryUpload.filename.in_(names[start:start + 500]))
+                ).all())
+            files = [(path, upload_time) for path, upload_time in files if (path, upload_time) not in saved]
+
+        self.counts['skipped'] = len(images) - len(files)
+        return files
+
+    def _lookup_cache(self, path, upload_time):
+        """
+        Look a file up in the result cache
+        Returns:
+            dict: Entry for the report, with items and timings filled in on a hit
+        """
+        started = time.perf_counter()
+        with open(os.path.join(self.directory, path), 'rb') as f:
+            digest = image_digest(f.read())
+        items = result_cache.get(digest, touch=False)
+        # Don't hold a read transaction open while waiting on the workers
+        db.session.commit()
+        entry = {'file': path, 'digest': digest, 'upload_time': upload_time, 'cached': items is not None}
+        if items is not None:
+            entry.update({'items': items, 'error': None, 'timings': {
+                'total_ms': round((time.perf_counter() - started) * 1000, 2), 'stages': {}}})
+        return entry
+
+    def _write(self, entries, report):
+        """
+        Save finished files in one transaction, then record them in the report
+        """
+        saved = [entry for entry in entries if entry['items']]
+        try:
+            upload_ids = insert_uploads(db.session, [
+                {'user_id': self.user_id, 'filename': entry['file'][:255], 'items': entry['items'],
+                 'upload_time': entry['upload_time']}
+                for entry in saved
+            ]) if saved else []
+            for entry in saved:
+                if entry['cached']:
+                    result_cache.touch(entry['digest'])
+                else:
+                    result_cache.put(entry['digest'], entry['items'])
+            db.session.commit()
+            # Usage statistics only move forward in time, so older photos are left out of them
+            if self._stats_until is not None and any(entry['upload_time'] < self._stats_until for entry in saved):
+                self._stats_stale = True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to write {len(saved)} backfilled uploads: {str(e)}")
+            upload_ids = [None] * len(saved)
+            for entry in saved:
+                entry['error'] = f'Write failed: {str(e)}'
+        upload_id_by_file = {entry['file']: upload_id for entry, upload_id in zip(saved, upload_ids)}
+
+        for entry in entries:
+            if entry['error']:
+                status = 'failed'
+            elif entry['items']:
+                status = 'saved'
+            else:
+                status = 'empty'
+            self.counts[status] += 1
+            report.write(json.dumps({
+                'file': entry['file'],
+                'status': status,
+                'upload_id': upload_id_by_file.get(entry['file']),
+                'items': len(entry['items']),
+                'cached': entry['cached'],
+                'upload_time': entry['upload_time'].isoformat(),
+                'error': entry['error'],
+                'timings': entry['timings']
+            }) + '\n')
+        # The report is the checkpoint, so it must reach disk with the commit
+        report.flush()
+        os.fsync(report.fileno())
+
+    @contextmanager
+    def _reader(self):
+        """
+        Callable that hands a file to the worker pool and returns a future for its result
+        """
+        if self.processes <= 0:
+            _init_worker(self.processor_factory, self.cpu_threads)
+
+            def read_now(path):
+                future = Future()
+                future.set_result(_read_file(path))
+                return future
+            yield read_now
+            return
+        # Paddle is not fork-safe once threads exist, so always spawn fresh workers
+        with ProcessPoolExecutor(max_workers=self.processes,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker,
+                                 initargs=(self.processor_factory, self.cpu_threads)) as executor:
+            yield lambda path: executor.submit(_read_file, path)
+
+    def _entries(self, files):
+        """
+        Look up and read files, yielding finished entries in input order. Each file is
+        looked up in the result cache only when it is reached, so workers start on the
+        first miss while later files are still being hashed.
+        """
+        read_ahead = max(self.processes, 1) * READ_AHEAD_PER_PROCESS
+        in_flight = deque()
+        with self._reader() as read:
+            for path, upload_time in files:
+                entry = self._lookup_cache(path, upload_time)
+                if not entry['cached']:
+                    entry['future'] = read(os.path.join(self.directory, path))
+                in_flight.append(entry)
+                # Cached files are ready at once; the read-ahead bounds the files held in memory
+                while in_flight and (len(in_flight) > read_ahead or 'future' not in in_flight[0]):
+                    yield self._finish(in_flight.popleft())
+            while in_flight:
+                yield self._finish(in_flight.popleft())
+
+    def _finish(self, entry):
+        future = entry.pop('future', None)
+        if future is not None:
+            entry.update(future.result())
+        return entry
+
+    def run(self, progress=None):
+        """
+        Read and save every pending file
+        Args:
+            progress: Optional callable given the counts after each transaction
+        Returns:
+            dict: Files saved, empty, failed and skipped
+        """
+        files = self.pending()
+        logger.info(f"Backfilling {len(files)} files for user {self.user_id} "
+                    f"({self.counts['skipped']} already done)")
+        self._stats_until = db.session.scalar(
+            db.select(func.max(ItemStats.last_time)).where(ItemStats.user_id == self.user_id))
+        # Workers stay busy across transactions; entries come back in file order
+        entries = self._entries(files)
+
+        with open(self.report_path, 'a', encoding='utf-8') as report:
+            while True:
+                batch = list(itertools.islice(entries, self.batch_size))
+                if not batch:
+                    break
+                # Uploads are written oldest first so stock and usage move forward in time
+                self._write(batch, report)
+                if progress:
+                    progress(dict(self.counts))
+
+        # Photos older than the latest upload are folded into usage by replaying history
+        if self._stats_stale:
+            logger.info(f"Backfilled photos predate existing usage for user {self.user_id}; rebuilding item stats")
+            rebuild_item_stats(self.user_id)
+        return dict(self.counts)
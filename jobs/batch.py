@@ -0,0 +1,266 @@
+import os
+import zipfile
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from werkzeug.utils import secure_filename
+from models import db
+from ocr.ocr_processor import ocr_processor
+from ocr.result_cache import result_cache, image_digest
+from corrector.gemini_corrector import parse_many_ocr_results_with_gemini
+from preprocessing.image_cleaner import ImageQualityError, check_image_quality
+from inventory.stock import normalize_item_name
+from storage.inventory_writer import inventory_writer
+from storage.upload_archive import upload_archive
+from logic.reorder_logic import generate_reorder_suggestions
+from messaging.outbox import whatsapp_outbox
+from monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class BatchError(ValueError):
+    """
+    A batch upload that cannot be processed as sent
+    """
+
+def _allowed(filename, extensions):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in extensions
+
+def read_zip_pages(file, extensions, max_pages, max_bytes):
+    """
+    Image pages inside a ZIP archive, in archive name order
+    Args:
+        file: Readable, seekable ZIP file object
+        extensions: Allowed image file extensions
+        max_pages: Most pages accepted
+        max_bytes: Most uncompressed bytes accepted across all pages
+    Returns:
+        list: (filename, bytes) pairs
+    Raises:
+        BatchError: If the archive is unreadable or over the limits
+    """
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise BatchError('Invalid ZIP archive')
+
+    with archive:
+        entries = sorted(
+            (info for info in archive.infolist()
+             if not info.is_dir()
+             and not os.path.basename(info.filename).startswith('.')
+             and '__MACOSX' not in info.filename
+             and _allowed(info.filename, extensions)),
+            key=lambda info: info.filename
+        )
+        if len(entries) > max_pages:
+            raise BatchError(f'Too many pages; at most {max_pages} are allowed')
+        # Sizes in the directory can lie, so reading stops at the limit regardless
+        remaining = max_bytes
+        pages = []
+        for info in entries:
+            with archive.open(info) as f:
+                data = f.read(remaining + 1)
+            remaining -= len(data)
+            if remaining < 0:
+                raise BatchError('ZIP archive is too large when extracted')
+            if data:
+                pages.append((secure_filename(os.path.basename(info.filename)), data))
+        return pages
+
+def collect_pages(files, extensions, max_pages=50, max_bytes=64 * 1024 * 1024):
+    """
+    Image pages from uploaded files; ZIP archives are expanded in place
+    Args:
+        files: Werkzeug FileStorage objects
+        extensions: Allowed image file extensions
+        max_pages: Most pages accepted
+        max_bytes: Most uncompressed bytes accepted from each ZIP archive
+    Returns:
+        list: (filename, bytes) pairs in upload order
+    Raises:
+        BatchError: If no usable pages were sent or the batch is over the limits
+    """
+    pages = []
+    for file in files:
+        filename = secure_filename(file.filename or '')
+        if filename.lower().endswith('.zip'):
+            pages.extend(read_zip_pages(file.stream, extensions, max_pages - len(pages), max_bytes))
+        elif _allowed(filename, extensions):
+            data = file.read()
+            if data:
+                pages.append((filename, data))
+        else:
+            raise BatchError(f'File type not allowed: {file.filename}')
+        if len(pages) > max_pages:
+            raise BatchError(f'Too many pages; at most {max_pages} are allowed')
+
+    if not pages:
+        raise BatchError('No images provided')
+    return pages
+
+def merge_items(page_items):
+    """
+    Combine the items of several pages; an item read on more than one page
+    is kept once, with the count from the latest page
+    Args:
+        page_items: Item lists in page order
+    Returns:
+        list: Merged items in first-seen order
+    """
+    merged = {}
+    for items in page_items:
+        for item in items:
+            key = normalize_item_name(item['name'])
+            if key:
+                merged[key] = {'name': merged[key]['name'] if key in merged else item['name'],
+                               'quantity': item['quantity']}
+    return list(merged.values())
+
+def batch_filename(pages, archive_name=None):
+    """
+    Name recorded for a batch upload
+    """
+    if archive_name:
+        return archive_name[:255]
+    first = pages[0][0]
+    if len(pages) == 1:
+        return first
+    return f'{first} (+{len(pages) - 1} pages)'[-255:]
+
+def run_batch(app, pages, user_id, phone_number=None, workers=4, filename=None, check_quality=False):
+    """
+    OCR every page in parallel, correct the pages that still need Gemini in as
+    few batched requests as possible, then save the merged items as one upload
+    and queue a single WhatsApp message for the batch
+    Args:
+        app: Flask application the worker threads run in
+        pages: (filename, bytes) pairs
+        user_id: Owner of the upload
+        phone_number: Optional WhatsApp number to notify
+        workers: Pages read at the same time
+        filename: Name recorded for the upload
+        check_quality: Fail unreadable photos before running OCR on them
+    Yields:
+        dict: An event per page as its OCR finishes and once its items are known,
+              then a summary of the batch
+    """
+    processor = ocr_processor.get()
+
+    def read(index):
+        name, data = pages[index]
+        with app.app_context():
+            try:
+                with metrics.span('batch_page'):
+                    quality = check_image_quality(data) if check_quality else None
+                    # Only photos that pass the quality gate are worth keeping
+                    digest = image_digest(data)
+                    upload_archive.archive(data, name, digest)
+                    # Re-uploads of the same photo skip OCR and Gemini entirely
+                    items = result_cache.get(digest, touch=False)
+                    if items is not None:
+                        return index, None, items, digest, None
+                    return index, processor.read_page(data, quality), None, digest, None
+            except ImageQualityError as e:
+                logger.warning(f"Batch page {name} rejected: {str(e)}")
+                return index, None, [], None, str(e)
+            except Exception as e:
+                logger.error(f"Batch page {name} failed: {str(e)}")
+                return index, None, [], None, 'Failed to read page'
+            finally:
+                # Release the worker's read transaction before the batch is saved
+                db.session.remove()
+
+    def page_event(index, items, cached, error=None):
+        event = {'type': 'page', 'page': index + 1, 'filename': pages[index][0],
+                 'items': items, 'cached': cached}
+        if error:
+            event.update({'status': 'failed', 'error': error})
+        elif not items:
+            event.update({'status': 'failed', 'error': 'No items found in image'})
+        else:
+            event['status'] = 'done'
+        return event
+
+    page_items = [[] for _ in pages]
+    digests = [None] * len(pages)
+    ocr_results = {}
+    cache_writes = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pages))),
+                            thread_name_prefix='batch-page') as executor:
+        futures = [executor.submit(read, index) for index in range(len(pages))]
+        for future in as_completed(futures):
+            index, ocr_result, items, digests[index], error = future.result()
+            if ocr_result is not None:
+                ocr_results[index] = ocr_result
+                yield {'type': 'ocr', 'page': index + 1, 'filename': pages[index][0], 'boxes': len(ocr_result)}
+                continue
+            page_items[index] = items
+            if items:
+                cache_writes.append((digests[index], items, True))
+            # Pages that were not OCRed either came from the result cache or failed
+            yield page_event(index, items, error is None, error)
+
+    # Pages not in the result cache share Gemini requests instead of making one each
+    if ocr_results:
+        indexes = sorted(ocr_results)
+        error = None
+        try:
+            with metrics.span('batch_correct'):
+                corrected = parse_many_ocr_results_with_gemini([ocr_results[index] for index in indexes])
+        except Exception as e:
+            logger.error(f"Batch correction failed: {str(e)}")
+            corrected, error = [[] for _ in indexes], 'Failed to read page'
+        for index, items in zip(indexes, corrected):
+            page_items[index] = items
+            if items:
+                cache_writes.append((digests[index], items, False))
+            yield page_event(index, items, False, error)
+
+    items = merge_items(page_items)
+    summary = {'type': 'summary', 'pages': len(pages),
+               'pages_read': sum(1 for page in page_items if page)}
+    if not items:
+        summary.update({'success': False, 'error': 'No items found in any page'})
+        yield summary
+        return
+
+    # Every page's cache entry is written in the same transaction as the upload
+    def on_write():
+        for digest, page, cached in cache_writes:
+            if cached:
+                result_cache.touch(digest)
+            else:
+                result_cache.put(digest, page)
+
+    try:
+        with metrics.span('db_save'):
+            upload_id = inventory_writer.save(user_id, filename or batch_filename(pages), items,
+                                              on_write=on_write)
+        reorder_suggestions = generate_reorder_suggestions(items, user_id=user_id)
+    except Exception as e:
+        logger.error(f"Failed to save batch for user {user_id}: {str(e)}")
+        db.session.rollback()
+        summary.update({'success': False, 'error': 'Failed to save the batch'})
+        yield summary
+        return
+
+    summary.update({'success': True, 'upload_id': upload_id, 'items': items,
+                    'reorder_suggestions': reorder_suggestions})
+
+    # One message for the whole batch
+    if phone_number and reorder_suggestions:
+        try:
+            with metrics.span('whatsapp_enqueue'):
+                whatsapp_outbox.enqueue(phone_number, reorder_suggestions, user_id)
+            summary.update({
+                'whatsapp_status': 'queued',
+                'whatsapp_message': 'Reorder suggestions will be sent to your WhatsApp number shortly'
+            })
+        except Exception as e:
+            logger.error(f"WhatsApp error: {str(e)}")
+            summary.update({
+                'whatsapp_status': 'error',
+                'whatsapp_message': 'Failed to queue WhatsApp message'
+            })
+    yield summary
@@ -0,0 +1,153 @@
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
+from models import db, UploadJob
+from jobs.pipeline import run_upload_pipeline
+from monitoring.metrics import metrics, collect_timings
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class JobQueue:
+    """
+    Queue of upload jobs drained by a pool of background OCR workers.
+    Jobs are persisted in the database so pending work survives a restart.
+    """
+    def __init__(self, num_workers=2, lease_seconds=900):
+        """
+        Initialize the job queue
+        Args:
+            num_workers (int): Number of OCR worker threads
+            lease_seconds (float): Age past which a running job is presumed abandoned and run again
+        """
+        self.num_workers = num_workers
+        self.lease_seconds = lease_seconds
+        self.app = None
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Bind the queue to a Flask app; workers run inside its app context
+        Args:
+            app: Flask application
+        """
+        self.app = app
+        self.num_workers = app.config.get('OCR_WORKERS', self.num_workers)
+        self.lease_seconds = app.config.get('JOB_LEASE_SECONDS', self.lease_seconds)
+        app.extensions['job_queue'] = self
+
+    @property
+    def started(self):
+        return bool(self._workers)
+
+    def start(self):
+        """
+        Start the worker pool and re-enqueue jobs left over from a previous run
+        """
+        with self._lock:
+            if self._workers:
+                return
+            with self.app.app_context():
+                self._recover_jobs()
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker, name=f'ocr-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            logger.info(f"Started {self.num_workers} OCR workers")
+
+    def _recover_jobs(self):
+        """
+        Reset abandoned jobs and queue everything that has not finished. Jobs
+        another live process is running are left alone until their lease expires.
+        Returns:
+            int: Number of jobs queued
+        """
+        stale = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        reset = UploadJob.query.filter(UploadJob.status == 'running', UploadJob.started_at < stale) \
+            .update({'status': 'queued', 'started_at': None}, synchronize_session=False)
+        db.session.commit()
+        # Other processes may queue the same jobs; claiming makes duplicates harmless
+        pending = [job_id for job_id, in db.session.query(UploadJob.id)
+                   .filter(UploadJob.status == 'queued').order_by(UploadJob.created_at)]
+        for job_id in pending:
+            self._queue.put(job_id)
+        if pending:
+            logger.info(f"Recovered {len(pending)} pending upload jobs ({reset} abandoned while running)")
+        return len(pending)
+
+    def submit(self, user_id, image_data, filename, phone_number=None, quality=None):
+        """
+        Persist a new upload job and hand it to the workers
+        Args:
+            user_id: Owner of the upload
+            image_data: Encoded image bytes
+            filename: Sanitized name of the uploaded file
+            phone_number: Optional WhatsApp number to notify
+            quality: Report from the upload's quality check, if it ran
+        Returns:
+            UploadJob: The queued job
+        """
+        job = UploadJob(user_id=user_id, filename=filename, image_data=image_data,
+                        phone_number=phone_number)
+        job.set_quality(quality)
+        db.session.add(job)
+        db.session.commit()
+
+        if not self.started:
+            self.start()
+        # Recovery may have queued this job already; claiming makes duplicates harmless
+        self._queue.put(job.id)
+        return job
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    self._run(job_id)
+            except Exception as e:
+                logger.error(f"Worker failed on job {job_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _claim(self, job_id):
+        """
+        Atomically move a queued job to running so it is processed only once
+        Returns:
+            bool: True if this worker owns the job
+        """
+        claimed = UploadJob.query.filter_by(id=job_id, status='queued') \
+            .update({'status': 'running', 'started_at': datetime.utcnow()})
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id):
+        if not self._claim(job_id):
+            return
+        job = db.session.get(UploadJob, job_id)
+
+        with collect_timings() as timings:
+            metrics.record('queue_wait', (job.started_at - job.created_at).total_seconds())
+            try:
+                with metrics.span('pipeline'):
+                    payload, status_code = run_upload_pipeline(job.image_data, job.filename, job.user_id,
+                                                               job.phone_number, job.get_quality())
+            except Exception as e:
+                logger.error(f"Processing error for job {job_id}: {str(e)}")
+                db.session.rollback()
+                payload, status_code = {'error': 'An unexpected error occurred'}, 500
+
+        job = db.session.get(UploadJob, job_id)
+        job.set_result(payload, status_code)
+        job.set_timings(timings.to_dict())
+        job.status = 'done' if status_code == 200 else 'failed'
+        job.finished_at = datetime.utcnow()
+        # The bytes are only needed to survive a restart before processing
+        job.image_data = None
+        db.session.commit()
+
+# Singleton instance
+job_queue = JobQueue()
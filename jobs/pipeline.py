@@ -0,0 +1,78 @@
+import logging
+from ocr.ocr_processor import process_image
+from corrector.gemini_corrector import gemini_corrector
+from logic.reorder_logic import generate_reorder_suggestions
+from messaging.outbox import whatsapp_outbox
+from monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def no_items_response():
+    """
+    Response for an upload with no items read
+    Returns:
+        tuple: (response payload, HTTP status code)
+    """
+    # An empty page read while Gemini is down says nothing about the page
+    if not gemini_corrector.get().available():
+        return {'error': 'Item extraction is temporarily unavailable, please try again shortly'}, 503
+    return {'error': 'No items found in image'}, 400
+
+def build_response(items, reorder_suggestions, filename):
+    return {
+        'success': True,
+        'items': items,
+        'reorder_suggestions': reorder_suggestions,
+        'saved_file': filename
+    }
+
+def queue_notification(response, phone_number, reorder_suggestions, user_id):
+    """
+    Queue the WhatsApp notification; the outbox sender delivers it in the background
+    Args:
+        response: Response payload, updated with the WhatsApp status
+        phone_number: WhatsApp number to notify
+        reorder_suggestions: Suggestions to send
+        user_id: Owner of the upload
+    """
+    try:
+        with metrics.span('whatsapp_enqueue'):
+            whatsapp_outbox.enqueue(phone_number, reorder_suggestions, user_id)
+        response.update({
+            'whatsapp_status': 'queued',
+            'whatsapp_message': 'Reorder suggestions will be sent to your WhatsApp number shortly'
+        })
+    except Exception as e:
+        logger.error(f"WhatsApp error: {str(e)}")
+        response.update({
+            'whatsapp_status': 'error',
+            'whatsapp_message': 'Failed to queue WhatsApp message'
+        })
+
+def run_upload_pipeline(image_data, filename, user_id, phone_number=None, quality=None):
+    """
+    Run OCR, reorder suggestions and WhatsApp notification for an upload
+    Args:
+        image_data: Encoded image bytes
+        filename: Sanitized name of the uploaded file
+        user_id: Owner of the upload
+        phone_number: Optional WhatsApp number to notify
+        quality: Report from the upload's quality check, so its tilt estimate is reused
+    Returns:
+        tuple: (response payload, HTTP status code)
+    """
+    # Process image through OCR
+    items, upload_id = process_image(image_data, user_id, filename, quality)
+    if not items:
+        return no_items_response()
+
+    # Generate reorder suggestions from detected items
+    reorder_suggestions = generate_reorder_suggestions(items, user_id=user_id)
+    if not reorder_suggestions:
+        return {'error': 'Failed to generate suggestions'}, 500
+
+    response = build_response(items, reorder_suggestions, filename)
+    if phone_number:
+        queue_notification(response, phone_number, reorder_suggestions, user_id)
+    return response, 200
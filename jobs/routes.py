@@ -0,0 +1,42 @@
+from flask import Blueprint, jsonify, url_for
+from flask_login import login_required, current_user
+from models import UploadJob
+from monitoring.metrics import metrics
+
+jobs = Blueprint('jobs', __name__)
+
+def get_user_job(job_id):
+    """
+    Look up a job owned by the current user
+    Args:
+        job_id: Job identifier
+    Returns:
+        UploadJob or None
+    """
+    return UploadJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+
+@jobs.route('/<job_id>')
+@login_required
+def status(job_id):
+    job = get_user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    metrics.attach('job', job.get_timings())
+    response = job.to_dict()
+    response['result_url'] = url_for('jobs.result', job_id=job.id)
+    return jsonify(response)
+
+@jobs.route('/<job_id>/result')
+@login_required
+def result(job_id):
+    job = get_user_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    metrics.attach('job', job.get_timings())
+    # Still processing: tell the client to keep polling
+    if not job.is_finished:
+        return jsonify(job.to_dict()), 202
+
+    return jsonify(job.get_result()), job.status_code
@@ -0,0 +1,126 @@
+import os
+import logging
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from models import db, ItemStats, CanonicalItem, InventoryUpload, InventoryItem
+from inventory.stock import stock_rows
+from inventory.canonical import canonical_index
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Usage measured this many days ago counts half as much as today's
+USAGE_HALF_LIFE_DAYS = float(os.getenv('USAGE_HALF_LIFE_DAYS', 14))
+
+STAT_FIELDS = ('last_quantity', 'last_time', 'observations', 'consumed', 'consumed_days')
+
+def advance_stats(stats, quantity, when, half_life_days=USAGE_HALF_LIFE_DAYS):
+    """
+    Fold one new count of an item into its statistics
+    Args:
+        stats: Current statistics dict, or None for a new item
+        quantity: Counted quantity
+        when: Time of the count
+        half_life_days: Age at which usage counts half
+    Returns:
+        dict: Updated statistics
+    """
+    if stats is None:
+        return {'last_quantity': quantity, 'last_time': when, 'observations': 1,
+                'consumed': 0.0, 'consumed_days': 0.0}
+    # Older pages cannot be folded in incrementally; a rebuild picks them up
+    if when < stats['last_time']:
+        return stats
+
+    stats = dict(stats)
+    days = (when - stats['last_time']).total_seconds() / 86400
+    if days > 0:
+        decay = 0.5 ** (days / half_life_days)
+        stats['consumed'] *= decay
+        stats['consumed_days'] *= decay
+        used = stats['last_quantity'] - quantity
+        # A higher count means a restock happened, so usage over the interval is unknown
+        if used >= 0:
+            stats['consumed'] += used
+            stats['consumed_days'] += days
+    stats['last_quantity'] = quantity
+    stats['last_time'] = when
+    stats['observations'] += 1
+    return stats
+
+def _upsert(session, rows):
+    stmt = insert(ItemStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'item_id'],
+        set_={field: getattr(stmt.excluded, field) for field in STAT_FIELDS + ('item_key',)}
+    )
+    session.execute(stmt, rows)
+
+def update_item_stats(session, uploads):
+    """
+    Fold saved uploads into item_stats. Runs in the caller's transaction.
+    Args:
+        session: SQLAlchemy session; the caller commits
+        uploads: (user_id, upload_id, upload_time, items) tuples, oldest first
+    """
+    canonical_index.annotate(session, uploads)
+    counts = [row for upload in uploads for row in stock_rows(*upload)]
+    if not counts:
+        return
+
+    keys = {(row['user_id'], row['item_id']) for row in counts}
+    existing = session.execute(
+        select(ItemStats).where(tuple_(ItemStats.user_id, ItemStats.item_id).in_(list(keys)))
+    ).scalars()
+    stats = {
+        (entry.user_id, entry.item_id): {field: getattr(entry, field) for field in STAT_FIELDS}
+        for entry in existing
+    }
+
+    item_keys = {}
+    for row in counts:
+        key = (row['user_id'], row['item_id'])
+        stats[key] = advance_stats(stats.get(key), row['quantity'], row['updated_at'])
+        item_keys[key] = row['item_key']
+
+    _upsert(session, [
+        dict(user_id=user_id, item_id=item_id, item_key=item_keys[(user_id, item_id)], **stats[(user_id, item_id)])
+        for user_id, item_id in keys
+    ])
+
+def rebuild_item_stats(user_id=None, batch_size=5000):
+    """
+    Recompute item_stats by replaying the full upload history. Saved items without
+    a canonical id are skipped; run assign_item_ids() first to match them.
+    Args:
+        user_id: Only rebuild this user's statistics; None rebuilds everyone's
+        batch_size: History rows fetched per round trip
+    Returns:
+        int: Number of statistics rows written
+    """
+    history = select(
+        InventoryUpload.user_id, InventoryItem.item_id, CanonicalItem.item_key, InventoryItem.quantity,
+        InventoryUpload.upload_time
+    ).join(InventoryItem, InventoryItem.upload_id == InventoryUpload.id) \
+        .join(CanonicalItem, CanonicalItem.id == InventoryItem.item_id) \
+        .order_by(InventoryUpload.upload_time, InventoryUpload.id, InventoryItem.id)
+    clear = delete(ItemStats)
+    if user_id is not None:
+        history = history.where(InventoryUpload.user_id == user_id)
+        clear = clear.where(ItemStats.user_id == user_id)
+
+    stats = {}
+    item_keys = {}
+    for owner, item_id, item_key, quantity, upload_time in \
+            db.session.execute(history.execution_options(yield_per=batch_size)):
+        key = (owner, item_id)
+        stats[key] = advance_stats(stats.get(key), quantity, upload_time)
+        item_keys[key] = item_key
+
+    db.session.execute(clear)
+    if stats:
+        _upsert(db.session, [dict(user_id=owner, item_id=item_id, item_key=item_keys[(owner, item_id)], **entry)
+                             for (owner, item_id), entry in stats.items()])
+    db.session.commit()
+    logger.info(f"Rebuilt item statistics: {len(stats)} items")
+    return len(stats)
@@ -0,0 +1,307 @@
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
+from twilio.base.exceptions import TwilioRestException
+from models import db, OutboxMessage
+from messaging.whatsapp import format_message, send_message, get_twilio_client
+from inventory.stock import normalize_item_name
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class RateLimiter:
+    """
+    Token bucket per key: up to `burst` messages at once, refilled at `rate_per_minute`
+    """
+    def __init__(self, rate_per_minute=6, burst=2):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def delay(self, key, now=None):
+        """
+        Seconds until a message to key is allowed; 0 if it is allowed now
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens = self._tokens(key, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def consume(self, key, now=None):
+        """
+        Record a message sent to key
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._buckets[key] = (self._tokens(key, now) - 1, now)
+
+def merge_suggestions(suggestion_sets):
+    """
+    Combine suggestion sets, oldest first; a later suggestion for the same item replaces an earlier one
+    Args:
+        suggestion_sets: Lists of reorder suggestions
+    Returns:
+        list: Merged suggestions in first-seen order
+    """
+    merged = {}
+    for suggestions in suggestion_sets:
+        for suggestion in suggestions:
+            merged[normalize_item_name(suggestion['name'])] = suggestion
+    return list(merged.values())
+
+def is_retryable(error):
+    # Twilio's 4xx answers other than rate limiting will not change on retry
+    if isinstance(error, TwilioRestException):
+        return error.status is None or error.status == 429 or error.status >= 500
+    return True
+
+class WhatsAppOutbox:
+    """
+    Durable queue of WhatsApp notifications drained by a background sender.
+    Suggestions for the same number that arrive within the coalescing window
+    go out as one message; failures are retried with exponential backoff.
+    """
+    def __init__(self, coalesce_seconds=10, max_attempts=5, retry_base_seconds=2, retry_max_seconds=300,
+                 rate_per_minute=6, burst=2, poll_seconds=30, client=None, max_concurrent_sends=4,
+                 claim_lease_seconds=300):
+        """
+        Initialize the outbox
+        Args:
+            coalesce_seconds (float): How long a message waits for more suggestions to the same number
+            max_attempts (int): Sends tried before a message is marked failed
+            retry_base_seconds (float): Delay before the first retry; doubles on each attempt
+            retry_max_seconds (float): Longest delay between retries
+            rate_per_minute (float): Messages allowed per number per minute
+            burst (int): Messages a number may receive back to back
+            poll_seconds (float): Longest the sender sleeps when nothing is due
+            client: Twilio client; defaults to the shared one
+            max_concurrent_sends (int): Numbers sent to Twilio at once
+            claim_lease_seconds (float): How long a sender's claim on messages lasts before
+                                         they are presumed abandoned and sent again
+        """
+        self.coalesce_seconds = coalesce_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.poll_seconds = poll_seconds
+        self.limiter = RateLimiter(rate_per_minute, burst)
+        self.client = client
+        self.max_concurrent_sends = max_concurrent_sends
+        self.claim_lease_seconds = claim_lease_seconds
+        self.app = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read outbox settings from the Flask config; the sender runs inside the app's context
+        Args:
+            app: Flask application
+        """
+        self.app = app
+        self.coalesce_seconds = app.config.get('WHATSAPP_COALESCE_SECONDS', self.coalesce_seconds)
+        self.max_attempts = app.config.get('WHATSAPP_MAX_ATTEMPTS', self.max_attempts)
+        self.max_concurrent_sends = app.config.get('WHATSAPP_MAX_CONCURRENT_SENDS', self.max_concurrent_sends)
+        self.claim_lease_seconds = app.config.get('WHATSAPP_CLAIM_LEASE_SECONDS', self.claim_lease_seconds)
+        self.limiter = RateLimiter(app.config.get('WHATSAPP_RATE_PER_MINUTE', self.limiter.rate * 60),
+                                   app.config.get('WHATSAPP_BURST', self.limiter.burst))
+        app.extensions['whatsapp_outbox'] = self
+
+    def start(self):
+        """
+        Start the sender thread
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='whatsapp-sender', daemon=True)
+            self._thread.start()
+
+    def recover_expired(self, now=None):
+        """
+        Return messages whose sender's claim has expired to the queue. Claims
+        still within their lease may belong to a live sender in another process.
+        Args:
+            now: Current time; defaults to utcnow
+        Returns:
+            int: Number of messages returned
+        """
+        now = datetime.utcnow() if now is None else now
+        # While a message is sending, next_attempt_at holds the claim's expiry
+        recovered = db.session.execute(
+            update(OutboxMessage).where(OutboxMessage.status == 'sending', OutboxMessage.next_attempt_at <= now)
+            .values(status='pending', message_sid=None, next_attempt_at=now)
+        ).rowcount
+        db.session.commit()
+        if recovered:
+            logger.info(f"Recovered {recovered} interrupted WhatsApp messages")
+        return recovered
+
+    def enqueue(self, phone_number, suggestions, user_id=None):
+        """
+        Queue reorder suggestions for a number. Commits the caller's session.
+        Args:
+            phone_number: Recipient number without the leading '+'
+            suggestions: Reorder suggestions
+            user_id: Owner of the upload the suggestions came from
+        Returns:
+            OutboxMessage: The queued row
+        """
+        message = OutboxMessage(
+            user_id=user_id, phone_number=phone_number, suggestions=json.dumps(suggestions),
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=self.coalesce_seconds)
+        )
+        db.session.add(message)
+        db.session.commit()
+
+        if self.app is not None:
+            self.start()
+            self._wake.set()
+        return message
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    wait = self.process_due()
+            except Exception as e:
+                logger.error(f"WhatsApp sender failed: {str(e)}")
+                wait = self.poll_seconds
+            self._wake.wait(timeout=max(wait, 0.05))
+            self._wake.clear()
+
+    def _backoff(self, attempts):
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1))
+        # Jitter spreads retries from many failed sends over time
+        return delay * random.uniform(0.5, 1.0)
+
+    def process_due(self):
+        """
+        Send every number that has a message due, one coalesced message each.
+        Different numbers are sent to Twilio concurrently.
+        Returns:
+            float: Seconds until the next message falls due
+        """
+        now = datetime.utcnow()
+        self.recover_expired(now)
+        numbers = db.session.scalars(
+            select(OutboxMessage.phone_number).distinct()
+            .where(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now)
+        ).all()
+        claims = [claim for claim in (self._claim_number(phone_number, now) for phone_number in numbers) if claim]
+
+        # Only the Twilio requests run in parallel; the session stays on this thread
+        if len(claims) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrent_sends, len(claims))) as executor:
+                outcomes = list(executor.map(lambda claim: self._deliver(claim[0], claim[2]), claims))
+        else:
+            outcomes = [self._deliver(phone_number, body) for phone_number, _, body in claims]
+        for (phone_number, messages, _), (sid, error) in zip(claims, outcomes):
+            self._record(phone_number, messages, sid, error)
+
+        next_due = db.session.scalar(
+            select(func.min(OutboxMessage.next_attempt_at)).where(OutboxMessage.status == 'pending')
+        )
+        db.session.commit()
+        if next_due is None:
+            return self.poll_seconds
+        return min(self.poll_seconds, (next_due - datetime.utcnow()).total_seconds())
+
+    def _claim_number(self, phone_number, now):
+        """
+        Take every pending message for a number
+        Returns:
+            tuple or None: (phone number, messages, coalesced body), or None if there is nothing to send
+        """
+        # Over the number's rate: push its messages back instead of sending
+        delay = self.limiter.delay(phone_number)
+        if delay > 0:
+            db.session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.phone_number == phone_number, OutboxMessage.status == 'pending')
+                .values(next_attempt_at=now + timedelta(seconds=delay))
+            )
+            db.session.commit()
+            return None
+
+        # Claim every pending message for the number so another sender cannot take them;
+        # the SID column holds the claim until Twilio's SID replaces it, and
+        # next_attempt_at when the claim expires if this sender dies mid-send
+        claim = uuid.uuid4().hex
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.phone_number == phone_number, OutboxMessage.status == 'pending')
+            .values(status='sending', message_sid=claim,
+                    next_attempt_at=now + timedelta(seconds=self.claim_lease_seconds))
+        )
+        db.session.commit()
+        messages = db.session.scalars(
+            select(OutboxMessage).where(OutboxMessage.message_sid == claim).order_by(OutboxMessage.created_at)
+        ).all()
+        if not messages:
+            return None
+
+        body = format_message(merge_suggestions([message.get_suggestions() for message in messages]))
+        return phone_number, messages, body
+
+    def _deliver(self, phone_number, body):
+        """
+        Returns:
+            tuple: (Twilio message SID, None) or (None, the error)
+        """
+        try:
+            return send_message(phone_number, body, self.client or get_twilio_client()), None
+        except Exception as e:
+            return None, e
+
+    def _record(self, phone_number, messages, sid, error):
+        if error is not None:
+            retry = is_retryable(error)
+            for message in messages:
+                message.attempts += 1
+                message.last_error = str(error)
+                message.message_sid = None
+                if retry and message.attempts < self.max_attempts:
+                    message.status = 'pending'
+                    message.next_attempt_at = datetime.utcnow() + timedelta(seconds=self._backoff(message.attempts))
+                else:
+                    message.status = 'failed'
+            db.session.commit()
+            logger.error(f"WhatsApp send to {phone_number} failed ({len(messages)} messages): {str(error)}")
+            return
+
+        self.limiter.consume(phone_number)
+        sent_at = datetime.utcnow()
+        for message in messages:
+            message.status = 'sent'
+            message.attempts += 1
+            message.message_sid = sid
+            message.sent_at = sent_at
+        db.session.commit()
+        logger.info(f"Sent WhatsApp message {sid} to {phone_number} covering {len(messages)} uploads")
+
+    def stats(self):
+        """
+        Message counts by status
+        Returns:
+            dict: Status to count
+        """
+        rows = db.session.execute(
+            select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+        ).all()
+        return {status: count for status, count in rows}
+
+# Singleton instance
+whatsapp_outbox = WhatsAppOutbox()
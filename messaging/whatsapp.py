@@ -1,31 +1,89 @@
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from dotenv import load_dotenv
 import os
+import threading
+from monitoring.metrics import metrics
 
 load_dotenv()
 
-def send_whatsapp_message(phone_number, reorder_suggestions):
+# WhatsApp rejects bodies longer than this
+MAX_BODY_LENGTH = 1600
+
+def create_twilio_client():
     """
-    Send reorder suggestions via WhatsApp using Twilio
+    Build the Twilio client shared by every send. Its HTTP client keeps one
+    pooled session, so connections to Twilio are reused across messages.
     """
     account_sid = os.getenv('TWILIO_ACCOUNT_SID')
     auth_token = os.getenv('TWILIO_AUTH_TOKEN')
-    from_number = os.getenv('TWILIO_WHATSAPP_NUMBER')
-    
-    if not all([account_sid, auth_token, from_number]):
+    if not all([account_sid, auth_token]):
         raise ValueError("Missing Twilio configuration")
-    
-    client = Client(account_sid, auth_token)
-    
-    # Format the message
+
+    http_client = TwilioHttpClient(pool_connections=True,
+                                   timeout=float(os.getenv('TWILIO_TIMEOUT', 10)))
+    client = Client(account_sid, auth_token, http_client=http_client)
+    # Lets tests and staging point the client at a stand-in server
+    if os.getenv('TWILIO_API_BASE_URL'):
+        client.api.base_url = os.getenv('TWILIO_API_BASE_URL')
+    return client
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_twilio_client():
+    """
+    The process-wide Twilio client, built on first use
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_twilio_client()
+    return _client
+
+def format_message(reorder_suggestions):
+    """
+    Format reorder suggestions as a WhatsApp message body
+    Args:
+        reorder_suggestions: List of suggestions
+    Returns:
+        str: Message body, truncated to MAX_BODY_LENGTH
+    """
     message_body = "🛒 Reorder Suggestions:\n"
-    for suggestion in reorder_suggestions:
-        message_body += f"- {suggestion['name']}: {suggestion['current_quantity']} left → Reorder {suggestion['reorder_quantity']}\n"
-    
-    message = client.messages.create(
-        from_=f'whatsapp:{from_number}',
-        body=message_body,
-        to=f'whatsapp:+{phone_number}'
-    )
-    
+    for i, suggestion in enumerate(reorder_suggestions):
+        line = f"- {suggestion['name']}: {suggestion['current_quantity']} left → Reorder {suggestion['reorder_quantity']}\n"
+        more = f"…and {len(reorder_suggestions) - i} more\n"
+        if len(message_body) + len(line) + len(more) > MAX_BODY_LENGTH:
+            message_body += more
+            break
+        message_body += line
+    return message_body
+
+def send_message(phone_number, body, client=None):
+    """
+    Send a WhatsApp message body through Twilio
+    Args:
+        phone_number: Recipient number without the leading '+'
+        body: Message text
+        client: Twilio client; defaults to the shared one
+    Returns:
+        str: Twilio message SID
+    """
+    from_number = os.getenv('TWILIO_WHATSAPP_NUMBER')
+    if not from_number:
+        raise ValueError("Missing Twilio configuration")
+
+    with metrics.span('twilio_send'):
+        message = (client or get_twilio_client()).messages.create(
+            from_=f'whatsapp:{from_number}',
+            body=body,
+            to=f'whatsapp:+{phone_number}'
+        )
     return message.sid
+
+def send_whatsapp_message(phone_number, reorder_suggestions):
+    """
+    Send reorder suggestions via WhatsApp using Twilio
+    """
+    return send_message(phone_number, format_message(reorder_suggestions))
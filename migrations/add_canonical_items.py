@@ -0,0 +1,85 @@
+from flask import current_app
+from sqlalchemy import text
+from models import db
+
+def upgrade():
+    with current_app.app_context():
+        # Canonical products per user and every spelling matched to them
+        db.session.execute(text('''
+            CREATE TABLE IF NOT EXISTS canonical_item (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                item_key VARCHAR(255) NOT NULL,
+                name VARCHAR(255) NOT NULL,
+                created_at DATETIME,
+                FOREIGN KEY (user_id) REFERENCES user (id),
+                CONSTRAINT uq_canonical_item_user_key UNIQUE (user_id, item_key)
+            )
+        '''))
+        db.session.execute(text('''
+            CREATE TABLE IF NOT EXISTS item_alias (
+                user_id INTEGER NOT NULL,
+                alias_key VARCHAR(255) NOT NULL,
+                item_id INTEGER NOT NULL,
+                PRIMARY KEY (user_id, alias_key),
+                FOREIGN KEY (user_id) REFERENCES user (id),
+                FOREIGN KEY (item_id) REFERENCES canonical_item (id)
+            )
+        '''))
+
+        # Canonical id of saved items
+        db.session.execute(text('ALTER TABLE inventory_item ADD COLUMN item_id INTEGER REFERENCES canonical_item (id)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_inventory_item_item_id ON inventory_item (item_id)'))
+
+        # Stock and usage are keyed on the canonical id; both are derived from upload
+        # history, so they are recreated empty and refilled by the rebuild
+        db.session.execute(text('DROP TABLE IF EXISTS current_stock'))
+        db.session.execute(text('''
+            CREATE TABLE current_stock (
+                user_id INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                item_key VARCHAR(255) NOT NULL,
+                name VARCHAR(255) NOT NULL,
+                quantity INTEGER NOT NULL,
+                upload_id INTEGER NOT NULL,
+                updated_at DATETIME NOT NULL,
+                PRIMARY KEY (user_id, item_id),
+                FOREIGN KEY (user_id) REFERENCES user (id),
+                FOREIGN KEY (item_id) REFERENCES canonical_item (id),
+                FOREIGN KEY (upload_id) REFERENCES inventory_upload (id)
+            )
+        '''))
+        db.session.execute(text('DROP TABLE IF EXISTS item_stats'))
+        db.session.execute(text('''
+            CREATE TABLE item_stats (
+                user_id INTEGER NOT NULL,
+                item_id INTEGER NOT NULL,
+                item_key VARCHAR(255) NOT NULL,
+                last_quantity INTEGER NOT NULL,
+                last_time DATETIME NOT NULL,
+                observations INTEGER NOT NULL,
+                consumed FLOAT NOT NULL,
+                consumed_days FLOAT NOT NULL,
+                PRIMARY KEY (user_id, item_id),
+                FOREIGN KEY (user_id) REFERENCES user (id),
+                FOREIGN KEY (item_id) REFERENCES canonical_item (id)
+            )
+        '''))
+
+        # Commit changes; then run `flask rebuild-stock` to match existing history to
+        # canonical items and refill stock and usage
+        db.session.commit()
+
+def downgrade():
+    with current_app.app_context():
+        db.session.execute(text('DROP INDEX IF EXISTS ix_inventory_item_item_id'))
+        db.session.execute(text('ALTER TABLE inventory_item DROP COLUMN item_id'))
+        # The name-keyed stock and usage tables are recreated by db.create_all() on
+        # the previous release and refilled by its rebuild-stock
+        db.session.execute(text('DROP TABLE IF EXISTS current_stock'))
+        db.session.execute(text('DROP TABLE IF EXISTS item_stats'))
+        db.session.execute(text('DROP TABLE IF EXISTS item_alias'))
+        db.session.execute(text('DROP TABLE IF EXISTS canonical_item'))
+        
+        # Commit changes
+        db.session.commit()
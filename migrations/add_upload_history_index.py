@@ -0,0 +1,21 @@
+from flask import current_app
+from sqlalchemy import text
+from models import db
+
+def upgrade():
+    with current_app.app_context():
+        # Newest-first history pages seek on (user_id, upload_time)
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_inventory_upload_user_time '
+            'ON inventory_upload (user_id, upload_time)'
+        ))
+        
+        # Commit changes
+        db.session.commit()
+
+def downgrade():
+    with current_app.app_context():
+        db.session.execute(text('DROP INDEX IF EXISTS ix_inventory_upload_user_time'))
+        
+        # Commit changes
+        db.session.commit()
@@ -0,0 +1,18 @@
+from flask import current_app
+from sqlalchemy import text
+from models import db
+
+def upgrade():
+    with current_app.app_context():
+        # Quality report from the upload check, reused by preprocessing
+        db.session.execute(text('ALTER TABLE upload_job ADD COLUMN quality TEXT'))
+        
+        # Commit changes
+        db.session.commit()
+
+def downgrade():
+    with current_app.app_context():
+        db.session.execute(text('ALTER TABLE upload_job DROP COLUMN quality'))
+        
+        # Commit changes
+        db.session.commit()
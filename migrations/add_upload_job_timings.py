@@ -0,0 +1,18 @@
+from flask import current_app
+from sqlalchemy import text
+from models import db
+
+def upgrade():
+    with current_app.app_context():
+        # Per-stage timing breakdown of each processing run
+        db.session.execute(text('ALTER TABLE upload_job ADD COLUMN timings TEXT'))
+        
+        # Commit changes
+        db.session.commit()
+
+def downgrade():
+    with current_app.app_context():
+        db.session.execute(text('ALTER TABLE upload_job DROP COLUMN timings'))
+        
+        # Commit changes
+        db.session.commit()
@@ -2,6 +2,8 @@ from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from flask_login import UserMixin
+import json
+import uuid
 
 db = SQLAlchemy()
 
@@ -24,6 +26,11 @@ class User(UserMixin, db.Model):
         return f'<User {self.email}>'
 
 class InventoryUpload(db.Model):
+    # Serves the newest-first history pages of one user
+    __table_args__ = (
+        db.Index('ix_inventory_upload_user_time', 'user_id', 'upload_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
@@ -32,6 +39,14 @@ class InventoryUpload(db.Model):
     # Relationship to InventoryItem
     items = db.relationship('InventoryItem', backref='upload', lazy=True)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'upload_time': self.upload_time.isoformat() if self.upload_time else None,
+            'items': [{'name': item.name, 'quantity': item.quantity} for item in self.items]
+        }
+
     def __repr__(self):
         return f'<InventoryUpload {self.filename} by {self.user.email}>'
 
@@ -40,6 +55,188 @@ class InventoryItem(db.Model):
     upload_id = db.Column(db.Integer, db.ForeignKey('inventory_upload.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
+    # Canonical product this name was matched to
+    item_id = db.Column(db.Integer, db.ForeignKey('canonical_item.id'), index=True)
 
     def __repr__(self):
         return f'<InventoryItem {self.name}: {self.quantity}>'
+
+class CanonicalItem(db.Model):
+    """
+    One product in a user's inventory; its id is the item's SKU id
+    """
+    __tablename__ = 'canonical_item'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'item_key', name='uq_canonical_item_user_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Normalized name of the first spelling seen
+    item_key = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CanonicalItem {self.id} {self.item_key}>'
+
+class ItemAlias(db.Model):
+    """
+    A spelling of an item name already matched to a canonical item
+    """
+    __tablename__ = 'item_alias'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # Normalized name as read
+    alias_key = db.Column(db.String(255), primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('canonical_item.id'), nullable=False)
+
+    def __repr__(self):
+        return f'<ItemAlias {self.alias_key} -> {self.item_id}>'
+
+class CurrentStock(db.Model):
+    """
+    Latest known quantity of each item per user, kept up to date as uploads are saved
+    """
+    __tablename__ = 'current_stock'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('canonical_item.id'), primary_key=True)
+    # Key of the canonical item, a case- and whitespace-normalized name
+    item_key = db.Column(db.String(255), nullable=False)
+    # Name as last written on a register page
+    name = db.Column(db.String(255), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    upload_id = db.Column(db.Integer, db.ForeignKey('inventory_upload.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            'item_id': self.item_id,
+            'name': self.name,
+            'quantity': self.quantity,
+            'upload_id': self.upload_id,
+            'updated_at': self.updated_at.isoformat()
+        }
+
+    def __repr__(self):
+        return f'<CurrentStock {self.item_key}: {self.quantity}>'
+
+class ItemStats(db.Model):
+    """
+    Per-item consumption statistics, updated incrementally as uploads are saved
+    """
+    __tablename__ = 'item_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('canonical_item.id'), primary_key=True)
+    # Same key as CurrentStock.item_key
+    item_key = db.Column(db.String(255), nullable=False)
+    last_quantity = db.Column(db.Integer, nullable=False)
+    last_time = db.Column(db.DateTime, nullable=False)
+    observations = db.Column(db.Integer, nullable=False, default=1)
+    # Units used and days elapsed over intervals without a restock, both
+    # decayed by age so their ratio tracks recent daily usage
+    consumed = db.Column(db.Float, nullable=False, default=0.0)
+    consumed_days = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f'<ItemStats {self.item_key}: {self.consumed}/{self.consumed_days} days>'
+
+class UploadJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    # Raw upload bytes, kept only until the job has been processed
+    image_data = db.Column(db.LargeBinary)
+    phone_number = db.Column(db.String(32))
+    # JSON payload returned by the result endpoint once the job has finished
+    result = db.Column(db.Text)
+    status_code = db.Column(db.Integer)
+    # JSON per-stage timing breakdown of the processing run
+    timings = db.Column(db.Text)
+    # JSON quality report from the upload check, so preprocessing reuses its tilt estimate
+    quality = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+
+    def set_result(self, payload, status_code):
+        self.result = json.dumps(payload)
+        self.status_code = status_code
+
+    def get_timings(self):
+        return json.loads(self.timings) if self.timings else None
+
+    def set_timings(self, timings):
+        self.timings = json.dumps(timings)
+
+    def get_quality(self):
+        return json.loads(self.quality) if self.quality else None
+
+    def set_quality(self, quality):
+        self.quality = json.dumps(quality) if quality else None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<UploadJob {self.id} {self.status}>'
+
+class OutboxMessage(db.Model):
+    """
+    Reorder suggestions waiting to be sent over WhatsApp
+    """
+    __tablename__ = 'whatsapp_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    phone_number = db.Column(db.String(32), nullable=False, index=True)
+    # JSON list of reorder suggestions
+    suggestions = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When the message is next due; while status is 'sending', when the sender's claim expires
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    # Twilio SID of the message this row was sent in (coalesced rows share one);
+    # holds the sender's claim token while status is 'sending'
+    message_sid = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_whatsapp_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    def get_suggestions(self):
+        return json.loads(self.suggestions)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} to {self.phone_number} {self.status}>'
+
+class ImageResultCache(db.Model):
+    # SHA-256 of the uploaded image bytes
+    digest = db.Column(db.String(64), primary_key=True)
+    # JSON list of extracted items
+    items = db.Column(db.Text, nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<ImageResultCache {self.digest[:12]}>'
@@ -0,0 +1,257 @@
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Upper bounds in seconds, from a cached re-upload to a slow Gemini call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Timing breakdown being collected for the current request or job, if any
+_timings = ContextVar('timings', default=None)
+
+class Histogram:
+    """
+    Cumulative histogram of observed durations
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Bucket bounds are inclusive, as Prometheus expects
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        Bucket counts as Prometheus reports them
+        Returns:
+            list: (upper bound, observations at or below it), ending with +Inf
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+class Timings:
+    """
+    Per-stage durations for one request or job
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self):
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'stages': {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        }
+
+@contextmanager
+def collect_timings():
+    """
+    Collect the spans recorded in this thread into a per-stage breakdown
+    Yields:
+        Timings: Breakdown filled in as spans finish
+    """
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+class Metrics:
+    """
+    In-process timing histograms, exported in the Prometheus text format.
+    Pipeline stages are timed with span(); when a request or job is collecting
+    timings, the same spans also feed its per-stage breakdown.
+    """
+    def __init__(self, prefix='smartstock', buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the registry
+        Args:
+            prefix (str): Prepended to every exported metric name
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.prefix = prefix
+        self.buckets = buckets
+        self.debug_header = 'X-Debug-Timing'
+        self._descriptions = {
+            'stage_seconds': 'Time spent in each processing stage',
+            'http_request_seconds': 'Time spent handling HTTP requests'
+        }
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Time every request, serve /metrics and add timing breakdowns to debug responses
+        Args:
+            app: Flask application
+        """
+        self.debug_header = app.config.get('METRICS_DEBUG_HEADER', self.debug_header)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        if app.config.get('METRICS_ENABLED', True):
+            app.add_url_rule('/metrics', 'metrics', self.export)
+        app.extensions['metrics'] = self
+
+    def observe(self, name, seconds, **labels):
+        """
+        Record a duration in a histogram
+        Args:
+            name: Metric name without the prefix
+            seconds: Observed duration
+            **labels: Label values identifying the series
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def record(self, stage, seconds):
+        """
+        Record a stage duration in its histogram and the current breakdown
+        Args:
+            stage: Stage name
+            seconds: Time the stage took
+        """
+        self.observe('stage_seconds', seconds, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Time the enclosed block as a pipeline stage
+        Args:
+            stage: Stage name, e.g. 'preprocess' or 'gemini'
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def render(self):
+        """
+        All histograms in the Prometheus text exposition format
+        Returns:
+            str: Exposition text
+        """
+        with self._lock:
+            series = sorted(
+                (key, list(histogram.cumulative()), histogram.sum, histogram.count)
+                for key, histogram in self._histograms.items()
+            )
+
+        lines = []
+        current = None
+        for (name, labels), buckets, total, count in series:
+            full_name = f'{self.prefix}_{name}'
+            if name != current:
+                current = name
+                lines.append(f'# HELP {full_name} {self._descriptions.get(name, name)}')
+                lines.append(f'# TYPE {full_name} histogram')
+            for bound, cumulative in buckets:
+                bucket_labels = _format_labels(labels + (('le', _format_value(bound)),))
+                lines.append(f'{full_name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{full_name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{full_name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def debug_requested(self):
+        """
+        Whether the current request asked for a timing breakdown
+        Returns:
+            bool: True when the debug header is set
+        """
+        return request.headers.get(self.debug_header, '').lower() in ('1', 'true', 'yes')
+
+    def attach(self, name, breakdown):
+        """
+        Add another breakdown, such as a background job's, to this request's debug timings
+        Args:
+            name: Key the breakdown is reported under
+            breakdown: Timings.to_dict() output
+        """
+        if breakdown is not None and 'timings_token' in g:
+            g.attached_timings[name] = breakdown
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        if self.debug_requested():
+            g.timings = Timings()
+            g.timings_token = _timings.set(g.timings)
+            g.attached_timings = {}
+
+    def _after_request(self, response):
+        if 'request_started' in g and request.endpoint != 'metrics':
+            self.observe('http_request_seconds', time.perf_counter() - g.request_started,
+                         endpoint=request.endpoint or 'unmatched', method=request.method,
+                         status=response.status_code)
+
+        if 'timings' in g:
+            breakdown = g.timings.to_dict()
+            breakdown.update(g.attached_timings)
+            response.headers['Server-Timing'] = ', '.join(
+                f'{stage};dur={ms}' for stage, ms in breakdown['stages'].items()
+            ) or f"total;dur={breakdown['total_ms']}"
+            try:
+                payload = response.get_json(silent=True) if response.is_json else None
+                if isinstance(payload, dict):
+                    payload['_timings'] = breakdown
+                    response.set_data(json.dumps(payload))
+            except Exception as e:
+                logger.error(f"Failed to attach timings: {str(e)}")
+        return response
+
+    def _teardown_request(self, exc=None):
+        token = g.pop('timings_token', None)
+        if token is not None:
+            _timings.reset(token)
+
+# Singleton instance
+metrics = Metrics()
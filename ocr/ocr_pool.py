@@ -0,0 +1,118 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# OCR engine owned by the current worker process
+_worker_engine = None
+# Barrier shared by all workers of a pool, so a warm-up reaches each of them once
+_worker_barrier = None
+
+def create_paddle_ocr(cpu_threads):
+    """
+    Build a PaddleOCR engine
+    Args:
+        cpu_threads (int): Inference threads for the engine
+    Returns:
+        PaddleOCR: OCR engine
+    """
+    from paddleocr import PaddleOCR
+    return PaddleOCR(use_angle_cls=True, lang='en', cpu_threads=cpu_threads)
+
+def _init_worker(engine_factory, cpu_threads, barrier):
+    # Load the model once per worker so every task runs on a warm engine
+    global _worker_engine, _worker_barrier
+    _worker_engine = engine_factory(cpu_threads)
+    _worker_barrier = barrier
+
+def _attach(shm_name):
+    try:
+        return shared_memory.SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the block with the resource
+        # tracker, which would unlink it when this worker exits
+        shm = shared_memory.SharedMemory(name=shm_name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def _run_ocr(shm_name, shape, dtype, cls):
+    shm = _attach(shm_name)
+    image = None
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        return _worker_engine.ocr(image, cls=cls)
+    finally:
+        del image
+        shm.close()
+
+def _ping(timeout):
+    # Hold this worker until every worker has taken a ping, so none answers twice
+    _worker_barrier.wait(timeout)
+    return os.getpid()
+
+class OCRPool:
+    """
+    Pool of worker processes, each holding a warm OCR engine. Images are
+    handed to workers through shared memory instead of being pickled.
+    Exposes the same ocr() call as PaddleOCR so it can replace it directly.
+    """
+    def __init__(self, processes=2, cpu_threads=2, engine_factory=create_paddle_ocr):
+        """
+        Initialize the OCR pool
+        Args:
+            processes (int): Number of worker processes
+            cpu_threads (int): Inference threads per worker
+            engine_factory: Picklable callable building an engine from cpu_threads
+        """
+        self.processes = processes
+        self.cpu_threads = cpu_threads
+        # Paddle is not fork-safe once threads exist, so always spawn fresh workers
+        context = multiprocessing.get_context('spawn')
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(engine_factory, cpu_threads, context.Barrier(processes))
+        )
+
+    def ocr(self, image: np.ndarray, cls=False):
+        """
+        Run OCR on an image in a worker process
+        Args:
+            image: OpenCV image (NumPy array)
+            cls: Whether to run the angle classifier
+        Returns:
+            list: PaddleOCR result
+        """
+        image = np.ascontiguousarray(image)
+        shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+        try:
+            buffer = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+            buffer[:] = image
+            del buffer
+            future = self._executor.submit(_run_ocr, shm.name, image.shape, image.dtype.str, cls)
+            return future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def warm_up(self, timeout=300):
+        """
+        Start every worker and wait until each has loaded its engine
+        Args:
+            timeout (float): Seconds to wait for the slowest worker
+        Returns:
+            list: Process id of each worker
+        """
+        futures = [self._executor.submit(_ping, timeout) for _ in range(self.processes)]
+        pids = [future.result() for future in futures]
+        logger.info(f"OCR pool ready with {self.processes} workers")
+        return pids
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -1,117 +1,270 @@
-from paddleocr import PaddleOCR
 from preprocessing.image_cleaner import ImageCleaner
 from corrector.gemini_corrector import parse_ocr_result_with_gemini
-import cv2
 import os
 import logging
 import numpy as np
 import re
+import threading
 from typing import List, Dict
-from models import db, InventoryUpload, InventoryItem
+from models import db
+from ocr.result_cache import result_cache, image_digest
+from storage.inventory_writer import inventory_writer
+from ocr.ocr_pool import OCRPool, create_paddle_ocr
+from ocr.tiling import split_strips, merge_strip_results
+from concurrent.futures import ThreadPoolExecutor
 from flask_login import current_user
+from providers import LazyProvider
+from monitoring.metrics import metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Strips flatter than this are blank paper and are not sent to OCR
+BLANK_STRIP_STD = 3.0
+
 class OCRProcessor:
     """
     Process images to extract items and quantities using OCR with Gemini correction
     """
-    def __init__(self):
+    def __init__(self, processes=None, cpu_threads=None, tile_height=None, tile_overlap=None,
+                 tile_max_width=None):
         """
         Initialize OCR processor with PaddleOCR and image cleaner
+        Args:
+            processes (int): OCR worker processes; 0 runs PaddleOCR in this process
+            cpu_threads (int): PaddleOCR inference threads per engine
+            tile_height (int): Strip height for tiled OCR; 0 OCRs the downscaled page in one pass
+            tile_overlap (int): Rows shared by neighbouring strips
+            tile_max_width (int): Page width cap in tiling mode; 0 keeps native resolution
         """
-        self.ocr = PaddleOCR(use_angle_cls=True, lang='en')
+        if processes is None:
+            processes = int(os.getenv('OCR_PROCESSES', 0))
+        if cpu_threads is None:
+            # Engines share the machine's cores rather than each claiming all of them
+            default_threads = max(1, (os.cpu_count() or 1) // max(processes, 1))
+            cpu_threads = int(os.getenv('OCR_CPU_THREADS') or default_threads)
+        if tile_height is None:
+            tile_height = int(os.getenv('OCR_TILE_HEIGHT', 0))
+        if tile_overlap is None:
+            tile_overlap = int(os.getenv('OCR_TILE_OVERLAP', 160))
+        if tile_max_width is None:
+            tile_max_width = int(os.getenv('OCR_TILE_MAX_WIDTH', 0))
+
+        # A process pool sidesteps PaddleOCR not being parallel-safe across threads
+        if processes > 0:
+            self.ocr = OCRPool(processes=processes, cpu_threads=cpu_threads)
+        else:
+            self.ocr = create_paddle_ocr(cpu_threads)
         self.cleaner = ImageCleaner()
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+        # Tiled pages skip the 1000px downscale so small handwriting stays legible
+        self.tile_cleaner = ImageCleaner(max_width=tile_max_width or None)
+        # An in-process engine is shared by every thread that OCRs a page
+        self._ocr_lock = threading.Lock()
         self.logger = logger
 
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def warm_up(self):
+        """
+        Make sure every OCR engine is loaded before the first request
+        """
+        if isinstance(self.ocr, OCRPool):
+            self.ocr.warm_up()
+
+    def recognize(self, image: np.ndarray) -> List:
+        """
+        Run PaddleOCR on a preprocessed image
+        Args:
+            image: Preprocessed image (NumPy array)
+        Returns:
+            list: PaddleOCR lines, or an empty list when nothing was read
+        """
+        if isinstance(self.ocr, OCRPool):
+            return self.ocr.ocr(image, cls=False)[0] or []
+        with self._ocr_lock:
+            return self.ocr.ocr(image, cls=False)[0] or []
+
+    def preprocess_image(self, image, cleaner=None, quality=None) -> np.ndarray:
         """
         Preprocess image for OCR
         Args:
-            image_path: Path to the image file
+            image: Path to the image file or encoded image bytes
+            cleaner: ImageCleaner to use; defaults to the downscaling one
+            quality: Report from the upload's quality check, so its tilt estimate is reused
         Returns:
             np.ndarray: Preprocessed image ready for OCR
         Raises:
             Exception: If preprocessing fails
         """
+        label = image if isinstance(image, str) else f"<{len(image)} bytes>"
         try:
-            self.logger.info(f"Preprocessing image: {image_path}")
-            return self.cleaner.process_image(image_path)
+            self.logger.info(f"Preprocessing image: {label}")
+            with metrics.span('preprocess'):
+                return (cleaner or self.cleaner).process_image(image, quality=quality)
         except Exception as e:
-            self.logger.error(f"Preprocessing failed for {image_path}: {str(e)}")
+            self.logger.error(f"Preprocessing failed for {label}: {str(e)}")
             raise
 
-    def process_image(self, image_path):
+    def read_page(self, image, quality=None) -> List:
+        """
+        The CPU-bound stages of extract_items: preprocessing and OCR
+        Args:
+            image: Path to the image file or encoded image bytes
+            quality: Report from the upload's quality check, so its tilt estimate is reused
+        Returns:
+            list: PaddleOCR lines for the page
+        """
+        # Tall register pages are read strip by strip at full resolution
+        if self.tile_height:
+            return self.ocr_tiled(self.preprocess_image(image, self.tile_cleaner, quality))
+
+        # Preprocess image first
+        preprocessed_image = self.preprocess_image(image, quality=quality)
+        
+        # Run OCR directly on the in-memory array
+        with metrics.span('ocr'):
+            return self.recognize(preprocessed_image)
+
+    def extract_items(self, image, quality=None) -> List[Dict]:
+        """
+        Run preprocessing, OCR and Gemini correction on an image
+        Args:
+            image: Path to the image file or encoded image bytes
+            quality: Report from the upload's quality check, so its tilt estimate is reused
+        Returns:
+            list: List of items with names and quantities
+        """
+        # Use Gemini corrector to process OCR result
+        return parse_ocr_result_with_gemini(self.read_page(image, quality))
+
+    def ocr_tiled(self, image: np.ndarray) -> List:
+        """
+        Run OCR on overlapping horizontal strips and merge them into one page result
+        Args:
+            image: Preprocessed page (NumPy array)
+        Returns:
+            list: PaddleOCR lines in page coordinates
+        """
+        height = image.shape[0]
+        strips = [
+            (top, bottom) for top, bottom in split_strips(height, self.tile_height, self.tile_overlap)
+            if image[top:bottom].std() >= BLANK_STRIP_STD
+        ]
+
+        def recognize(strip):
+            top, bottom = strip
+            return self.recognize(image[top:bottom])
+
+        # Only a process pool can recognise strips concurrently
+        workers = min(self.ocr.processes, len(strips)) if isinstance(self.ocr, OCRPool) else 1
+        with metrics.span('ocr'):
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(recognize, strips))
+            else:
+                results = [recognize(strip) for strip in strips]
+
+        merged = merge_strip_results(list(zip(strips, results)), height)
+        self.logger.info(f"Tiled OCR read {len(strips)} strips of a {image.shape[1]}x{height} page, "
+                         f"{sum(map(len, results))} boxes merged to {len(merged)}")
+        return merged
+
+    def read_items(self, image, filename='upload', quality=None):
+        """
+        Items on an image, from the result cache or by running OCR and Gemini
+        Args:
+            image: Path to the image file or encoded image bytes
+            filename: Name used in log messages
+            quality: Report from the upload's quality check, so its tilt estimate is reused
+        Returns:
+            tuple: (items, SHA-256 of the image bytes, whether the items came from the cache)
+        """
+        if isinstance(image, str):
+            with open(image, 'rb') as f:
+                image = f.read()
+
+        # Re-uploads of the same photo skip OCR and Gemini entirely
+        digest = image_digest(image)
+        with metrics.span('result_cache'):
+            items = result_cache.get(digest, touch=False)
+        if items is not None:
+            self.logger.info(f"Result cache hit for image {filename}")
+            return items, digest, True
+        return self.extract_items(image, quality), digest, False
+
+    def process_image(self, image, user_id=None, filename=None, quality=None):
         """
         Process image and extract items and quantities using OCR with Gemini correction
         Args:
-            image_path: Path to the image file
+            image: Path to the image file or encoded image bytes
+            user_id: Owner of the upload; defaults to the logged-in user
+            filename: Name recorded for the upload; defaults to the file's basename
+            quality: Report from the upload's quality check, so its tilt estimate is reused
         Returns:
             list: List of items with names and quantities
         """
-        try:
-            # Preprocess image first
-            preprocessed_image = self.preprocess_image(image_path)
-            
-            # Convert NumPy array to temporary file for PaddleOCR
-            temp_file = f"{os.path.splitext(image_path)[0]}_processed.jpg"
-            cv2.imwrite(temp_file, preprocessed_image)
-            
-            # Run OCR on processed image
-            result = self.ocr.ocr(temp_file, cls=False)
-            
-            # Clean up temporary file
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            
-            # Use Gemini corrector to process OCR result
-            items = parse_ocr_result_with_gemini(result[0])
-            
-            # Log if no items were found
-            if not items:
-                self.logger.warning(f"No items found in image {image_path}")
-                return None, None
-                
-            # Save to database
+        if filename is None:
+            filename = os.path.basename(image) if isinstance(image, str) else 'upload'
+
+        # Resolve the owner up front so we never OCR an upload we cannot save
+        if user_id is None:
             if not current_user.is_authenticated:
                 self.logger.error("User must be authenticated to save upload")
                 return None, None
-                
-            # Create upload record
-            upload = InventoryUpload(
-                user_id=current_user.id,
-                filename=os.path.basename(image_path)
-            )
-            db.session.add(upload)
-            
-            # Create items
-            for item in items:
-                inventory_item = InventoryItem(
-                    upload=upload,
-                    name=item['name'],
-                    quantity=item['quantity']
-                )
-                db.session.add(inventory_item)
-                
-            db.session.commit()
-            
-            return items, upload.id
+            user_id = current_user.id
+
+        try:
+            items, digest, cached = self.read_items(image, filename, quality)
+            return self.save_items(user_id, filename, items, digest, cached)
             
         except Exception as e:
-            self.logger.error(f"Error processing image {image_path}: {str(e)}")
+            self.logger.error(f"Error processing image {filename}: {str(e)}")
+            db.session.rollback()
+            return None, None
+
+    def save_items(self, user_id, filename, items, digest, cached):
+        """
+        Save the items read from an image as a new upload
+        Args:
+            user_id: Owner of the upload
+            filename: Name recorded for the upload
+            items: Items read from the image
+            digest: SHA-256 of the image bytes
+            cached: Whether the items came from the result cache
+        Returns:
+            tuple: (items, upload id), or (None, None) if there was nothing to save
+        """
+        # Log if no items were found
+        if not items:
+            self.logger.warning(f"No items found in image {filename}")
             db.session.rollback()
             return None, None
 
-# Singleton instance
-ocr_processor = OCRProcessor()
+        # End our read transaction so it never holds up the writer
+        db.session.commit()
+
+        # Save the upload, its items and the cache entry in one batched transaction
+        if cached:
+            on_write = lambda: result_cache.touch(digest)
+        else:
+            on_write = lambda: result_cache.put(digest, items)
+        with metrics.span('db_save'):
+            upload_id = inventory_writer.save(user_id, filename, items, on_write=on_write)
+        
+        return items, upload_id
+
+# Shared instance, built on first use
+ocr_processor = LazyProvider('ocr_processor', OCRProcessor)
 
-def process_image(image_path):
+def process_image(image, user_id=None, filename=None, quality=None):
     """
     Process image through OCR with preprocessing
     Args:
-        image_path: Path to the image file
+        image: Path to the image file or encoded image bytes
+        user_id: Owner of the upload; defaults to the logged-in user
+        filename: Name recorded for the upload
+        quality: Report from the upload's quality check, so its tilt estimate is reused
     Returns:
         list: List of items with names and quantities
     """
-    return ocr_processor.process_image(image_path)
+    return ocr_processor.get().process_image(image, user_id, filename, quality)
@@ -0,0 +1,146 @@
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.sqlite import insert
+from models import db, ImageResultCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def image_digest(data) -> str:
+    """
+    Content address of an uploaded image
+    Args:
+        data: Encoded image bytes
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return hashlib.sha256(data).hexdigest()
+
+class ResultCache:
+    """
+    Content-addressed cache of extracted items, stored in SQLite with LRU eviction
+    """
+    def __init__(self, max_entries=1000):
+        """
+        Initialize the result cache
+        Args:
+            max_entries (int): Maximum number of cached images before evicting
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read cache settings from the Flask config
+        Args:
+            app: Flask application
+        """
+        self.max_entries = app.config.get('OCR_CACHE_MAX_ENTRIES', self.max_entries)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, digest, touch=True):
+        """
+        Look up the items for an image and mark the entry as recently used.
+        The update is flushed with the caller's next commit.
+        Args:
+            digest: Image digest from image_digest()
+            touch: Whether to mark the entry now; pass False and call touch()
+                later to record the hit in another transaction
+        Returns:
+            list or None: Cached items, or None on a miss
+        """
+        entry = db.session.get(ImageResultCache, digest)
+        if entry is None:
+            self._count(False)
+            return None
+
+        if touch:
+            entry.hit_count += 1
+            entry.last_used_at = datetime.utcnow()
+        self._count(True)
+        return json.loads(entry.items)
+
+    def touch(self, digest):
+        """
+        Record a hit on an entry without loading it. Flushed with the caller's next commit.
+        Args:
+            digest: Image digest from image_digest()
+        """
+        db.session.execute(
+            update(ImageResultCache).where(ImageResultCache.digest == digest)
+            .values(hit_count=ImageResultCache.hit_count + 1, last_used_at=datetime.utcnow())
+        )
+
+    def put(self, digest, items):
+        """
+        Store the items for an image, evicting least recently used entries
+        past the size bound. Flushed with the caller's next commit.
+        Args:
+            digest: Image digest from image_digest()
+            items: Extracted items
+        """
+        now = datetime.utcnow()
+        # Concurrent workers may extract the same image; last writer wins
+        stmt = insert(ImageResultCache).values(
+            digest=digest, items=json.dumps(items), hit_count=0, created_at=now, last_used_at=now
+        ).on_conflict_do_update(
+            index_elements=['digest'],
+            set_={'items': json.dumps(items), 'last_used_at': now}
+        )
+        db.session.execute(stmt)
+        self._evict()
+
+    def _evict(self):
+        size = db.session.scalar(select(func.count()).select_from(ImageResultCache))
+        if size <= self.max_entries:
+            return
+
+        keep = select(ImageResultCache.digest) \
+            .order_by(ImageResultCache.last_used_at.desc()) \
+            .limit(self.max_entries)
+        db.session.execute(
+            delete(ImageResultCache).where(ImageResultCache.digest.not_in(keep))
+        )
+        logger.info(f"Evicted {size - self.max_entries} cached OCR results")
+
+    def clear(self):
+        """
+        Drop every cached result and reset the counters
+        """
+        db.session.execute(delete(ImageResultCache))
+        db.session.commit()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Hit and miss counters for this process
+        Returns:
+            dict: Cache statistics
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'entries': db.session.scalar(select(func.count()).select_from(ImageResultCache)),
+            'max_entries': self.max_entries
+        }
+
+# Singleton instance
+result_cache = ResultCache()
@@ -0,0 +1,97 @@
+from collections import defaultdict
+from statistics import median
+from typing import List, Tuple
+
+def split_strips(height: int, strip_height: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Split a page into overlapping horizontal strips
+    Args:
+        height: Page height in pixels
+        strip_height: Height of each strip
+        overlap: Rows shared by neighbouring strips; should exceed one text line
+    Returns:
+        List[Tuple[int, int]]: (top, bottom) row range of each strip
+    """
+    if height <= strip_height:
+        return [(0, height)]
+
+    step = max(strip_height - overlap, 1)
+    strips = []
+    top = 0
+    while True:
+        bottom = min(top + strip_height, height)
+        strips.append((top, bottom))
+        if bottom == height:
+            return strips
+        top += step
+
+def offset_result(result: List, dy: float) -> List:
+    """
+    Move a strip's OCR boxes into page coordinates
+    Args:
+        result: PaddleOCR lines for one strip
+        dy: Top of the strip within the page
+    Returns:
+        list: Lines with shifted boxes
+    """
+    return [
+        [[[x, y + dy] for x, y in box], text_confidence]
+        for box, text_confidence in result or []
+    ]
+
+def _bounds(box):
+    xs = [point[0] for point in box]
+    ys = [point[1] for point in box]
+    return min(xs), min(ys), max(xs), max(ys)
+
+def _overlap_ratio(a, b):
+    # Intersection over the smaller box, so a box cut at a strip edge still
+    # matches its complete copy from the neighbouring strip
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return width * height / smaller if smaller > 0 else 0.0
+
+def merge_strip_results(strip_results: List[Tuple[Tuple[int, int], List]], page_height: int,
+                        overlap_threshold: float = 0.5, edge_margin: float = 2.0) -> List:
+    """
+    Merge per-strip OCR results into one page result, dropping boxes that were
+    read twice in the overlap between strips
+    Args:
+        strip_results: ((top, bottom), PaddleOCR lines in strip coordinates) per strip
+        page_height: Page height in pixels
+        overlap_threshold: Intersection over the smaller box above which two boxes are duplicates
+        edge_margin: Pixels from a strip cut within which a box counts as cut off
+    Returns:
+        list: PaddleOCR lines in page coordinates
+    """
+    candidates = []
+    for (top, bottom), result in strip_results:
+        for box, (text, confidence) in offset_result(result, top):
+            bounds = _bounds(box)
+            # Boxes touching an interior cut were probably truncated by it
+            cut = (top > 0 and bounds[1] <= top + edge_margin) or \
+                  (bottom < page_height and bounds[3] >= bottom - edge_margin)
+            candidates.append((cut, -confidence, bounds, [box, (text, confidence)]))
+
+    if not candidates:
+        return []
+
+    # Keep complete, confident boxes first; later duplicates are dropped
+    candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+    # Kept boxes are filed under every band of text-line height they cover, so a
+    # box is only compared with the few kept boxes it could intersect
+    band_height = max(median(bounds[3] - bounds[1] for _, _, bounds, _ in candidates), 1.0)
+    bands = defaultdict(list)
+    kept = []
+    for _, _, bounds, line in candidates:
+        rows = range(int(bounds[1] // band_height), int(bounds[3] // band_height) + 1)
+        if all(_overlap_ratio(bounds, other) <= overlap_threshold for row in rows for other in bands[row]):
+            kept.append((bounds, line))
+            for row in rows:
+                bands[row].append(bounds)
+
+    kept.sort(key=lambda entry: (entry[0][1], entry[0][0]))
+    return [line for _, line in kept]
@@ -1,33 +1,136 @@
 import cv2
 import numpy as np
 from PIL import Image
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import os
 
+# Reduced grayscale decode modes; JPEG scales these down during DCT decoding
+REDUCED_GRAYSCALE_MODES = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2
+}
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Width of the thumbnail that quality checks and skew estimation run on
+THUMBNAIL_WIDTH = 400
+
+# A skew estimate is trusted when the best angle's profile score is this many times the median
+SKEW_MIN_CONFIDENCE = 2.0
+
+class ImageQualityError(ValueError):
+    """Raised when a photo is too blurry, dark, washed out or tilted to read"""
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
 class ImageCleaner:
-    def __init__(self, max_width=1000):
+    def __init__(self, max_width=1000, deskew=None, max_skew=None, min_skew=None, min_sharpness=None,
+                 min_brightness=None, max_brightness=None):
         """
         Initialize the image cleaner with maximum width for resizing
         Args:
-            max_width (int): Maximum width for resized images
+            max_width (int): Maximum width for resized images; None keeps native resolution
+            deskew (bool): Straighten tilted pages before OCR
+            max_skew (float): Largest tilt in degrees that is looked for and corrected
+            min_skew (float): Tilts smaller than this many degrees are left alone
+            min_sharpness (float): Thumbnail Laplacian variance below which a photo is too blurry
+            min_brightness (float): Mean thumbnail brightness below which a photo is too dark
+            max_brightness (float): Mean thumbnail brightness above which a photo is washed out
         """
+        if deskew is None:
+            deskew = os.getenv('DESKEW', 'true').lower() == 'true'
+        if max_skew is None:
+            max_skew = float(os.getenv('DESKEW_MAX_ANGLE', 30))
+        if min_skew is None:
+            min_skew = float(os.getenv('DESKEW_MIN_ANGLE', 0.5))
+        if min_sharpness is None:
+            min_sharpness = float(os.getenv('QUALITY_MIN_SHARPNESS', 20))
+        if min_brightness is None:
+            min_brightness = float(os.getenv('QUALITY_MIN_BRIGHTNESS', 40))
+        if max_brightness is None:
+            max_brightness = float(os.getenv('QUALITY_MAX_BRIGHTNESS', 245))
+
         self.max_width = max_width
+        self.deskew = deskew
+        self.max_skew = max_skew
+        self.min_skew = min_skew
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self._local = threading.local()
 
     def load_image(self, image):
         """
-        Load image from either PIL Image or file path
+        Load image from a file path, encoded bytes, PIL Image or NumPy array
         Args:
-            image: PIL Image object or file path
+            image: File path, encoded image bytes, PIL Image object or OpenCV image
         Returns:
             np.ndarray: OpenCV image (NumPy array)
         """
         if isinstance(image, str):
             # Load from file path
             return cv2.imread(image)
+        elif isinstance(image, (bytes, bytearray, memoryview)):
+            # Decode in memory without touching the filesystem
+            img = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError("Could not decode image bytes")
+            return img
+        elif isinstance(image, np.ndarray):
+            return image
         elif isinstance(image, Image.Image):
             # Convert PIL Image to OpenCV format
             return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
         else:
-            raise ValueError("Input must be either a file path or PIL Image")
+            raise ValueError("Input must be a file path, image bytes, NumPy array or PIL Image")
+
+    def reduction_factor(self, data, width=None) -> int:
+        """
+        Largest decode reduction that still leaves the image at least max_width wide
+        Args:
+            data: Encoded image bytes
+            width (int): Width to keep instead of max_width
+        Returns:
+            int: 1, 2, 4 or 8
+        """
+        target = width or self.max_width
+        if target is None:
+            return 1
+        try:
+            # Only the header is parsed; pixels are not decoded
+            with Image.open(BytesIO(data)) as header:
+                source_width, height = header.size
+                if header.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+                    source_width = height
+        except Exception:
+            return 1
+
+        for factor in sorted(REDUCED_GRAYSCALE_MODES, reverse=True):
+            if source_width // factor >= target:
+                return factor
+        return 1
+
+    def decode_grayscale(self, data, width=None):
+        """
+        Decode image bytes straight to grayscale, at reduced scale when the
+        source is much wider than max_width
+        Args:
+            data: Encoded image bytes
+            width (int): Width to keep instead of max_width
+        Returns:
+            np.ndarray: Grayscale image
+        """
+        factor = self.reduction_factor(data, width)
+        mode = REDUCED_GRAYSCALE_MODES.get(factor, cv2.IMREAD_GRAYSCALE)
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), mode)
+        if img is None:
+            raise ValueError("Could not decode image bytes")
+        return img
 
     def grayscale(self, image):
         """
@@ -37,41 +140,195 @@ class ImageCleaner:
         Returns:
             np.ndarray: Grayscale image
         """
+        if image.ndim == 2:
+            return image
         return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    def resize_image(self, image):
+    def resize_image(self, image, out=None):
         """
         Resize image while maintaining aspect ratio
         Args:
             image: OpenCV image (NumPy array)
+            out: Optional preallocated buffer of the resized shape
         Returns:
             np.ndarray: Resized image
         """
         height, width = image.shape[:2]
-        if width > self.max_width:
+        if self.max_width is not None and width > self.max_width:
             ratio = self.max_width / width
             new_height = int(height * ratio)
-            image = cv2.resize(image, (self.max_width, new_height))
+            image = cv2.resize(image, (self.max_width, new_height), dst=out)
         return image
 
-    def apply_blur(self, image, kernel_size=(5, 5)):
+    def resized_shape(self, image):
+        """
+        Shape resize_image() will produce for an image
+        Args:
+            image: OpenCV image (NumPy array)
+        Returns:
+            tuple: Resized shape
+        """
+        height, width = image.shape[:2]
+        if self.max_width is not None and width > self.max_width:
+            return (int(height * self.max_width / width), self.max_width) + image.shape[2:]
+        return image.shape
+
+    def apply_blur(self, image, kernel_size=(5, 5), out=None):
         """
         Apply Gaussian blur to reduce noise
         Args:
             image: OpenCV image (NumPy array)
             kernel_size: Size of the Gaussian kernel
+            out: Optional preallocated buffer of the same shape
         Returns:
             np.ndarray: Blurred image
         """
-        return cv2.GaussianBlur(image, kernel_size, 0)
+        return cv2.GaussianBlur(image, kernel_size, 0, dst=out)
+
+    def thumbnail(self, image, width=THUMBNAIL_WIDTH):
+        """
+        Small grayscale copy of an image for quick checks
+        Args:
+            image: File path, encoded image bytes, PIL Image object or OpenCV image
+            width (int): Thumbnail width
+        Returns:
+            np.ndarray: Grayscale image at most width pixels wide
+        """
+        if isinstance(image, (str, bytes, bytearray, memoryview)):
+            img = self.decode_grayscale(self._read_bytes(image), width)
+        else:
+            img = self.grayscale(self.load_image(image))
+        height, source_width = img.shape[:2]
+        if source_width > width:
+            img = cv2.resize(img, (width, max(1, int(height * width / source_width))), interpolation=cv2.INTER_AREA)
+        return img
+
+    def estimate_skew(self, gray):
+        """
+        Estimate how far the text lines on a page are tilted
+        Args:
+            gray: Grayscale thumbnail of the page
+        Returns:
+            tuple: (tilt in degrees, counter-clockwise positive; confidence of the estimate)
+        """
+        # Character-sized blobs only: rulings, borders and shadows would outweigh the text
+        ink = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+        height, width = gray.shape
+        keep = (stats[:, cv2.CC_STAT_HEIGHT] < height * 0.15) & (stats[:, cv2.CC_STAT_WIDTH] < width * 0.3) \
+            & (stats[:, cv2.CC_STAT_AREA] >= 4)
+        keep[0] = False
+        if not keep.any():
+            return 0.0, 0.0
+        ink = np.where(keep[labels], 255, 0).astype(np.uint8)
+
+        def score(angle):
+            # Rows of a level page alternate sharply between text and gaps
+            matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+            rotated = cv2.warpAffine(ink, matrix, (width, height), flags=cv2.INTER_NEAREST, borderValue=0)
+            profile = rotated.sum(axis=1, dtype=np.float64)
+            return np.square(np.diff(profile)).sum()
+
+        # Coarse search in whole degrees, then refine around the best one
+        angles = np.arange(-self.max_skew, self.max_skew + 1)
+        scores = np.array([score(angle) for angle in angles])
+        median = np.median(scores)
+        best = angles[scores.argmax()]
+        fine = np.arange(best - 1, best + 1.01, 0.25)
+        fine_scores = np.array([score(angle) for angle in fine])
+        confidence = fine_scores.max() / median if median > 0 else 0.0
+        # Rotating by the best angle levels the page, so the text is tilted the other way
+        return -float(fine[fine_scores.argmax()]), float(confidence)
 
-    def process_image(self, image, save_intermediate=False, output_dir='debug'):
+    def rotate(self, image, angle):
+        """
+        Rotate a grayscale image about its centre, keeping its size
+        Args:
+            image: Grayscale image (NumPy array)
+            angle (float): Degrees, counter-clockwise positive
+        Returns:
+            np.ndarray: Rotated image
+        """
+        height, width = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        # Uncovered corners take the page's typical shade so they read as blank paper
+        return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=int(np.median(image)))
+
+    def straighten(self, image, quality=None):
+        """
+        Level a tilted page when its tilt can be measured with confidence
+        Args:
+            image: Grayscale page (NumPy array)
+            quality: Report from check_quality for the same photo; its tilt is used instead of measuring again
+        Returns:
+            np.ndarray: The page, rotated if it was tilted
+        """
+        if not self.deskew:
+            return image
+        if quality is None:
+            angle, confidence = self.estimate_skew(self.thumbnail(image))
+        else:
+            angle, confidence = quality['skew'] or 0.0, quality['skew_confidence']
+        # Angles at the edge of the search are as likely to be clipped as real
+        if confidence < SKEW_MIN_CONFIDENCE or abs(angle) < self.min_skew or abs(angle) > self.max_skew - 1:
+            return image
+        return self.rotate(image, -angle)
+
+    def assess_quality(self, image):
+        """
+        Measure sharpness, exposure and tilt on a thumbnail
+        Args:
+            image: File path, encoded image bytes, PIL Image object or OpenCV image
+        Returns:
+            dict: Sharpness (Laplacian variance), mean brightness, share of clipped dark
+                  and bright pixels, the estimated skew in degrees and its confidence
+        """
+        gray = self.thumbnail(image)
+        skew, confidence = self.estimate_skew(gray)
+        return {
+            'sharpness': round(float(cv2.Laplacian(gray, cv2.CV_64F).var()), 1),
+            'brightness': round(float(gray.mean()), 1),
+            'dark_fraction': round(float(np.count_nonzero(gray < 16)) / gray.size, 3),
+            'bright_fraction': round(float(np.count_nonzero(gray > 240)) / gray.size, 3),
+            'skew': round(skew, 2) if confidence >= SKEW_MIN_CONFIDENCE else None,
+            'skew_confidence': round(confidence, 2)
+        }
+
+    def check_quality(self, image):
+        """
+        Reject photos that cannot be read before any OCR work is done
+        Args:
+            image: File path, encoded image bytes, PIL Image object or OpenCV image
+        Returns:
+            dict: The quality report, if the photo is usable
+        Raises:
+            ImageQualityError: If the photo is too blurry, dark, washed out or tilted past max_skew
+            ValueError: If the image cannot be decoded
+        """
+        report = self.assess_quality(image)
+        if report['sharpness'] < self.min_sharpness:
+            raise ImageQualityError("Image is too blurry to read; hold the camera steady and retake the photo",
+                                    report)
+        if report['brightness'] < self.min_brightness:
+            raise ImageQualityError("Image is too dark to read; retake the photo in better light", report)
+        if report['brightness'] > self.max_brightness:
+            raise ImageQualityError("Image is washed out; avoid glare or direct light and retake the photo",
+                                    report)
+        # The tilt search stops at max_skew, so a tilt at its edge may be larger still and is never levelled
+        if report['skew'] is not None and abs(report['skew']) > self.max_skew - 1:
+            raise ImageQualityError("Page is tilted too far to straighten; hold the camera square to the page "
+                                    "and retake the photo", report)
+        return report
+
+    def process_image(self, image, save_intermediate=False, output_dir='debug', quality=None):
         """
         Process image through the entire pipeline
         Args:
-            image: PIL Image object or file path
+            image: File path, encoded image bytes, PIL Image object or OpenCV image
             save_intermediate: Whether to save intermediate steps
             output_dir: Directory to save intermediate images
+            quality: Report from check_quality for the same photo, so its tilt is not measured twice
         Returns:
             np.ndarray: Cleaned image
         """
@@ -79,6 +336,10 @@ class ImageCleaner:
         if save_intermediate:
             os.makedirs(output_dir, exist_ok=True)
 
+        # Without debug output, decode straight to reduced grayscale
+        if not save_intermediate:
+            return self.apply_blur(self.straighten(self.resize_image(self._load_grayscale(image)), quality))
+
         # Load image
         img = self.load_image(image)
         if save_intermediate:
@@ -94,13 +355,65 @@ class ImageCleaner:
         if save_intermediate:
             cv2.imwrite(os.path.join(output_dir, '03_resized.jpg'), img)
 
+        # Level a tilted page
+        img = self.straighten(img, quality)
+        if save_intermediate:
+            cv2.imwrite(os.path.join(output_dir, '04_deskewed.jpg'), img)
+
         # Apply blur
         img = self.apply_blur(img)
         if save_intermediate:
-            cv2.imwrite(os.path.join(output_dir, '04_blurred.jpg'), img)
+            cv2.imwrite(os.path.join(output_dir, '05_blurred.jpg'), img)
 
         return img
 
+    def _read_bytes(self, image):
+        if isinstance(image, str):
+            with open(image, 'rb') as f:
+                return f.read()
+        return image
+
+    def _scratch(self, shape):
+        # Per-thread buffer reused for intermediate results across a batch
+        size = int(np.prod(shape))
+        buffer = getattr(self._local, 'scratch', None)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=np.uint8)
+            self._local.scratch = buffer
+        return buffer[:size].reshape(shape)
+
+    def _load_grayscale(self, image):
+        if isinstance(image, (str, bytes, bytearray, memoryview)):
+            return self.decode_grayscale(self._read_bytes(image))
+        return self.grayscale(self.load_image(image))
+
+    def _process_for_batch(self, image):
+        img = self._load_grayscale(image)
+
+        # Resize into the thread's scratch buffer, blur into the output buffer. Every image in
+        # the returned list is alive at once, so outputs get their own buffer rather than a
+        # per-thread one that the next image would overwrite
+        shape = self.resized_shape(img)
+        if shape != img.shape:
+            img = self.resize_image(img, out=self._scratch(shape))
+        img = self.straighten(img)
+        return self.apply_blur(img, out=np.empty(shape, dtype=img.dtype))
+
+    def process_batch(self, images, max_workers=None):
+        """
+        Preprocess several images in parallel; OpenCV releases the GIL while decoding
+        Args:
+            images: File paths, encoded image bytes, PIL Images or OpenCV images
+            max_workers: Thread count; defaults to the number of CPUs
+        Returns:
+            list: Cleaned images in input order
+        """
+        images = list(images)
+        if not images:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(images), os.cpu_count() or 1)) as executor:
+            return list(executor.map(self._process_for_batch, images))
+
     def test_pipeline(self, image_paths, output_dir='test_output'):
         """
         Test the image processing pipeline with sample images
@@ -125,6 +438,19 @@ class ImageCleaner:
             except Exception as e:
                 print(f"Error processing image: {str(e)}")
 
+# Singleton instance
+image_cleaner = ImageCleaner()
+
+def check_image_quality(image):
+    """
+    Reject photos that cannot be read before any OCR work is done
+    Args:
+        image: File path, encoded image bytes, PIL Image object or OpenCV image
+    Returns:
+        dict: The quality report, if the photo is usable
+    """
+    return image_cleaner.check_quality(image)
+
 # Example usage
 def main():
     # Create cleaner instance
@@ -0,0 +1,89 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Every provider created in this process, by name
+_providers = {}
+
+class LazyProvider:
+    """
+    Build an expensive object (models, API clients) on first use instead of at import
+    """
+    def __init__(self, name, factory):
+        """
+        Initialize the provider
+        Args:
+            name (str): Name shown in the startup report
+            factory: Callable that builds the object
+        """
+        self.name = name
+        self.factory = factory
+        self.load_seconds = None
+        self._instance = None
+        self._lock = threading.Lock()
+        _providers[name] = self
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        """
+        Return the object, building it on the first call
+        Returns:
+            object: The provided instance
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    instance = self.factory()
+                    self.load_seconds = time.perf_counter() - started
+                    self._instance = instance
+                    logger.info(f"Loaded {self.name} in {self.load_seconds:.2f}s")
+        return self._instance
+
+    def warm_up(self):
+        """
+        Build the object now and let it finish any of its own warm-up
+        """
+        instance = self.get()
+        if hasattr(instance, 'warm_up'):
+            instance.warm_up()
+
+    def __repr__(self):
+        return f'<LazyProvider {self.name} loaded={self.loaded}>'
+
+def warm_up(names=None):
+    """
+    Load providers ahead of the first request, e.g. from a production worker's startup hook
+    Args:
+        names: Provider names to load; defaults to every provider
+    Returns:
+        list: Startup report after loading
+    """
+    for name, provider in _providers.items():
+        if names is None or name in names:
+            provider.warm_up()
+    report = startup_report()
+    for entry in report:
+        logger.info(f"{entry['name']}: loaded={entry['loaded']} seconds={entry['load_seconds']}")
+    return report
+
+def startup_report():
+    """
+    Report which providers have been loaded and how long each took
+    Returns:
+        list: One dict per provider
+    """
+    return [
+        {
+            'name': name,
+            'loaded': provider.loaded,
+            'load_seconds': round(provider.load_seconds, 3) if provider.load_seconds is not None else None
+        }
+        for name, provider in _providers.items()
+    ]
@@ -0,0 +1,56 @@
+import logging
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+def configure_sqlite(engine, busy_timeout_ms=5000, synchronous='NORMAL', wal=True):
+    """
+    Apply write-concurrency pragmas to every new SQLite connection of an engine.
+    WAL lets readers run alongside the single writer, busy_timeout makes a
+    blocked writer wait instead of failing with "database is locked", and
+    synchronous=NORMAL is durable enough under WAL while skipping an fsync per commit.
+    Args:
+        engine: SQLAlchemy engine
+        busy_timeout_ms (int): How long a connection waits for the write lock
+        synchronous (str): One of SYNCHRONOUS_LEVELS
+        wal (bool): Whether to switch the database to write-ahead logging
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    synchronous = synchronous.upper()
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Unknown SQLite synchronous level: {synchronous}")
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if wal:
+                # In-memory databases answer 'memory' and keep their journal
+                cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+            cursor.execute(f'PRAGMA synchronous={synchronous}')
+        finally:
+            cursor.close()
+
+    # Connections opened before this call keep their old settings
+    engine.dispose()
+    logger.info(f"SQLite tuned: WAL={wal}, busy_timeout={busy_timeout_ms}ms, synchronous={synchronous}")
+
+def init_app(app, db):
+    """
+    Tune the app's SQLite engine from the Flask config
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+    """
+    with app.app_context():
+        configure_sqlite(
+            db.engine,
+            busy_timeout_ms=app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+            synchronous=app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+            wal=app.config.get('SQLITE_WAL', True)
+        )
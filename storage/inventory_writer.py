@@ -0,0 +1,185 @@
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import Future
+from sqlalchemy import insert
+from models import db, InventoryUpload, InventoryItem
+from inventory.stock import update_current_stock
+from logic.item_stats import update_item_stats
+from inventory.canonical import canonical_index
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+def insert_uploads(session, uploads):
+    """
+    Insert uploads and all their items with one statement per table,
+    and bring current_stock and item_stats up to date in the same transaction
+    Args:
+        session: SQLAlchemy session; the caller commits
+        uploads: Dicts with user_id, filename and items, and optionally an upload_time
+    Returns:
+        list: New upload ids, in input order
+    """
+    now = datetime.utcnow()
+    times = [upload.get('upload_time') or now for upload in uploads]
+    # Match every name to its canonical item first, so items and stock rows share ids
+    counts = [(upload['user_id'], None, upload_time, [dict(item) for item in upload['items']])
+              for upload, upload_time in zip(uploads, times)]
+    canonical_index.annotate(session, counts)
+    upload_ids = session.scalars(
+        insert(InventoryUpload).returning(InventoryUpload.id, sort_by_parameter_order=True),
+        [{'user_id': upload['user_id'], 'filename': upload['filename'], 'upload_time': upload_time}
+         for upload, upload_time in zip(uploads, times)]
+    ).all()
+
+    counts = [
+        (user_id, upload_id, upload_time, items)
+        for upload_id, (user_id, _, upload_time, items) in zip(upload_ids, counts)
+    ]
+    rows = [
+        {'upload_id': upload_id, 'name': item['name'], 'quantity': item['quantity'], 'item_id': item['item_id']}
+        for _, upload_id, _, items in counts
+        for item in items
+    ]
+    if rows:
+        session.execute(insert(InventoryItem), rows)
+    update_current_stock(session, counts)
+    update_item_stats(session, counts)
+    return upload_ids
+
+class InventoryWriter:
+    """
+    Single writer thread that saves uploads from concurrent jobs together.
+    Whatever is queued while a transaction commits goes into the next one,
+    so SQLite's one write lock is taken once per batch instead of once per upload.
+    """
+    def __init__(self, max_batch=64, batch_window=0.0, timeout=30.0):
+        """
+        Initialize the writer
+        Args:
+            max_batch (int): Most uploads written in one transaction
+            batch_window (float): Seconds to wait for more uploads before writing
+            timeout (float): Seconds save() waits for its transaction
+        """
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.app = None
+        self.uploads_written = 0
+        self.transactions = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Bind the writer to a Flask app; the writer thread runs inside its app context
+        Args:
+            app: Flask application
+        """
+        self.app = app
+        self.max_batch = app.config.get('INVENTORY_WRITE_MAX_BATCH', self.max_batch)
+        self.batch_window = app.config.get('INVENTORY_WRITE_WINDOW_MS', self.batch_window * 1000) / 1000
+        app.extensions['inventory_writer'] = self
+
+    def start(self):
+        """
+        Start the writer thread if it is not running yet
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='inventory-writer', daemon=True)
+                self._thread.start()
+
+    def save(self, user_id, filename, items, on_write=None):
+        """
+        Save an upload and its items, waiting until they are committed
+        Args:
+            user_id: Owner of the upload
+            filename: Name recorded for the upload
+            items: Extracted items with names and quantities
+            on_write: Optional callable run inside the same transaction
+        Returns:
+            int: The new upload id
+        """
+        upload = {'user_id': user_id, 'filename': filename, 'items': items,
+                  'on_write': on_write, 'future': Future()}
+
+        # Without a bound app, write in the caller's own session
+        if self.app is None:
+            upload_id = insert_uploads(db.session, [upload])[0]
+            if on_write:
+                on_write()
+            db.session.commit()
+            return upload_id
+
+        self.start()
+        self._queue.put(upload)
+        return upload['future'].result(timeout=self.timeout)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with self.app.app_context():
+                    self._write(batch)
+            except Exception as e:
+                logger.error(f"Inventory writer failed: {str(e)}")
+                for upload in batch:
+                    if not upload['future'].done():
+                        upload['future'].set_exception(e)
+
+    def _write(self, batch):
+        try:
+            upload_ids = insert_uploads(db.session, batch)
+            for upload in batch:
+                if upload['on_write']:
+                    upload['on_write']()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                batch[0]['future'].set_exception(e)
+                return
+            # Retry one by one so a single bad upload does not fail the others
+            logger.warning(f"Batch of {len(batch)} uploads failed, retrying individually: {str(e)}")
+            for upload in batch:
+                self._write([upload])
+            return
+
+        with self._lock:
+            self.uploads_written += len(batch)
+            self.transactions += 1
+        for upload, upload_id in zip(batch, upload_ids):
+            upload['future'].set_result(upload_id)
+
+    def stats(self):
+        """
+        Write counters for this process
+        Returns:
+            dict: Uploads written, transactions and average batch size
+        """
+        with self._lock:
+            uploads, transactions = self.uploads_written, self.transactions
+        return {
+            'uploads_written': uploads,
+            'transactions': transactions,
+            'average_batch': uploads / transactions if transactions else 0.0
+        }
+
+# Singleton instance
+inventory_writer = InventoryWriter()
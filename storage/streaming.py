@@ -0,0 +1,65 @@
+import hashlib
+import tempfile
+from flask import Request, current_app
+
+# Uploads up to this size stay in memory; larger ones spill to a temp file
+DEFAULT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+class HashingSpooledFile:
+    """
+    Upload buffer that keeps the bytes in memory up to a size limit, spills
+    to an anonymous temp file past it, and hashes the bytes as they arrive
+    """
+    def __init__(self, max_size=DEFAULT_SPOOL_MAX_BYTES):
+        """
+        Initialize the buffer
+        Args:
+            max_size (int): Bytes held in memory before spilling to disk
+        """
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        # The form parser writes each part sequentially, once
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        """
+        SHA-256 of everything written so far
+        Returns:
+            str: Hex digest
+        """
+        return self._hash.hexdigest()
+
+    @property
+    def spilled(self):
+        return self._file._rolled
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+class StreamingRequest(Request):
+    """
+    Request whose file uploads are streamed into HashingSpooledFile buffers
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(current_app.config.get('UPLOAD_SPOOL_MAX_BYTES', DEFAULT_SPOOL_MAX_BYTES))
+
+def uploaded_digest(file, data):
+    """
+    SHA-256 of an uploaded file, reusing the hash computed while it streamed in
+    Args:
+        file: Werkzeug FileStorage
+        data: The file's bytes, hashed directly when the stream did not do it
+    Returns:
+        str: Hex digest
+    """
+    if isinstance(file.stream, HashingSpooledFile):
+        return file.stream.hexdigest()
+    return hashlib.sha256(data).hexdigest()
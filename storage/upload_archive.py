@@ -0,0 +1,87 @@
+import os
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+class UploadArchive:
+    """
+    Write original upload bytes to disk in the background so archiving
+    never sits on the processing path. Originals are stored under their
+    SHA-256, so identical photos from any user are kept once and two
+    uploads sharing a filename can never overwrite each other.
+    """
+    def __init__(self, folder='uploads', enabled=True):
+        """
+        Initialize the archive
+        Args:
+            folder (str): Directory that receives archived originals
+            enabled (bool): Whether archiving is enabled at all
+        """
+        self.folder = folder
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-archive')
+
+    def init_app(self, app):
+        """
+        Read archive settings from the Flask config
+        Args:
+            app: Flask application
+        """
+        self.folder = app.config.get('UPLOAD_FOLDER', self.folder)
+        self.enabled = app.config.get('ARCHIVE_UPLOADS', self.enabled)
+
+    def path_for(self, digest, filename=''):
+        """
+        Content-addressed location of an original
+        Args:
+            digest: Hex SHA-256 of the bytes
+            filename: Uploaded file name; only its extension is kept
+        Returns:
+            str: Path under the archive folder
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(self.folder, digest[:2], digest + extension)
+
+    def archive(self, data, filename, digest=None):
+        """
+        Schedule the original bytes to be written to the archive folder
+        Args:
+            data: Encoded image bytes
+            filename: Sanitized file name
+            digest: Hex SHA-256 of data, if already known
+        Returns:
+            Future or None: Pending write, or None when archiving is disabled
+        """
+        if not self.enabled:
+            return None
+        if digest is None:
+            digest = hashlib.sha256(data).hexdigest()
+        return self._executor.submit(self._write, bytes(data), self.path_for(digest, filename))
+
+    def _write(self, data, path):
+        try:
+            # Already archived, possibly by another user
+            if os.path.exists(path):
+                return path
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # Write aside and rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            return path
+        except Exception as e:
+            logger.error(f"Failed to archive upload {path}: {str(e)}")
+            return None
+
+# Singleton instance
+upload_archive = UploadArchive()
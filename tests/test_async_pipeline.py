@@ -0,0 +1,87 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from models import db, User, InventoryUpload
+from ocr.ocr_processor import OCRProcessor
+from jobs.async_pipeline import AsyncPipeline
+
+class FakeProcessor(OCRProcessor):
+    """OCRProcessor without PaddleOCR: every page reads as the image bytes' text"""
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def read_page(self, image, quality=None):
+        time.sleep(0.05)
+        return image.decode()
+
+async def fake_gemini(ocr_result):
+    # Stands in for the awaited Gemini call
+    await asyncio.sleep(0.3)
+    return [] if ocr_result == 'blank' else [{'name': ocr_result, 'quantity': 1}]
+
+@patch('jobs.async_pipeline.parse_ocr_result_async', fake_gemini)
+class TestAsyncPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')
+        db.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            user = User(email='shop@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+        self.pipeline = AsyncPipeline(self.app, cpu_workers=4)
+        provider = patch('jobs.async_pipeline.ocr_processor')
+        provider.start().get.return_value = FakeProcessor()
+        self.addCleanup(provider.stop)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def test_uploads_overlap_while_gemini_is_awaited(self):
+        """Test several uploads in flight at once take about as long as one"""
+        async def run():
+            return await asyncio.gather(*(
+                self.pipeline.process_upload(name.encode(), f'{name}.jpg', self.user_id)
+                for name in ['Rice', 'Tea', 'Salt', 'Sugar', 'Milk']
+            ))
+
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 1.0)
+        payload, status_code = results[1]
+        self.assertEqual(status_code, 200)
+        self.assertEqual(set(payload), {'success', 'items', 'reorder_suggestions', 'saved_file'})
+        self.assertEqual(payload['items'], [{'name': 'Tea', 'quantity': 1}])
+        with self.app.app_context():
+            self.assertEqual(InventoryUpload.query.count(), 5)
+
+    def test_empty_page(self):
+        """Test a page without items gets the same error as the threaded pipeline"""
+        payload, status_code = self.pipeline.submit(b'blank', 'blank.jpg', self.user_id).result(timeout=5)
+
+        self.assertEqual((payload, status_code), ({'error': 'No items found in image'}, 400))
+
+    @patch('jobs.pipeline.whatsapp_outbox')
+    def test_notification_is_queued(self, outbox):
+        """Test a phone number queues the suggestions like the threaded pipeline"""
+        payload, status_code = asyncio.run(
+            self.pipeline.process_upload(b'Rice', 'rice.jpg', self.user_id, '923001234567'))
+
+        self.assertEqual(payload['whatsapp_status'], 'queued')
+        outbox.enqueue.assert_called_once_with('923001234567', payload['reorder_suggestions'], self.user_id)
+
+if __name__ == '__main__':
+    unittest.main()
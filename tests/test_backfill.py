@@ -0,0 +1,128 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from models import db, User, InventoryUpload, CurrentStock, ItemStats
+from jobs.backfill import Backfill
+from storage.inventory_writer import InventoryWriter
+
+# What the fake processor reads from each file's bytes
+PAGES = {
+    b'day1': [{'name': 'Rice', 'quantity': 9}],
+    b'day2': [{'name': 'Rice', 'quantity': 4}],
+    b'blank': [],
+    b'broken': None
+}
+
+class FakeProcessor:
+    def extract_items(self, data):
+        if PAGES[data] is None:
+            raise ValueError('Unreadable image')
+        return PAGES[data]
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(email='shop@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+
+        self.photos = os.path.join(self.tmpdir.name, 'photos')
+        os.makedirs(os.path.join(self.photos, 'march'))
+        for i, (name, data) in enumerate([('march/a.jpg', b'day1'), ('b.jpg', b'day2'),
+                                          ('c.png', b'blank'), ('d.jpg', b'broken')]):
+            path = os.path.join(self.photos, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            os.utime(path, (1700000000 + i * 86400, 1700000000 + i * 86400))
+        with open(os.path.join(self.photos, 'notes.txt'), 'w') as f:
+            f.write('not a photo')
+        self.report = os.path.join(self.tmpdir.name, 'report.jsonl')
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.ctx.pop()
+        self.tmpdir.cleanup()
+
+    def backfill(self):
+        return Backfill(self.photos, self.user_id, self.report, processes=0, batch_size=2,
+                        processor_factory=lambda cpu_threads: FakeProcessor())
+
+    def read_report(self):
+        with open(self.report) as f:
+            return [json.loads(line) for line in f]
+
+    def test_backfills_in_file_time_order(self):
+        """Test files are saved dated by mtime, with a report line per file"""
+        counts = self.backfill().run()
+
+        self.assertEqual(counts, {'saved': 2, 'empty': 1, 'failed': 1, 'skipped': 0})
+        uploads = InventoryUpload.query.order_by(InventoryUpload.upload_time).all()
+        self.assertEqual([u.filename for u in uploads], [os.path.join('march', 'a.jpg'), 'b.jpg'])
+        self.assertEqual(uploads[0].upload_time.isoformat(), '2023-11-14T22:13:20')
+        # The later photo's count is the current stock
+        self.assertEqual(CurrentStock.query.filter_by(user_id=self.user_id, item_key='rice').one().quantity, 4)
+
+        report = {entry['file']: entry for entry in self.read_report()}
+        self.assertEqual(report['b.jpg']['status'], 'saved')
+        self.assertEqual(report['c.png']['status'], 'empty')
+        self.assertEqual(report['d.jpg']['status'], 'failed')
+        self.assertIn('total_ms', report['b.jpg']['timings'])
+
+    def test_resume_skips_finished_files(self):
+        """Test a rerun only retries failures, even when report lines were lost"""
+        self.backfill().run()
+        # Lose the report line of a saved file, as a crash after the commit would
+        lines = [entry for entry in self.read_report() if entry['file'] != 'b.jpg']
+        with open(self.report, 'w') as f:
+            f.writelines(json.dumps(entry) + '\n' for entry in lines)
+        PAGES[b'broken'] = [{'name': 'Tea', 'quantity': 1}]
+        try:
+            counts = self.backfill().run()
+        finally:
+            PAGES[b'broken'] = None
+
+        self.assertEqual(counts, {'saved': 1, 'empty': 0, 'failed': 0, 'skipped': 3})
+        self.assertEqual(InventoryUpload.query.count(), 3)
+
+    def test_files_are_read_as_they_are_looked_up(self):
+        """Test a file is handed to OCR before later files are hashed and looked up in the cache"""
+        events = []
+        extract_items = FakeProcessor.extract_items
+
+        def read(processor, data):
+            events.append('read')
+            return extract_items(processor, data)
+
+        with patch('jobs.backfill.result_cache.get', side_effect=lambda digest, touch: events.append('lookup')), \
+                patch.object(FakeProcessor, 'extract_items', read):
+            self.backfill().run()
+
+        self.assertEqual(events, ['lookup', 'read'] * 4)
+
+    def test_older_photos_reach_usage_statistics(self):
+        """Test photos older than the latest upload are replayed into item usage"""
+        InventoryWriter().save(self.user_id, 'today.jpg', [{'name': 'Rice', 'quantity': 2}])
+
+        self.backfill().run()
+
+        stats = ItemStats.query.filter_by(user_id=self.user_id, item_key='rice').one()
+        self.assertEqual(stats.observations, 3)
+        self.assertEqual(stats.last_quantity, 2)
+        self.assertGreater(stats.consumed, 0)
+        # Stock keeps today's count
+        self.assertEqual(CurrentStock.query.filter_by(user_id=self.user_id, item_key='rice').one().quantity, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import io
+import os
+import tempfile
+import zipfile
+import unittest
+from unittest.mock import patch, MagicMock
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from models import db, User, InventoryUpload
+from jobs.batch import BatchError, collect_pages, merge_items, run_batch
+from ocr.result_cache import image_digest
+from preprocessing.image_cleaner import ImageQualityError
+
+EXTENSIONS = {'png', 'jpg', 'jpeg'}
+
+def make_zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+class TestBatchUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(email='shop@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.ctx.pop()
+        self.tmpdir.cleanup()
+
+    def test_collect_pages_expands_zip(self):
+        """Test images and ZIP members become pages in order, skipping non-images"""
+        files = [
+            FileStorage(io.BytesIO(b'page-a'), filename='a.jpg'),
+            FileStorage(make_zip({'register/2.png': b'page-c', 'register/1.jpg': b'page-b',
+                                  'notes.txt': b'x', '__MACOSX/._1.jpg': b'x'}), filename='register.zip')
+        ]
+
+        pages = collect_pages(files, EXTENSIONS)
+
+        self.assertEqual(pages, [('a.jpg', b'page-a'), ('1.jpg', b'page-b'), ('2.png', b'page-c')])
+
+    def test_collect_pages_limits(self):
+        """Test oversized archives and too many pages are rejected"""
+        big = FileStorage(make_zip({'1.jpg': b'x' * 1000}), filename='big.zip')
+        with self.assertRaises(BatchError):
+            collect_pages([big], EXTENSIONS, max_bytes=999)
+
+        many = [FileStorage(io.BytesIO(b'x'), filename=f'{i}.jpg') for i in range(3)]
+        with self.assertRaises(BatchError):
+            collect_pages(many, EXTENSIONS, max_pages=2)
+
+    def test_merge_items_deduplicates_by_name(self):
+        """Test an item on several pages is kept once with the latest page's count"""
+        merged = merge_items([
+            [{'name': 'Rice', 'quantity': 5}, {'name': 'Tea', 'quantity': 2}],
+            [{'name': ' rice ', 'quantity': 3}, {'name': 'Salt', 'quantity': 1}]
+        ])
+
+        self.assertEqual(merged, [{'name': 'Rice', 'quantity': 3}, {'name': 'Tea', 'quantity': 2},
+                                  {'name': 'Salt', 'quantity': 1}])
+
+    @patch('jobs.batch.upload_archive')
+    @patch('jobs.batch.whatsapp_outbox')
+    @patch('jobs.batch.parse_many_ocr_results_with_gemini')
+    @patch('jobs.batch.ocr_processor')
+    def test_run_batch_streams_pages_and_saves_once(self, provider, parse_many, outbox, archive):
+        """Test every page is reported, the batch is saved as one upload and one message is queued"""
+        pages_read = {
+            'page-1': [{'name': 'Rice', 'quantity': 2}],
+            'page-2': [],
+            'page-3': [{'name': 'rice', 'quantity': 1}, {'name': 'Tea', 'quantity': 20}]
+        }
+        # OCR results stand in as the page text, which the corrector reads back
+        provider.get.return_value.read_page.side_effect = lambda data, quality: [data.decode()]
+        parse_many.side_effect = lambda ocr_results: [pages_read[text] for text, in ocr_results]
+        pages = [(f'{i}.jpg', f'page-{i}'.encode()) for i in (1, 2, 3)]
+
+        events = list(run_batch(self.app, pages, self.user_id, '923001234567', workers=3))
+
+        self.assertEqual(sorted(e['page'] for e in events if e['type'] == 'ocr'), [1, 2, 3])
+        page_events = sorted((e for e in events if e['type'] == 'page'), key=lambda e: e['page'])
+        self.assertEqual([e['status'] for e in page_events], ['done', 'failed', 'done'])
+        # One correction pass for the whole batch
+        parse_many.assert_called_once()
+        self.assertEqual(archive.archive.call_count, 3)
+        summary = events[-1]
+        self.assertEqual(summary['type'], 'summary')
+        self.assertEqual(summary['items'], [{'name': 'Rice', 'quantity': 1}, {'name': 'Tea', 'quantity': 20}])
+        self.assertEqual([s['name'] for s in summary['reorder_suggestions']], ['Rice'])
+        self.assertEqual(summary['whatsapp_status'], 'queued')
+        outbox.enqueue.assert_called_once()
+
+        upload = db.session.get(InventoryUpload, summary['upload_id'])
+        self.assertEqual(upload.filename, '1.jpg (+2 pages)')
+        self.assertEqual(len(upload.items), 2)
+
+    @patch('jobs.batch.upload_archive')
+    @patch('jobs.batch.check_image_quality')
+    @patch('jobs.batch.parse_many_ocr_results_with_gemini')
+    @patch('jobs.batch.ocr_processor')
+    def test_run_batch_skips_rejected_and_cached_pages(self, provider, parse_many, check_quality, archive):
+        """Test rejected photos are neither archived nor read, and cached pages skip OCR and Gemini"""
+        def check(data):
+            if data == b'blurry':
+                raise ImageQualityError('Photo is too blurry', {})
+            return {'skew': 3.0, 'skew_confidence': 9.0}
+        check_quality.side_effect = check
+        provider.get.return_value.read_page.return_value = ['text']
+        parse_many.return_value = [[{'name': 'Tea', 'quantity': 4}]]
+        with patch('jobs.batch.result_cache') as cache:
+            cache.get.side_effect = lambda digest, touch: \
+                [{'name': 'Rice', 'quantity': 2}] if digest == image_digest(b'seen') else None
+            events = list(run_batch(self.app, [('a.jpg', b'blurry'), ('b.jpg', b'seen'), ('c.jpg', b'new')],
+                                    self.user_id, check_quality=True))
+
+        page_events = {e['page']: e for e in events if e['type'] == 'page'}
+        self.assertEqual(page_events[1]['error'], 'Photo is too blurry')
+        self.assertTrue(page_events[2]['cached'])
+        self.assertEqual(page_events[3]['items'], [{'name': 'Tea', 'quantity': 4}])
+        provider.get.return_value.read_page.assert_called_once_with(b'new', {'skew': 3.0, 'skew_confidence': 9.0})
+        parse_many.assert_called_once_with([['text']])
+        self.assertEqual([c.args[0] for c in archive.archive.call_args_list], [b'seen', b'new'])
+        cache.touch.assert_called_once_with(image_digest(b'seen'))
+        cache.put.assert_called_once_with(image_digest(b'new'), [{'name': 'Tea', 'quantity': 4}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from sqlalchemy import event
+from flask import Flask
+from models import db, User, InventoryItem, CurrentStock
+from inventory.canonical import canonical_index, edit_distance
+from storage.inventory_writer import InventoryWriter
+
+class TestCanonicalIndex(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(email='shop@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.writer = InventoryWriter()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def resolve(self, name):
+        item_id, _ = canonical_index.resolve(db.session, self.user_id, name)
+        return item_id
+
+    def test_edit_distance(self):
+        """Test swapped neighbours count as one edit and the limit stops early"""
+        self.assertEqual(edit_distance('milk', 'mlik', 2), 1)
+        self.assertEqual(edit_distance('sugar', 'suggar', 2), 1)
+        self.assertEqual(edit_distance('rice', 'cooking oil', 2), 3)
+
+    def test_spellings_share_an_id(self):
+        """Test case, pack size and OCR typos map to one item"""
+        milk = self.resolve('Milk')
+
+        self.assertEqual(self.resolve('milk 1L'), milk)
+        self.assertEqual(self.resolve('Mlik'), milk)
+        self.assertEqual(self.resolve('  MILK '), milk)
+
+    def test_different_products_stay_apart(self):
+        """Test other pack sizes and short look-alike names get their own ids"""
+        self.assertNotEqual(self.resolve('Sugar 1kg'), self.resolve('Sugar 5kg'))
+        self.assertNotEqual(self.resolve('Tea'), self.resolve('Pea'))
+        self.assertNotEqual(self.resolve('Butter'), self.resolve('Batter'))
+
+    def test_lookalike_characters_match(self):
+        """Test a misread look-alike character still finds the item"""
+        rice = self.resolve('Rice')
+
+        self.assertEqual(self.resolve('Rlce'), rice)
+        self.assertEqual(self.resolve('R1ce'), rice)
+
+    def test_mapping_survives_a_reload(self):
+        """Test committed items are read back from the database"""
+        milk = self.resolve('Milk')
+        self.resolve('Mlik')
+        db.session.commit()
+        canonical_index.invalidate()
+
+        self.assertEqual(canonical_index.lookup(db.session, self.user_id, 'mlik'), milk)
+        self.assertEqual(self.resolve('Milk 1l'), milk)
+
+    def test_rollback_forgets_new_items(self):
+        """Test items created in a rolled back transaction are not matched later"""
+        self.resolve('Rice')
+        db.session.commit()
+        self.resolve('Cooking Oil')
+        db.session.rollback()
+
+        self.assertIsNone(canonical_index.lookup(db.session, self.user_id, 'Cooking Oil'))
+        self.assertIsNotNone(canonical_index.lookup(db.session, self.user_id, 'Rice'))
+
+    def test_new_spelling_round_trips(self):
+        """Test a new spelling of a known item costs one statement and a new item two"""
+        self.resolve('Milk')
+        statements = []
+        listen = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listen)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute', listen)
+
+        self.resolve('Mlik')
+        self.assertEqual(len(statements), 1)
+        self.resolve('Cooking Oil')
+        self.assertEqual(len(statements), 3)
+
+    def test_saved_items_carry_ids(self):
+        """Test a saved upload links items and stock rows to the same canonical items"""
+        self.writer.save(self.user_id, 'monday.jpg', [{'name': 'Milk', 'quantity': 5}])
+        self.writer.save(self.user_id, 'tuesday.jpg', [{'name': 'Mlik', 'quantity': 3}])
+
+        ids = {item.item_id for item in InventoryItem.query}
+        self.assertEqual(len(ids), 1)
+        stock = CurrentStock.query.all()
+        self.assertEqual([(row.item_key, row.item_id, row.quantity) for row in stock],
+                         [('milk', ids.pop(), 3)])
+
+if __name__ == '__main__':
+    unittest.main()
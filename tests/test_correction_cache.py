@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from corrector.correction_cache import CorrectionCache
+from corrector.gemini_corrector import GeminiCorrector
+
+class TestCorrectionCache(unittest.TestCase):
+    def test_key_ignores_cosmetic_whitespace(self):
+        """Test normalized text shares a key while prompt version and model do not"""
+        key = CorrectionCache.make_key("milk\t2\neggs\t12", '1', 'gemini-2.0-flash')
+        self.assertEqual(key, CorrectionCache.make_key(" milk \t2\n\neggs  \t12 ", '1', 'gemini-2.0-flash'))
+        self.assertNotEqual(key, CorrectionCache.make_key("milk\t2\neggs\t12", '2', 'gemini-2.0-flash'))
+        self.assertNotEqual(key, CorrectionCache.make_key("milk\t2\neggs\t12", '1', 'gemini-2.5-flash'))
+
+    def test_lru_eviction(self):
+        """Test the in-memory tier evicts the least recently used entry"""
+        cache = CorrectionCache(max_entries=2)
+        cache.put('a', '[1]')
+        cache.put('b', '[2]')
+        cache.get('a')
+        cache.put('c', '[3]')
+
+        self.assertEqual(cache.get('a'), '[1]')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), '[3]')
+
+    def test_ttl_expiry(self):
+        """Test expired responses are not returned"""
+        cache = CorrectionCache(ttl=60)
+        with patch('corrector.correction_cache.time.time', return_value=1000.0):
+            cache.put('a', '[1]')
+        with patch('corrector.correction_cache.time.time', return_value=1059.0):
+            self.assertEqual(cache.get('a'), '[1]')
+        with patch('corrector.correction_cache.time.time', return_value=1061.0):
+            self.assertIsNone(cache.get('a'))
+
+    def test_disk_tier_survives_new_instance(self):
+        """Test responses persist on disk and can be invalidated"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'gemini_cache.sqlite')
+            CorrectionCache(path=path).put('a', '[1]')
+
+            cache = CorrectionCache(path=path)
+            self.assertEqual(cache.get('a'), '[1]')
+
+            cache.invalidate('a')
+            self.assertIsNone(CorrectionCache(path=path).get('a'))
+
+    @patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+    def test_corrector_skips_gemini_for_repeat_text(self):
+        """Test a repeated page is served from the cache"""
+        ocr_result = [[[[10, 20], [100, 20], [100, 40], [10, 40]], ["milk", 0.95]]]
+        corrector = GeminiCorrector(cache=CorrectionCache())
+        corrector.client = MagicMock()
+        corrector.client.models.generate_content.return_value = MagicMock(
+            text='[{"name": "milk", "quantity": 2}]'
+        )
+        corrector.logger = MagicMock()
+
+        first = corrector.parse_ocr_result_with_gemini(ocr_result)
+        second = corrector.parse_ocr_result_with_gemini(ocr_result)
+
+        self.assertEqual(first, second)
+        corrector.client.models.generate_content.assert_called_once()
+
+        corrector.invalidate_cache(ocr_result)
+        corrector.parse_ocr_result_with_gemini(ocr_result)
+        self.assertEqual(corrector.client.models.generate_content.call_count, 2)
+
+    @patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+    def test_invalidate_partly_local_page(self):
+        """Test invalidating a page whose clean rows were read locally drops the cached rest, leaving stats alone"""
+        rows = [('milk', 0.95, '2'), ('eggs', 0.95, '12'), ('rice', 0.95, '5'), ('tea', 0.95, '3'),
+                ('smudged', 0.5, '7')]
+        ocr_result = []
+        for i, (name, confidence, quantity) in enumerate(rows):
+            top = 20 + i * 30
+            ocr_result.append([[[10, top], [100, top], [100, top + 20], [10, top + 20]], [name, confidence]])
+            ocr_result.append([[[120, top], [160, top], [160, top + 20], [120, top + 20]], [quantity, 0.95]])
+        corrector = GeminiCorrector(cache=CorrectionCache())
+        corrector.client = MagicMock()
+        corrector.client.models.generate_content.return_value = MagicMock(
+            text='[{"name": "sugar", "quantity": 7}]'
+        )
+        corrector.logger = MagicMock()
+
+        corrector.parse_ocr_result_with_gemini(ocr_result)
+        corrector.parse_ocr_result_with_gemini(ocr_result)
+        corrector.client.models.generate_content.assert_called_once()
+
+        stats = corrector.local_stats.to_dict()
+        corrector.invalidate_cache(ocr_result)
+        self.assertEqual(corrector.local_stats.to_dict(), stats)
+        self.assertEqual(stats['partial_pages'], 2)
+
+        corrector.parse_ocr_result_with_gemini(ocr_result)
+        self.assertEqual(corrector.client.models.generate_content.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
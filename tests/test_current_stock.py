@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+from flask import Flask
+from models import db, User, CurrentStock
+from inventory.stock import normalize_item_name, update_current_stock, get_current_stock, rebuild_current_stock
+from storage.inventory_writer import InventoryWriter
+
+class TestCurrentStock(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(email='shop@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        # Not bound to an app, so saves run inline in this session
+        self.writer = InventoryWriter()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def stock(self):
+        return {row.item_key: row.quantity for row in get_current_stock(self.user_id)}
+
+    def test_normalize_item_name(self):
+        """Test names differing only in case and spacing share a key"""
+        self.assertEqual(normalize_item_name('  Basmati   RICE '), 'basmati rice')
+
+    def test_saving_an_upload_updates_stock(self):
+        """Test each saved upload moves the stock to its latest counts"""
+        self.writer.save(self.user_id, 'monday.jpg', [{'name': 'Rice', 'quantity': 5},
+                                                      {'name': 'Tea', 'quantity': 2}])
+        self.writer.save(self.user_id, 'tuesday.jpg', [{'name': 'rice ', 'quantity': 3}])
+
+        self.assertEqual(self.stock(), {'rice': 3, 'tea': 2})
+        self.assertEqual(CurrentStock.query.filter_by(item_key='rice').one().name, 'rice ')
+
+    def test_older_page_does_not_overwrite_newer_count(self):
+        """Test stock only moves forward in time"""
+        self.writer.save(self.user_id, 'today.jpg', [{'name': 'Rice', 'quantity': 3}])
+        upload_id = self.writer.save(self.user_id, 'scan.jpg', [])
+        update_current_stock(db.session, [(self.user_id, upload_id, datetime(2000, 1, 1),
+                                           [{'name': 'Rice', 'quantity': 40}])])
+        db.session.commit()
+
+        self.assertEqual(self.stock(), {'rice': 3})
+
+    def test_rebuild_matches_incremental(self):
+        """Test a rebuild from history reproduces the incrementally kept table"""
+        for quantities in ({'Rice': 5, 'Tea': 2}, {'Rice': 4}, {'Sugar': 7, 'tea': 1}):
+            self.writer.save(self.user_id, 'page.jpg',
+                             [{'name': name, 'quantity': quantity} for name, quantity in quantities.items()])
+        incremental = self.stock()
+
+        db.session.query(CurrentStock).delete()
+        db.session.commit()
+        count = rebuild_current_stock()
+
+        self.assertEqual(count, 3)
+        self.assertEqual(self.stock(), incremental)
+        self.assertEqual(incremental, {'rice': 4, 'sugar': 7, 'tea': 1})
+
+if __name__ == '__main__':
+    unittest.main()
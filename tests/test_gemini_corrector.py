@@ -1,5 +1,7 @@
+import asyncio
+import threading
 import unittest
-from unittest.mock import patch, MagicMock, call
+from unittest.mock import patch, MagicMock, AsyncMock, call
 from corrector.gemini_corrector import GeminiCorrector
 import logging
 
@@ -149,5 +151,159 @@ class TestGeminiCorrector(unittest.TestCase):
         # Verify logging
         mock_logger.error.assert_called_once()
 
+    def _box(self, x, top, width, height, text):
+        return [
+            [[x, top], [x + width, top], [x + width, top + height], [x, top + height]],
+            [text, 0.9]
+        ]
+
+    def test_structure_text_groups_by_box_center(self):
+        """Test a tall box shares a row with shorter boxes centred on the same line"""
+        corrector = GeminiCorrector()
+        ocr_result = [
+            self._box(10, 20, 80, 20, "milk"),
+            self._box(120, 5, 40, 50, "2"),  # Tall handwriting, top is 15px higher
+            self._box(10, 60, 80, 20, "eggs"),
+            self._box(120, 60, 40, 20, "12")
+        ]
+
+        self.assertEqual(corrector._structure_text(ocr_result), "milk\t2\neggs\t12")
+
+    def test_structure_text_splits_drifting_rows(self):
+        """Test skewed rows that chain together by small gaps are still separated"""
+        corrector = GeminiCorrector()
+        # Small text on tightly spaced, slightly skewed rows: every gap between
+        # neighbouring boxes is under the old fixed 10px threshold
+        ocr_result = []
+        for row in range(3):
+            for column in range(4):
+                top = 20 + row * 14 + column * 2
+                ocr_result.append(self._box(10 + column * 100, top, 90, 12, f"r{row}c{column}"))
+
+        self.assertEqual(corrector._structure_text(ocr_result), "\n".join(
+            "\t".join(f"r{row}c{column}" for column in range(4)) for row in range(3)
+        ))
+
+    def test_dense_pages_cluster_like_small_pages(self):
+        """Test the NumPy clustering used on dense pages orders boxes exactly as the plain one"""
+        corrector = GeminiCorrector()
+        # Rows drifting by more than their spacing chain together and must be re-split
+        ocr_result = []
+        for row in range(40):
+            for column in range(5):
+                top = 20 + row * 30 + column * 9 + (row * 7 + column * 3) % 5
+                ocr_result.append(self._box(10 + column * 100 + row % 3, top, 90, 24, f"r{row}c{column}"))
+        ocr_result = ocr_result[1::2] + ocr_result[::2]
+
+        with patch('corrector.gemini_corrector.VECTORIZE_MIN_BOXES', 10 ** 6):
+            small = corrector._order_boxes(ocr_result)
+        with patch('corrector.gemini_corrector.VECTORIZE_MIN_BOXES', 1):
+            dense = corrector._order_boxes(ocr_result)
+
+        self.assertEqual(dense, small)
+        self.assertGreaterEqual(len(small[3]), 40)
+
+    def test_structure_text_handles_missing_result(self):
+        """Test a page where PaddleOCR found nothing structures to empty text"""
+        corrector = GeminiCorrector()
+        corrector.client = MagicMock()
+
+        self.assertEqual(corrector._structure_text(None), "")
+        self.assertEqual(corrector.parse_ocr_result_with_gemini(None), [])
+        corrector.client.models.generate_content.assert_not_called()
+
+    def _page(self, text, quantity):
+        return [
+            [[[10, 20], [100, 20], [100, 40], [10, 40]], [text, 0.95]],
+            [[[120, 20], [210, 20], [210, 40], [120, 40]], [quantity, 0.90]]
+        ]
+
+    def test_parse_many_single_request(self):
+        """Test several pages are corrected with one batched request"""
+        mock_model = MagicMock()
+        mock_response = MagicMock()
+        mock_response.text = '{"1": [{"name": "milk", "quantity": 2}], "2": [{"name": "eggs", "quantity": 12}]}'
+        mock_model.generate_content.return_value = mock_response
+        corrector = GeminiCorrector()
+        corrector.client = MagicMock(models=mock_model)
+        corrector.logger = MagicMock()
+
+        result = corrector.parse_many([self._page("milk", "2"), self._page("eggs", "12")])
+
+        self.assertEqual(result, [
+            [{'name': 'milk', 'quantity': 2}],
+            [{'name': 'eggs', 'quantity': 12}]
+        ])
+        mock_model.generate_content.assert_called_once()
+        prompt = mock_model.generate_content.call_args[1]['contents']
+        self.assertIn("=== PAGE 1 ===\nmilk\t2", prompt)
+        self.assertIn("=== PAGE 2 ===\neggs\t12", prompt)
+
+    def test_parse_many_falls_back_on_malformed_batch(self):
+        """Test a malformed batch response falls back to per-page requests"""
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = [
+            MagicMock(text='{"1": [{"name": "milk", "quantity": 2}]}'),  # Page 2 missing
+            MagicMock(text='[{"name": "milk", "quantity": 2}]'),
+            MagicMock(text='[{"name": "eggs", "quantity": 12}]')
+        ]
+        corrector = GeminiCorrector()
+        corrector.client = MagicMock(models=mock_model)
+        corrector.logger = MagicMock()
+
+        result = corrector.parse_many([self._page("milk", "2"), self._page("eggs", "12")])
+
+        self.assertEqual(result, [
+            [{'name': 'milk', 'quantity': 2}],
+            [{'name': 'eggs', 'quantity': 12}]
+        ])
+        self.assertEqual(mock_model.generate_content.call_count, 3)
+
+    def test_parse_many_respects_token_budget(self):
+        """Test pages are split into several requests when over the token budget"""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(text='[{"name": "milk", "quantity": 2}]')
+        corrector = GeminiCorrector(max_batch_tokens=1)
+        corrector.client = MagicMock(models=mock_model)
+        corrector.logger = MagicMock()
+
+        result = corrector.parse_many([self._page("milk", "2"), self._page("eggs", "12")])
+
+        self.assertEqual(len(result), 2)
+        self.assertEqual(mock_model.generate_content.call_count, 2)
+
+    def test_async_cache_lookup_does_not_block_the_loop(self):
+        """Test a request stuck on a slow cache read leaves another concurrent request free to finish"""
+        entered, released = threading.Event(), threading.Event()
+        lookups = []
+
+        def slow_first_get(key):
+            lookups.append(key)
+            if len(lookups) == 1:
+                entered.set()
+                released.wait(1)
+            return None
+
+        corrector = GeminiCorrector()
+        corrector.cache = MagicMock(get=MagicMock(side_effect=slow_first_get))
+        corrector.cache.make_key.side_effect = lambda text, *_: text
+        corrector._call_gemini_async = AsyncMock(return_value='[{"name": "eggs", "quantity": 12}]')
+        corrector.logger = MagicMock()
+
+        async def run():
+            slow = asyncio.ensure_future(corrector.parse_ocr_result_async(self._page("milk", "2")))
+            await asyncio.to_thread(entered.wait, 1)
+            fast = await asyncio.wait_for(corrector.parse_ocr_result_async(self._page("eggs", "12")), 1)
+            slow_done = slow.done()
+            released.set()
+            await slow
+            return fast, slow_done
+
+        fast, slow_done = asyncio.run(run())
+
+        self.assertEqual(fast, [{'name': 'eggs', 'quantity': 12}])
+        self.assertFalse(slow_done)
+        self.assertEqual(corrector.cache.put.call_count, 2)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,237 @@
+import json
+import time
+import asyncio
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from google import genai
+from corrector.gemini_corrector import GeminiCorrector
+from corrector.local_parser import LocalTableParser
+from corrector.resilience import CircuitBreaker, ResilientCaller, GeminiUnavailableError
+
+class FakeGeminiServer:
+    """generateContent endpoint on localhost with injected latency and errors"""
+    def __init__(self):
+        self.latencies = []
+        self.latency = 0.0
+        self.status = 200
+        self.text = '[{"name": "Tea", "quantity": 0}]'
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                with fake._lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                    latency = fake.latencies.pop(0) if fake.latencies else fake.latency
+                try:
+                    time.sleep(latency)
+                    if fake.status != 200:
+                        body = json.dumps({'error': {'code': fake.status, 'message': 'Injected failure',
+                                                     'status': 'INTERNAL'}}).encode()
+                    else:
+                        body = json.dumps({'candidates': [
+                            {'content': {'role': 'model', 'parts': [{'text': fake.text}]}}
+                        ]}).encode()
+                    self.send_response(fake.status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def page(rows):
+    """PaddleOCR lines for rows of (text, confidence) cells laid out left to right"""
+    lines = []
+    for row_index, row in enumerate(rows):
+        top = 20 + row_index * 40
+        for column, (text, confidence) in enumerate(row):
+            left = 10 + column * 150
+            lines.append([[[left, top], [left + 120, top], [left + 120, top + 25], [left, top + 25]],
+                          [text, confidence]])
+    return lines
+
+# Four clean rows and one the local parser leaves for Gemini
+REGISTER = page([
+    [('Basmati Rice', 0.97), ('12', 0.98)],
+    [('Sugar 1kg', 0.96), ('4', 0.95)],
+    [('Te@', 0.41), ('0', 0.97)],
+    [('Cooking Oil', 0.94), ('7', 0.96)],
+    [('Salt', 0.95), ('3', 0.96)]
+])
+
+class TestGeminiResilience(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeGeminiServer()
+
+    def tearDown(self):
+        self.server.close()
+
+    def corrector(self, **options):
+        options.setdefault('timeout', 0.5)
+        corrector = GeminiCorrector(local_parser=LocalTableParser(), resilience=ResilientCaller(**options))
+        corrector.cache.get = lambda key: None
+        corrector.client = genai.Client(api_key='test', http_options={'base_url': self.server.url, 'timeout': 5000})
+        return corrector
+
+    def test_answer_within_deadline(self):
+        """Test a healthy server's answer is merged with the local rows"""
+        items = self.corrector().parse_ocr_result_with_gemini(REGISTER)
+
+        self.assertEqual(len(items), 5)
+        self.assertEqual(items[-1], {'name': 'Tea', 'quantity': 0})
+
+    def test_slow_call_falls_back_after_deadline(self):
+        """Test a slow server costs no more than the deadline and the local rows are kept"""
+        self.server.latency = 1.0
+        corrector = self.corrector(timeout=0.3)
+
+        started = time.perf_counter()
+        items = corrector.parse_ocr_result_with_gemini(REGISTER)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual([item['name'] for item in items], ['Basmati Rice', 'Sugar 1kg', 'Cooking Oil', 'Salt'])
+        self.assertEqual(corrector.resilience.counts['timeouts'], 1)
+
+    def test_breaker_opens_and_fails_fast(self):
+        """Test repeated errors open the breaker so later pages skip the server"""
+        self.server.status = 500
+        corrector = self.corrector(breaker=CircuitBreaker(min_calls=3, reset_timeout=60))
+        for _ in range(3):
+            corrector.parse_ocr_result_with_gemini(REGISTER)
+        requests = self.server.requests
+
+        items = corrector.parse_ocr_result_with_gemini(REGISTER)
+
+        self.assertEqual(self.server.requests, requests)
+        self.assertEqual(len(items), 4)
+        self.assertFalse(corrector.available())
+        self.assertEqual(corrector.resilience.to_dict()['state'], 'open')
+
+    def test_concurrent_requests_are_capped(self):
+        """Test no more requests reach the server than the cap allows"""
+        self.server.latency = 0.2
+        corrector = self.corrector(max_concurrent=2, timeout=5)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(corrector.parse_ocr_result_with_gemini(REGISTER)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.server.max_in_flight, 2)
+        self.assertEqual([len(items) for items in results], [5] * 6)
+
+    def test_hedged_request_beats_a_slow_one(self):
+        """Test a duplicate sent after p95 latency answers when the first request stalls"""
+        self.server.latencies = [0.05] * 5 + [1.0]
+        corrector = self.corrector(hedge=True, hedge_min_samples=5, timeout=3)
+        for _ in range(5):
+            corrector.parse_ocr_result_with_gemini(REGISTER)
+
+        started = time.perf_counter()
+        items = corrector.parse_ocr_result_with_gemini(REGISTER)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(items), 5)
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual(corrector.resilience.counts['hedged'], 1)
+        self.assertEqual(corrector.resilience.counts['hedge_wins'], 1)
+
+    def test_async_client_shares_the_limits(self):
+        """Test awaited calls are capped and cut off at the deadline like threaded ones"""
+        self.server.latency = 0.2
+        corrector = self.corrector(max_concurrent=2, timeout=5)
+
+        async def run():
+            return await asyncio.gather(*(corrector.parse_ocr_result_async(REGISTER) for _ in range(6)))
+
+        self.assertEqual([len(items) for items in asyncio.run(run())], [5] * 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+        self.server.latency = 1.0
+        corrector.resilience.timeout = 0.3
+        started = time.perf_counter()
+        items = asyncio.run(corrector.parse_ocr_result_async(REGISTER))
+
+        self.assertLess(time.perf_counter() - started, 0.8)
+        self.assertEqual(len(items), 4)
+
+    def test_duplicate_cancelled_before_it_starts_frees_every_slot(self):
+        """Test a duplicate abandoned at the deadline as it is sent, before it starts, holds no slot"""
+        caller = ResilientCaller(timeout=0.3, max_concurrent=2, hedge=True, hedge_min_samples=1)
+        hedges = []
+
+        async def run():
+            await caller.call_async(lambda: asyncio.sleep(0, 'ok'))
+            hedge = caller._hedge
+
+            def hedge_at_the_deadline(factory):
+                hedges.append(factory)
+                # The deadline passes before the duplicate's task gets to run
+                time.sleep(0.35)
+                return hedge(factory)
+            caller._hedge = hedge_at_the_deadline
+            with self.assertRaises(GeminiUnavailableError):
+                await caller.call_async(lambda: asyncio.sleep(1))
+
+        asyncio.run(run())
+
+        self.assertEqual(len(hedges), 1)
+        self.assertEqual(caller.counts['hedged'], 0)
+        self.assertTrue(all(caller._slots.acquire(blocking=False) for _ in range(2)))
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open_trial(self):
+        """Test one trial call after the cool-down decides whether the breaker closes"""
+        now = [0.0]
+        breaker = CircuitBreaker(min_calls=2, reset_timeout=10, clock=lambda: now[0])
+        breaker.record(False)
+        breaker.record(False)
+        self.assertFalse(breaker.allow())
+
+        now[0] = 11
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(True)
+
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_open_breaker_raises(self):
+        """Test calls are refused without running while the breaker is open"""
+        caller = ResilientCaller(breaker=CircuitBreaker(min_calls=1))
+        with self.assertRaises(ValueError):
+            caller.call(lambda: int('x'))
+
+        calls = []
+        with self.assertRaises(GeminiUnavailableError):
+            caller.call(lambda: calls.append(1))
+        self.assertEqual(calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
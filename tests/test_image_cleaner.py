@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+from preprocessing.image_cleaner import ImageCleaner, ImageQualityError
+
+def encode_jpeg(width, height):
+    # Horizontal stripes so the image has some structure to survive decoding
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    img[::20] = 255
+    ok, encoded = cv2.imencode('.jpg', img)
+    return encoded.tobytes()
+
+def register_page(tilt=0.0):
+    # Rows of short dark marks on white paper, tilted counter-clockwise by tilt degrees
+    rng = np.random.default_rng(0)
+    page = np.full((900, 1200), 235, dtype=np.uint8)
+    for top in range(120, 800, 60):
+        left = 150
+        while left < 1000:
+            width = int(rng.integers(10, 30))
+            cv2.rectangle(page, (left, top), (left + width, top + 18), 30, -1)
+            left += width + int(rng.integers(6, 14))
+    matrix = cv2.getRotationMatrix2D((600, 450), tilt, 1.0)
+    return cv2.warpAffine(page, matrix, (1200, 900), borderValue=235)
+
+class TestImageCleaner(unittest.TestCase):
+    def setUp(self):
+        self.cleaner = ImageCleaner(max_width=1000)
+
+    def test_reduction_factor(self):
+        """Test large photos are decoded at the largest scale still wider than max_width"""
+        self.assertEqual(self.cleaner.reduction_factor(encode_jpeg(800, 600)), 1)
+        self.assertEqual(self.cleaner.reduction_factor(encode_jpeg(2400, 1800)), 2)
+        self.assertEqual(self.cleaner.reduction_factor(encode_jpeg(4032, 3024)), 4)
+
+    def test_process_image_from_large_bytes(self):
+        """Test reduced decoding still yields a grayscale image at max_width"""
+        img = self.cleaner.process_image(encode_jpeg(4032, 3024))
+
+        self.assertEqual(img.ndim, 2)
+        self.assertEqual(img.shape, (750, 1000))
+
+    def test_process_batch_matches_process_image(self):
+        """Test batch preprocessing gives the same output, in input order"""
+        images = [encode_jpeg(4032, 3024), encode_jpeg(640, 480), encode_jpeg(2400, 1800)]
+
+        batch = self.cleaner.process_batch(images, max_workers=2)
+
+        self.assertEqual(len(batch), 3)
+        for data, result in zip(images, batch):
+            np.testing.assert_array_equal(result, self.cleaner.process_image(data))
+
+    def test_invalid_bytes(self):
+        """Test undecodable uploads raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.cleaner.process_image(b'not an image')
+
+    def test_estimate_skew(self):
+        """Test the tilt of text rows is measured in either direction, and level pages read as level"""
+        for tilt in (12, -7, 0):
+            angle, confidence = self.cleaner.estimate_skew(self.cleaner.thumbnail(register_page(tilt)))
+
+            self.assertAlmostEqual(angle, tilt, delta=1)
+            self.assertGreater(confidence, 2)
+
+    def test_tilted_page_is_straightened(self):
+        """Test preprocessing levels a tilted page and leaves a level one untouched"""
+        ok, encoded = cv2.imencode('.jpg', register_page(12))
+        straightened = self.cleaner.process_image(encoded.tobytes())
+
+        angle, _ = self.cleaner.estimate_skew(self.cleaner.thumbnail(straightened))
+        self.assertLess(abs(angle), 1)
+
+        level = register_page(0)
+        np.testing.assert_array_equal(self.cleaner.straighten(level), level)
+
+    def test_straighten_reuses_quality_report(self):
+        """Test preprocessing levels a page with the quality check's tilt instead of measuring it again"""
+        ok, encoded = cv2.imencode('.jpg', register_page(12))
+        report = self.cleaner.check_quality(encoded.tobytes())
+
+        with patch.object(self.cleaner, 'estimate_skew', wraps=self.cleaner.estimate_skew) as estimate:
+            straightened = self.cleaner.process_image(encoded.tobytes(), quality=report)
+
+        estimate.assert_not_called()
+        np.testing.assert_array_equal(straightened, self.cleaner.process_image(encoded.tobytes()))
+
+    def test_check_quality(self):
+        """Test usable photos pass with a report and hopeless ones are rejected with a reason"""
+        page = register_page(5)
+        report = self.cleaner.check_quality(page)
+        self.assertAlmostEqual(report['skew'], 5, delta=1)
+
+        cases = [(cv2.GaussianBlur(page, (0, 0), 12), 'blurry'), (page // 8, 'dark'),
+                 (np.full((900, 1200), 252, dtype=np.uint8), 'blurry'), (register_page(35), 'tilted')]
+        for image, reason in cases:
+            with self.assertRaises(ImageQualityError) as raised:
+                self.cleaner.check_quality(image)
+            self.assertIn(reason, str(raised.exception))
+            self.assertIn('sharpness', raised.exception.report)
+
+if __name__ == '__main__':
+    unittest.main()
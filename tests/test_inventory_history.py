@@ -0,0 +1,86 @@
+import unittest
+from datetime import datetime, timedelta
+from flask import Flask
+from flask_login import LoginManager
+from sqlalchemy import event
+from models import db, User, InventoryUpload, InventoryItem
+from inventory.routes import inventory
+from inventory.history import history_page
+
+class TestInventoryHistory(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.update({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test'})
+        db.init_app(self.app)
+        login_manager = LoginManager(self.app)
+        login_manager.user_loader(lambda id: db.session.get(User, int(id)))
+        self.app.register_blueprint(inventory, url_prefix='/inventory')
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        user = User(email='shop@example.com', password_hash='x')
+        other = User(email='other@example.com', password_hash='x')
+        db.session.add_all([user, other])
+        db.session.flush()
+        self.user_id = user.id
+
+        # Pairs of uploads share a timestamp, as batched writes do
+        start = datetime(2024, 1, 1)
+        for i in range(7):
+            upload = InventoryUpload(user_id=user.id, filename=f'page{i}.jpg',
+                                     upload_time=start + timedelta(minutes=i // 2))
+            upload.items = [InventoryItem(name=f'item{i}', quantity=i)]
+            db.session.add(upload)
+        db.session.add(InventoryUpload(user_id=other.id, filename='other.jpg', upload_time=start))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_pages_cover_every_upload_once(self):
+        """Test following cursors walks all of the user's uploads newest first"""
+        filenames = []
+        cursor = None
+        while True:
+            uploads, cursor = history_page(self.user_id, cursor, limit=3)
+            filenames.extend(upload.filename for upload in uploads)
+            if cursor is None:
+                break
+
+        self.assertEqual(filenames, [f'page{i}.jpg' for i in reversed(range(7))])
+
+    def test_items_loaded_with_the_page(self):
+        """Test a page and all its items take two queries"""
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            uploads, _ = history_page(self.user_id, limit=5)
+            names = [item.name for upload in uploads for item in upload.items]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        self.assertEqual(len(names), 5)
+        self.assertEqual(len(statements), 2)
+
+    def test_api_history(self):
+        """Test the JSON endpoint pages with a cursor and rejects a bad one"""
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.user_id)
+
+        first = client.get('/inventory/api/history?limit=4').get_json()
+        second = client.get(f"/inventory/api/history?limit=4&cursor={first['next_cursor']}").get_json()
+
+        self.assertEqual([upload['filename'] for upload in first['uploads']],
+                         ['page6.jpg', 'page5.jpg', 'page4.jpg', 'page3.jpg'])
+        self.assertEqual(first['uploads'][0]['items'], [{'name': 'item6', 'quantity': 6}])
+        self.assertEqual(len(second['uploads']), 3)
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(client.get('/inventory/api/history?cursor=nonsense').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from flask import Flask
+from sqlalchemy import text
+from models import db, User, InventoryUpload, InventoryItem
+from storage import database
+from storage.inventory_writer import InventoryWriter
+
+class TestInventoryWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')
+        db.init_app(self.app)
+        database.init_app(self.app, db)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(email='shop@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.ctx.pop()
+        self.tmpdir.cleanup()
+
+    def test_sqlite_pragmas(self):
+        """Test connections use WAL with the configured busy timeout"""
+        self.assertEqual(db.session.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+        self.assertEqual(db.session.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+        # NORMAL
+        self.assertEqual(db.session.execute(text('PRAGMA synchronous')).scalar(), 1)
+
+    def test_concurrent_saves_are_batched(self):
+        """Test uploads saved from many threads all land, with their own items"""
+        writer = InventoryWriter()
+        writer.init_app(self.app)
+        upload_ids = {}
+
+        def save(i):
+            items = [{'name': f'item{i}-{n}', 'quantity': n} for n in range(i % 3 + 1)]
+            upload_ids[i] = writer.save(self.user_id, f'page{i}.jpg', items)
+
+        threads = [threading.Thread(target=save, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(upload_ids.values())), 20)
+        for i, upload_id in upload_ids.items():
+            upload = db.session.get(InventoryUpload, upload_id)
+            self.assertEqual(upload.filename, f'page{i}.jpg')
+            self.assertEqual(sorted(item.name for item in upload.items),
+                             [f'item{i}-{n}' for n in range(i % 3 + 1)])
+        self.assertEqual(writer.stats()['uploads_written'], 20)
+        self.assertLessEqual(writer.stats()['transactions'], 20)
+
+    def test_bad_upload_does_not_fail_batch(self):
+        """Test a failing upload is isolated from the rest of its batch"""
+        writer = InventoryWriter()
+
+        def fail():
+            raise RuntimeError('boom')
+
+        # Write a batch directly, as the writer thread would
+        batch = [
+            {'user_id': self.user_id, 'filename': 'ok.jpg', 'items': [{'name': 'tea', 'quantity': 1}],
+             'on_write': None, 'future': Future()},
+            {'user_id': self.user_id, 'filename': 'bad.jpg', 'items': [], 'on_write': fail, 'future': Future()}
+        ]
+        writer._write(batch)
+
+        self.assertEqual(db.session.get(InventoryUpload, batch[0]['future'].result()).filename, 'ok.jpg')
+        with self.assertRaises(RuntimeError):
+            batch[1]['future'].result()
+        self.assertEqual(InventoryItem.query.count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from flask import Flask
+from flask_login import LoginManager
+from models import db, User, UploadJob
+from jobs.job_queue import JobQueue
+from jobs.routes import jobs
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')
+        self.app.config['SECRET_KEY'] = 'test'
+        db.init_app(self.app)
+        login_manager = LoginManager(self.app)
+        login_manager.user_loader(lambda user_id: db.session.get(User, int(user_id)))
+        self.app.register_blueprint(jobs, url_prefix='/jobs')
+        with self.app.app_context():
+            db.create_all()
+            for email in ('shop@example.com', 'other@example.com'):
+                db.session.add(User(email=email, password_hash='x'))
+            db.session.commit()
+            self.user_id, self.other_id = [user.id for user in User.query.order_by(User.id)]
+        self.queue = JobQueue(num_workers=1, lease_seconds=60)
+        self.queue.init_app(self.app)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def add_job(self, status='queued', started_ago=None):
+        with self.app.app_context():
+            job = UploadJob(user_id=self.user_id, filename='page.jpg', image_data=b'page', status=status,
+                            started_at=datetime.utcnow() - started_ago if started_ago is not None else None)
+            db.session.add(job)
+            db.session.commit()
+            return job.id
+
+    def job(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(UploadJob, job_id)
+            db.session.expunge(job)
+            return job
+
+    def client(self, user_id=None):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id or self.user_id)
+        return client
+
+    def test_claim_is_exclusive(self):
+        """Test a queued job is claimed by exactly one worker"""
+        job_id = self.add_job()
+        with self.app.app_context():
+            self.assertTrue(self.queue._claim(job_id))
+            self.assertFalse(self.queue._claim(job_id))
+        self.assertEqual(self.job(job_id).status, 'running')
+
+    def test_recovery_respects_the_lease(self):
+        """Test only jobs running past their lease are reset; live ones are left to their worker"""
+        abandoned = self.add_job('running', started_ago=timedelta(minutes=5))
+        live = self.add_job('running', started_ago=timedelta(seconds=5))
+        waiting = self.add_job()
+        self.add_job('done')
+
+        with self.app.app_context():
+            self.assertEqual(self.queue._recover_jobs(), 2)
+
+        self.assertEqual(self.job(abandoned).status, 'queued')
+        self.assertEqual(self.job(live).status, 'running')
+        self.assertEqual(list(self.queue._queue.queue), [abandoned, waiting])
+
+    @patch('jobs.job_queue.run_upload_pipeline', return_value=({'success': True, 'items': []}, 200))
+    def test_worker_runs_job_once(self, pipeline):
+        """Test a submitted job is processed once with its quality report and stored without the image bytes"""
+        with self.app.app_context():
+            job_id = self.queue.submit(self.user_id, b'page', 'page.jpg',
+                                       quality={'skew': 4.0, 'skew_confidence': 6.0}).id
+        self.queue._queue.join()
+
+        pipeline.assert_called_once_with(b'page', 'page.jpg', self.user_id, None,
+                                         {'skew': 4.0, 'skew_confidence': 6.0})
+        job = self.job(job_id)
+        self.assertEqual((job.status, job.status_code), ('done', 200))
+        self.assertIsNone(job.image_data)
+
+    @patch('jobs.job_queue.run_upload_pipeline', return_value=({'success': True, 'items': []}, 200))
+    def test_start_runs_jobs_left_by_a_previous_run(self, pipeline):
+        """Test starting the workers finishes queued and abandoned jobs without a new upload"""
+        waiting = self.add_job()
+        abandoned = self.add_job('running', started_ago=timedelta(minutes=5))
+
+        self.queue.start()
+        self.queue._queue.join()
+
+        self.assertEqual(pipeline.call_count, 2)
+        self.assertEqual([self.job(job_id).status for job_id in (waiting, abandoned)], ['done', 'done'])
+
+    def test_status_and_result_endpoints(self):
+        """Test clients poll until the result is ready and never see other users' jobs"""
+        job_id = self.add_job('running', started_ago=timedelta(seconds=1))
+        client = self.client()
+
+        response = client.get(f'/jobs/{job_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'running')
+        self.assertEqual(response.get_json()['result_url'], f'/jobs/{job_id}/result')
+        self.assertEqual(client.get(f'/jobs/{job_id}/result').status_code, 202)
+
+        with self.app.app_context():
+            job = db.session.get(UploadJob, job_id)
+            job.set_result({'error': 'No items found in image'}, 400)
+            job.status = 'failed'
+            db.session.commit()
+        response = client.get(f'/jobs/{job_id}/result')
+        self.assertEqual((response.status_code, response.get_json()), (400, {'error': 'No items found in image'}))
+
+        self.assertEqual(self.client(self.other_id).get(f'/jobs/{job_id}').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
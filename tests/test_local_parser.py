@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import MagicMock
+from corrector.local_parser import LocalTableParser, parse_quantity
+from corrector.gemini_corrector import GeminiCorrector
+
+def page(rows):
+    """PaddleOCR lines for rows of (text, confidence) cells laid out left to right"""
+    lines = []
+    for row_index, row in enumerate(rows):
+        top = 20 + row_index * 40
+        for column, (text, confidence) in enumerate(row):
+            left = 10 + column * 150
+            lines.append([[[left, top], [left + 120, top], [left + 120, top + 25], [left, top + 25]],
+                          [text, confidence]])
+    return lines
+
+CLEAN_REGISTER = [
+    [('S.No', 0.99), ('Item', 0.99), ('Qty', 0.99)],
+    [('1', 0.99), ('Basmati Rice', 0.97), ('12', 0.98)],
+    [('2', 0.98), ('Sugar 1kg', 0.96), ('4 pcs', 0.95)],
+    [('3', 0.99), ('Tea', 0.95), ('0', 0.97)],
+    [('4', 0.99), ('Cooking Oil', 0.94), ('7', 0.96)],
+    [('Total', 0.99), ('23', 0.99)]
+]
+
+class TestLocalTableParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = LocalTableParser()
+
+    def test_parse_quantity(self):
+        """Test counts with unit words parse and other text does not"""
+        self.assertEqual(parse_quantity('12'), 12)
+        self.assertEqual(parse_quantity('4 pcs'), 4)
+        self.assertIsNone(parse_quantity('1kg'))
+        self.assertIsNone(parse_quantity('Rice'))
+
+    def test_clean_table_is_read_locally(self):
+        """Test a clean register skips the header, serial numbers and total row"""
+        result = self.parser.parse(CLEAN_REGISTER)
+
+        self.assertTrue(result['confident'])
+        self.assertEqual(result['items'], [
+            {'name': 'Basmati Rice', 'quantity': 12}, {'name': 'Sugar 1kg', 'quantity': 4},
+            {'name': 'Tea', 'quantity': 0}, {'name': 'Cooking Oil', 'quantity': 7}
+        ])
+
+    def test_low_confidence_rows_fail(self):
+        """Test a badly read row is left for Gemini while the rest stay local"""
+        rows = [list(row) for row in CLEAN_REGISTER]
+        rows[3] = [('3', 0.99), ('Te@', 0.41), ('0', 0.97)]
+
+        result = self.parser.parse(rows)
+
+        self.assertFalse(result['confident'])
+        self.assertTrue(result['partial'])
+        self.assertEqual(result['failed_rows'], [3])
+        self.assertEqual(len(result['items']), 3)
+
+    def test_free_text_is_not_a_table(self):
+        """Test a page without a quantity column is not read locally"""
+        result = self.parser.parse([[('bought milk and eggs today', 0.99)], [('need more sugar', 0.98)]])
+
+        self.assertFalse(result['confident'])
+        self.assertFalse(result['partial'])
+
+class TestCorrectorFastPath(unittest.TestCase):
+    def setUp(self):
+        self.model = MagicMock()
+        self.corrector = GeminiCorrector(local_parser=LocalTableParser())
+        self.corrector.client = MagicMock(models=self.model)
+        self.corrector.logger = MagicMock()
+
+    def test_confident_page_skips_gemini(self):
+        """Test a clean page is answered without calling Gemini"""
+        items = self.corrector.parse_ocr_result_with_gemini(page(CLEAN_REGISTER))
+
+        self.assertEqual(len(items), 4)
+        self.model.generate_content.assert_not_called()
+        stats = self.corrector.local_stats.to_dict()
+        self.assertEqual((stats['local_pages'], stats['hit_rate']), (1, 1.0))
+
+    def test_only_failed_rows_go_to_gemini(self):
+        """Test Gemini is asked about the failed row only and its answer is merged in"""
+        rows = [list(row) for row in CLEAN_REGISTER]
+        rows[3] = [('3', 0.99), ('Te@', 0.41), ('0', 0.97)]
+        self.model.generate_content.return_value = MagicMock(text='[{"name": "Tea", "quantity": 0}]')
+
+        items = self.corrector.parse_ocr_result_with_gemini(page(rows))
+
+        self.assertEqual([item['name'] for item in items], ['Basmati Rice', 'Sugar 1kg', 'Cooking Oil', 'Tea'])
+        prompt = self.model.generate_content.call_args[1]['contents']
+        self.assertIn('3\tTe@\t0', prompt)
+        self.assertNotIn('Basmati Rice', prompt)
+
+if __name__ == '__main__':
+    unittest.main()
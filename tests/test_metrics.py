@@ -0,0 +1,62 @@
+import unittest
+from flask import Flask, jsonify
+from monitoring.metrics import Metrics, Histogram, collect_timings
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(buckets=(0.1, 1.0))
+        self.app = Flask(__name__)
+        self.metrics.init_app(self.app)
+
+        @self.app.route('/work')
+        def work():
+            self.metrics.record('ocr', 0.5)
+            self.metrics.record('gemini', 2.0)
+            self.metrics.record('gemini', 1.0)
+            return jsonify({'success': True})
+
+        self.client = self.app.test_client()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bounds are inclusive and every bucket counts what falls below it"""
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+    def test_exports_prometheus_text(self):
+        """Test stage spans and request durations appear on /metrics"""
+        self.client.get('/work')
+
+        text = self.client.get('/metrics').get_data(as_text=True)
+
+        self.assertIn('# TYPE smartstock_stage_seconds histogram', text)
+        self.assertIn('smartstock_stage_seconds_bucket{stage="gemini",le="1.0"} 1', text)
+        self.assertIn('smartstock_stage_seconds_bucket{stage="gemini",le="+Inf"} 2', text)
+        self.assertIn('smartstock_stage_seconds_sum{stage="gemini"} 3.0', text)
+        self.assertIn('smartstock_http_request_seconds_count{endpoint="work",method="GET",status="200"} 1', text)
+
+    def test_debug_header_adds_breakdown(self):
+        """Test the debug header adds per-stage timings to JSON responses and nowhere else"""
+        plain = self.client.get('/work').get_json()
+        self.assertNotIn('_timings', plain)
+
+        response = self.client.get('/work', headers={'X-Debug-Timing': '1'})
+        timings = response.get_json()['_timings']
+
+        self.assertEqual(timings['stages'], {'ocr': 500.0, 'gemini': 3000.0})
+        self.assertIn('gemini;dur=3000.0', response.headers['Server-Timing'])
+
+    def test_spans_outside_a_collection_only_feed_histograms(self):
+        """Test spans recorded after a collection ends do not leak into it"""
+        with collect_timings() as timings:
+            with self.metrics.span('preprocess'):
+                pass
+        self.metrics.record('ocr', 0.2)
+
+        self.assertEqual(list(timings.stages), ['preprocess'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import unittest
+import numpy as np
+from ocr.ocr_pool import OCRPool
+
+class FakeEngine:
+    """Stand-in for PaddleOCR that reports what the worker received"""
+    def __init__(self, cpu_threads):
+        self.cpu_threads = cpu_threads
+
+    def ocr(self, image, cls=False):
+        return [[image.shape, int(image.sum()), self.cpu_threads, os.getpid()]]
+
+def create_fake_engine(cpu_threads):
+    return FakeEngine(cpu_threads)
+
+class TestOCRPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = OCRPool(processes=2, cpu_threads=3, engine_factory=create_fake_engine)
+        cls.pids = cls.pool.warm_up()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_warm_up_reaches_every_worker(self):
+        """Test each worker answers the warm-up exactly once"""
+        self.assertEqual(len(set(self.pids)), 2)
+        self.assertEqual(sorted(self.pool.warm_up()), sorted(self.pids))
+
+    def test_image_reaches_worker(self):
+        """Test an image is handed to a warm worker through shared memory"""
+        image = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+        shape, total, cpu_threads, pid = self.pool.ocr(image)[0]
+
+        self.assertEqual(tuple(shape), (3, 4))
+        self.assertEqual(total, int(image.sum()))
+        self.assertEqual(cpu_threads, 3)
+        self.assertNotEqual(pid, os.getpid())
+
+    def test_non_contiguous_image(self):
+        """Test views such as crops are copied into shared memory correctly"""
+        image = np.arange(100, dtype=np.uint8).reshape(10, 10)[::2, 1:5]
+
+        shape, total, _, _ = self.pool.ocr(image)[0]
+
+        self.assertEqual(tuple(shape), (5, 4))
+        self.assertEqual(total, int(image.sum()))
+
+if __name__ == '__main__':
+    unittest.main()
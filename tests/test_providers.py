@@ -0,0 +1,66 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+from providers import LazyProvider, warm_up, _providers
+
+class TestLazyProvider(unittest.TestCase):
+    def setUp(self):
+        self.registered = set(_providers)
+
+    def tearDown(self):
+        # Keep test providers out of the process-wide registry other tests warm up
+        for name in set(_providers) - self.registered:
+            del _providers[name]
+
+    def test_builds_once_on_first_use(self):
+        """Test the factory runs on the first get() only"""
+        factory = MagicMock(return_value=object())
+        provider = LazyProvider('test_once', factory)
+
+        factory.assert_not_called()
+        self.assertFalse(provider.loaded)
+
+        first = provider.get()
+        second = provider.get()
+
+        self.assertIs(first, second)
+        factory.assert_called_once()
+        self.assertTrue(provider.loaded)
+        self.assertGreaterEqual(provider.load_seconds, 0)
+
+    def test_warm_up_reports_load_times(self):
+        """Test warm-up builds the instance, runs its own warm-up and reports it"""
+        instance = MagicMock()
+        LazyProvider('test_warm_up', lambda: instance)
+
+        report = {entry['name']: entry for entry in warm_up(['test_warm_up'])}
+
+        instance.warm_up.assert_called_once()
+        self.assertTrue(report['test_warm_up']['loaded'])
+        self.assertIsNotNone(report['test_warm_up']['load_seconds'])
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_corrector_builds_client_on_first_use(self):
+        """Test the corrector needs GEMINI_API_KEY only when Gemini is actually called"""
+        from corrector.gemini_corrector import GeminiCorrector
+
+        corrector = GeminiCorrector()
+
+        self.assertIsNone(corrector._client)
+        with self.assertRaises(ValueError):
+            corrector.client
+
+    @patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
+    @patch('google.genai.Client')
+    def test_corrector_warm_up_builds_client(self, client_class):
+        """Test warming up the corrector provider creates the Gemini client ahead of the first page"""
+        from corrector.gemini_corrector import GeminiCorrector
+
+        provider = LazyProvider('test_gemini_corrector', GeminiCorrector)
+        warm_up(['test_gemini_corrector'])
+
+        client_class.assert_called_once()
+        self.assertIs(provider.get()._client, client_class.return_value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from flask import Flask
+from models import db, User, ItemStats, InventoryUpload, InventoryItem, CanonicalItem, ItemAlias
+from logic.item_stats import advance_stats, update_item_stats, rebuild_item_stats
+from logic.reorder_logic import ReorderEngine, generate_reorder_suggestions
+
+class TestReorderLogic(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        user = User(email='shop@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.engine = ReorderEngine(lead_time_days=3, safety_days=2, cover_days=14)
+        self.start = datetime(2024, 1, 1)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def save_counts(self, day, counts):
+        upload = InventoryUpload(user_id=self.user_id, filename=f'day{day}.jpg',
+                                 upload_time=self.start + timedelta(days=day))
+        items = [{'name': name, 'quantity': quantity} for name, quantity in counts.items()]
+        db.session.add(upload)
+        db.session.flush()
+        update_item_stats(db.session, [(self.user_id, upload.id, upload.upload_time, items)])
+        # Saved like the inventory writer does, with each item's canonical id
+        upload.items = [InventoryItem(name=item['name'], quantity=item['quantity'], item_id=item['item_id'])
+                        for item in items]
+        db.session.commit()
+
+    def test_fallback_threshold_rule(self):
+        """Test items without history use the original low-stock rule"""
+        suggestions = generate_reorder_suggestions([{'name': 'Rice', 'quantity': 2},
+                                                    {'name': 'Tea', 'quantity': 8}])
+
+        self.assertEqual(suggestions, [{'name': 'Rice', 'current_quantity': 2, 'reorder_quantity': 10}])
+
+    def test_usage_ignores_restocks(self):
+        """Test usage comes from falling counts only"""
+        stats = advance_stats(None, 10, self.start)
+        stats = advance_stats(stats, 6, self.start + timedelta(days=2))
+        stats = advance_stats(stats, 30, self.start + timedelta(days=3))
+
+        self.assertAlmostEqual(stats['consumed'] / stats['consumed_days'], 2.0, places=1)
+        self.assertEqual(stats['observations'], 3)
+
+    def test_forecast_from_history(self):
+        """Test fast sellers are reordered early and slow sellers are left alone"""
+        self.save_counts(0, {'Rice': 40, 'Salt': 6})
+        self.save_counts(4, {'Rice': 32, 'Salt': 6})
+
+        suggestions = self.engine.suggest_for_user(self.user_id, [{'name': 'rice', 'quantity': 8},
+                                                                  {'name': 'Salt', 'quantity': 5}])
+
+        # Rice sells 2 a day: 4 days of cover is inside lead time + safety
+        self.assertEqual(len(suggestions), 1)
+        self.assertEqual(suggestions[0]['name'], 'rice')
+        self.assertEqual(suggestions[0]['days_of_cover'], 4.0)
+        self.assertEqual(suggestions[0]['reorder_quantity'], 2 * 19 - 8)
+
+    def test_stockout_is_not_exempt(self):
+        """Test an item stuck at zero still gets reordered"""
+        self.save_counts(0, {'Sugar': 0})
+        self.save_counts(3, {'Sugar': 0})
+
+        suggestions = self.engine.suggest_for_user(self.user_id, [{'name': 'Sugar', 'quantity': 0}])
+
+        self.assertEqual(suggestions[0]['reorder_quantity'], 10)
+
+    def test_rebuild_matches_incremental(self):
+        """Test replaying history reproduces the incrementally kept statistics"""
+        for day, counts in enumerate([{'Rice': 40, 'Tea': 9}, {'Rice': 31}, {'Rice': 50, 'Tea': 4}]):
+            self.save_counts(day * 2, counts)
+        incremental = {row.item_key: (row.consumed, row.consumed_days) for row in ItemStats.query}
+
+        self.assertEqual(rebuild_item_stats(self.user_id), 2)
+        rebuilt = {row.item_key: (row.consumed, row.consumed_days) for row in ItemStats.query}
+
+        self.assertEqual(rebuilt.keys(), incremental.keys())
+        for key in incremental:
+            np.testing.assert_allclose(rebuilt[key], incremental[key])
+
+    def test_ten_thousand_items(self):
+        """Test a large shop is scored well under a second"""
+        rng = np.random.default_rng(0)
+        db.session.execute(CanonicalItem.__table__.insert(), [
+            {'id': i + 1, 'user_id': self.user_id, 'item_key': f'item {i}', 'name': f'Item {i}'} for i in range(10000)
+        ])
+        db.session.execute(ItemAlias.__table__.insert(), [
+            {'user_id': self.user_id, 'alias_key': f'item {i}', 'item_id': i + 1} for i in range(10000)
+        ])
+        db.session.execute(ItemStats.__table__.insert(), [
+            {'user_id': self.user_id, 'item_id': i + 1, 'item_key': f'item {i}', 'last_quantity': 5,
+             'last_time': self.start, 'observations': 30, 'consumed': float(rng.uniform(0, 50)),
+             'consumed_days': 10.0}
+            for i in range(10000)
+        ])
+        db.session.commit()
+        items = [{'name': f'Item {i}', 'quantity': int(rng.integers(0, 100))} for i in range(10000)]
+
+        started = time.perf_counter()
+        suggestions = self.engine.suggest_for_user(self.user_id, items)
+        elapsed = time.perf_counter() - started
+
+        self.assertGreater(len(suggestions), 0)
+        self.assertLess(elapsed, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from flask import Flask
+from models import db, ImageResultCache
+from ocr.result_cache import ResultCache, image_digest
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.cache = ResultCache(max_entries=2)
+        self.items = [{'name': 'milk', 'quantity': 2}]
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_hit_and_miss(self):
+        """Test cached items are returned for identical bytes"""
+        digest = image_digest(b'register photo')
+        self.assertIsNone(self.cache.get(digest))
+
+        self.cache.put(digest, self.items)
+        db.session.commit()
+
+        self.assertEqual(self.cache.get(image_digest(b'register photo')), self.items)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['entries'], 1)
+
+    def test_put_existing_digest(self):
+        """Test storing the same image twice does not fail"""
+        digest = image_digest(b'register photo')
+        self.cache.put(digest, self.items)
+        self.cache.put(digest, [{'name': 'eggs', 'quantity': 12}])
+        db.session.commit()
+
+        self.assertEqual(self.cache.get(digest), [{'name': 'eggs', 'quantity': 12}])
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted past the size bound"""
+        first, second, third = (image_digest(data) for data in (b'a', b'b', b'c'))
+        self.cache.put(first, self.items)
+        db.session.commit()
+        self.cache.put(second, self.items)
+        db.session.commit()
+
+        # Touch the first entry so the second becomes least recently used
+        self.cache.get(first)
+        db.session.commit()
+        self.cache.put(third, self.items)
+        db.session.commit()
+
+        remaining = {entry.digest for entry in ImageResultCache.query.all()}
+        self.assertEqual(remaining, {first, third})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from ocr.tiling import split_strips, merge_strip_results
+
+def line(x, y, width, height, text, confidence=0.9):
+    return [[[x, y], [x + width, y], [x + width, y + height], [x, y + height]], (text, confidence)]
+
+class BarEngine:
+    """Stand-in for PaddleOCR that reads each white bar as text naming its width"""
+    def ocr(self, image, cls=False):
+        result = []
+        rows = np.flatnonzero(image.max(axis=1) > 128)
+        if rows.size:
+            for bar in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+                columns = np.flatnonzero(image[bar].max(axis=0) > 128)
+                result.append(line(columns[0], bar[0], columns[-1] - columns[0], bar[-1] - bar[0],
+                                   str(columns[-1] - columns[0] + 1)))
+        return [result]
+
+class TestTiling(unittest.TestCase):
+    def test_split_strips(self):
+        """Test strips overlap and cover the page exactly"""
+        self.assertEqual(split_strips(500, 1000, 100), [(0, 500)])
+        self.assertEqual(split_strips(2500, 1000, 200), [(0, 1000), (800, 1800), (1600, 2500)])
+
+    def test_merge_drops_overlap_duplicates(self):
+        """Test a line read by two strips is kept once, from the strip that saw it whole"""
+        strips = [
+            ((0, 100), [line(10, 20, 50, 10, 'Sugar'), line(10, 92, 50, 8, 'Ric', 0.99)]),
+            ((80, 180), [line(10, 10, 50, 10, 'Rice', 0.8), line(10, 50, 50, 10, 'Tea')])
+        ]
+
+        merged = merge_strip_results(strips, 180)
+
+        self.assertEqual([text for _, (text, _) in merged], ['Sugar', 'Rice', 'Tea'])
+        self.assertEqual(merged[1][0][0], [10, 90])
+
+    def test_merge_drops_tall_duplicates(self):
+        """Test a box many text lines tall is still matched with its copy from the next strip"""
+        first = [line(10, y, 50, 10, f'row{y}') for y in range(0, 80, 20)] + [line(100, 40, 40, 58, 'Total', 0.7)]
+        second = [line(100, 0, 40, 60, 'Total', 0.95)] + [line(10, y, 50, 10, f'next{y}') for y in range(30, 100, 20)]
+
+        merged = merge_strip_results([((0, 100), first), ((60, 160), second)], 160)
+
+        totals = [box for box, (text, _) in merged if text == 'Total']
+        self.assertEqual(totals, [[[100, 60], [140, 60], [140, 120], [100, 120]]])
+        self.assertEqual(len(merged), 9)
+
+    def test_tiled_ocr_in_page_coordinates(self):
+        """Test tiled OCR finds every line once, in page coordinates, skipping blank strips"""
+        from ocr.ocr_processor import OCRProcessor
+
+        page = np.zeros((3000, 400), dtype=np.uint8)
+        bars = [(100 + i * 180, 50 + i * 10) for i in range(12)]
+        for top, width in bars:
+            page[top:top + 30, 20:20 + width] = 255
+        # Grey, flat bottom margin: not black, but blank by variance
+        page[2400:] = 100
+
+        with patch('ocr.ocr_processor.create_paddle_ocr', return_value=BarEngine()):
+            processor = OCRProcessor(processes=0, tile_height=600, tile_overlap=100)
+        with patch.object(BarEngine, 'ocr', wraps=processor.ocr.ocr) as ocr:
+            merged = processor.ocr_tiled(page)
+
+        self.assertEqual(ocr.call_count, 5)
+        self.assertEqual([text for _, (text, _) in merged], [str(width) for _, width in bars])
+        self.assertEqual([box[0][1] for box, _ in merged], [top for top, _ in bars])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import io
+import os
+import hashlib
+import tempfile
+import unittest
+from flask import Flask, request, jsonify
+from storage.streaming import StreamingRequest, uploaded_digest
+from storage.upload_archive import UploadArchive
+
+class TestUploadArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.archive = UploadArchive(folder=self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_identical_uploads_stored_once(self):
+        """Test the same photo under two names is archived once, by content"""
+        data = b'register photo'
+        digest = hashlib.sha256(data).hexdigest()
+
+        first = self.archive.archive(data, 'register.jpg').result()
+        second = self.archive.archive(data, 'other.JPG', digest).result()
+        different = self.archive.archive(b'another photo', 'register.jpg').result()
+
+        self.assertEqual(first, os.path.join(self.tmpdir.name, digest[:2], digest + '.jpg'))
+        self.assertEqual(second, first)
+        self.assertNotEqual(different, first)
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_streamed_upload_is_hashed(self):
+        """Test uploads are hashed while streaming and spill to disk past the limit"""
+        app = Flask(__name__)
+        app.request_class = StreamingRequest
+        app.config['UPLOAD_SPOOL_MAX_BYTES'] = 1024
+
+        @app.route('/upload', methods=['POST'])
+        def upload():
+            file = request.files['image']
+            data = file.read()
+            return jsonify({'digest': uploaded_digest(file, data), 'spilled': file.stream.spilled,
+                            'size': len(data)})
+
+        client = app.test_client()
+        for size, spilled in ((100, False), (5000, True)):
+            data = os.urandom(size)
+            response = client.post('/upload', data={'image': (io.BytesIO(data), 'page.jpg')},
+                                   content_type='multipart/form-data').get_json()
+
+            self.assertEqual(response['digest'], hashlib.sha256(data).hexdigest())
+            self.assertEqual(response['spilled'], spilled)
+            self.assertEqual(response['size'], size)
+
+if __name__ == '__main__':
+    unittest.main()
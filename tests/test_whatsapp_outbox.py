@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+import unittest
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+from flask import Flask
+from twilio.rest import Client
+from models import db, OutboxMessage
+from messaging.outbox import WhatsAppOutbox, RateLimiter
+
+class FakeTwilioHandler(BaseHTTPRequestHandler):
+    """Answers Twilio's Messages.create with queued responses, or errors"""
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        server = self.server
+        server.requests.append(form)
+        status = server.statuses.pop(0) if server.statuses else 201
+        body = {'sid': f'SM{len(server.requests)}', 'status': 'queued', 'to': form['To'][0]} \
+            if status == 201 else {'code': 20500, 'message': 'Internal error', 'status': status}
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@patch.dict(os.environ, {'TWILIO_WHATSAPP_NUMBER': '+15550000000'})
+class TestWhatsAppOutbox(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTwilioHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.statuses = []
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        client = Client('ACtest', 'token')
+        client.api.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.outbox = WhatsAppOutbox(coalesce_seconds=0, retry_base_seconds=60, client=client)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_coalesces_messages_to_one_number(self):
+        """Test suggestion sets queued together go out as one merged message"""
+        self.outbox.enqueue('923001234567', [{'name': 'Rice', 'current_quantity': 2, 'reorder_quantity': 10}])
+        self.outbox.enqueue('923001234567', [{'name': 'rice', 'current_quantity': 1, 'reorder_quantity': 12},
+                                             {'name': 'Tea', 'current_quantity': 0, 'reorder_quantity': 5}])
+        self.outbox.enqueue('15557654321', [{'name': 'Salt', 'current_quantity': 1, 'reorder_quantity': 4}])
+
+        self.outbox.process_due()
+
+        self.assertEqual(len(self.server.requests), 2)
+        body = next(r['Body'][0] for r in self.server.requests if r['To'] == ['whatsapp:+923001234567'])
+        self.assertIn('rice: 1 left → Reorder 12', body)
+        self.assertIn('Tea: 0 left', body)
+        self.assertNotIn('Rice: 2 left', body)
+        sids = {message.message_sid for message in OutboxMessage.query.filter_by(phone_number='923001234567')}
+        self.assertEqual(len(sids), 1)
+        self.assertEqual(self.outbox.stats(), {'sent': 3})
+
+    def test_retries_with_backoff(self):
+        """Test a server error schedules a later retry instead of failing the message"""
+        self.server.statuses = [500]
+        message = self.outbox.enqueue('923001234567', [{'name': 'Rice', 'current_quantity': 2,
+                                                       'reorder_quantity': 10}])
+
+        self.outbox.process_due()
+
+        db.session.refresh(message)
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, datetime.utcnow() + timedelta(seconds=20))
+
+        # Make it due again: the retry succeeds
+        message.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        self.outbox.process_due()
+
+        db.session.refresh(message)
+        self.assertEqual((message.status, message.attempts), ('sent', 2))
+
+    def test_client_errors_are_not_retried(self):
+        """Test Twilio rejecting a message marks it failed straight away"""
+        self.server.statuses = [400]
+        message = self.outbox.enqueue('923001234567', [{'name': 'Rice', 'current_quantity': 2,
+                                                       'reorder_quantity': 10}])
+
+        self.outbox.process_due()
+
+        db.session.refresh(message)
+        self.assertEqual(message.status, 'failed')
+
+    def test_only_expired_claims_are_recovered(self):
+        """Test messages another sender is still sending are left alone until its claim expires"""
+        now = datetime.utcnow()
+        claims = [('923001111111', now + timedelta(minutes=4)), ('923002222222', now - timedelta(seconds=1))]
+        for number, expires in claims:
+            db.session.add(OutboxMessage(phone_number=number, suggestions=json.dumps([]), status='sending',
+                                         message_sid='claim', next_attempt_at=expires))
+        db.session.commit()
+
+        self.outbox.process_due()
+
+        self.assertEqual([form['To'][0] for form in self.server.requests], ['whatsapp:+923002222222'])
+        self.assertEqual(OutboxMessage.query.filter_by(phone_number='923001111111').one().status, 'sending')
+        self.assertEqual(OutboxMessage.query.filter_by(phone_number='923002222222').one().status, 'sent')
+
+    def test_started_sender_sends_what_a_previous_run_left(self):
+        """Test starting the sender delivers pending and abandoned messages without a new enqueue"""
+        now = datetime.utcnow()
+        db.session.add(OutboxMessage(phone_number='923001111111', suggestions=json.dumps([]), next_attempt_at=now))
+        db.session.add(OutboxMessage(phone_number='923002222222', suggestions=json.dumps([]), status='sending',
+                                     message_sid='claim', next_attempt_at=now - timedelta(seconds=1)))
+        db.session.commit()
+        self.outbox.init_app(self.app)
+
+        self.outbox.start()
+        deadline = time.monotonic() + 5
+        while len(self.server.requests) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(sorted(form['To'][0] for form in self.server.requests),
+                         ['whatsapp:+923001111111', 'whatsapp:+923002222222'])
+
+    def test_rate_limiter(self):
+        """Test a number gets its burst, then waits for the bucket to refill"""
+        limiter = RateLimiter(rate_per_minute=6, burst=2)
+        for _ in range(2):
+            self.assertEqual(limiter.delay('n', now=0), 0)
+            limiter.consume('n', now=0)
+
+        self.assertAlmostEqual(limiter.delay('n', now=0), 10)
+        self.assertAlmostEqual(limiter.delay('n', now=4), 6)
+        self.assertEqual(limiter.delay('other', now=0), 0)
+
+if __name__ == '__main__':
+    unittest.main()